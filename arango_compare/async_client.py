@@ -0,0 +1,237 @@
+import asyncio
+import base64
+import json
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+from urllib.parse import quote
+
+try:
+    import aiohttp
+except ImportError:  # aiohttp is optional; only the async engine needs it.
+    aiohttp = None
+
+from .client import RETRY_STATUSES, ArangoDBClient, profile_endpoint
+from .counts import column_total
+from .filters import CollectionFilter
+from .indexes import normalize_index
+from .profile import Profiler
+from .summary import CollectionTable
+
+class AsyncArangoDBClient:
+    """asyncio counterpart of ArangoDBClient for fetching from many databases and servers at once.
+
+    Every request is a coroutine instead of a blocked thread, so thousands of metadata
+    requests can be in flight while max_concurrent_requests bounds how many reach this
+    server at a time. The aiohttp session, its connection pool and that limit are shared
+    by every client derived through for_database, and are created on first use inside
+    the running event loop; close() releases them.
+
+    The deeper comparison tiers stay synchronous: sync_client() returns an ArangoDBClient
+    for the same server and database to hand to compare_databases. Pass the configured
+    ArangoDBClient of the server as sync_client so those tiers keep its pool, limit and
+    profiler. Requests are recorded in profiler like the synchronous client's. Summaries
+    are always fetched per collection; the bulk metadata strategy has no async form.
+    """
+
+    def __init__(self, url: str, username: str, password: str, db_name: str, max_concurrent_requests: int = 32,
+                 pool_size: Optional[int] = None, timeout: float = 60.0, retries: int = 3,
+                 backoff_factor: float = 0.5, collection_filter: Optional[CollectionFilter] = None,
+                 profiler: Optional[Profiler] = None, sync_client: Optional[ArangoDBClient] = None):
+        if aiohttp is None:
+            raise ImportError("AsyncArangoDBClient needs aiohttp; install it with 'pip install arango_compare[async]'")
+        self.url = url
+        self.username = username
+        self.password = password
+        self.db_name = db_name
+        self.max_concurrent_requests = max(1, max_concurrent_requests)
+        self.pool_size = pool_size or self.max_concurrent_requests
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.collection_filter = collection_filter
+        self.profiler = profiler
+        # Shared with every client derived through for_database.
+        self._shared: Dict[str, Any] = {'session': None, 'limiter': None, 'sync_client': sync_client}
+
+    def for_database(self, db_name: str) -> 'AsyncArangoDBClient':
+        """Return a client for another database on the same server, sharing the session, pool and limit."""
+        client = object.__new__(type(self))
+        client.__dict__.update(self.__dict__)
+        client.db_name = db_name
+        return client
+
+    def sync_client(self) -> ArangoDBClient:
+        """A synchronous client for the same server and database, for the deeper comparison tiers."""
+        if self._shared['sync_client'] is None:
+            self._shared['sync_client'] = ArangoDBClient(
+                self.url, self.username, self.password, self.db_name, timeout=self.timeout, retries=self.retries,
+                backoff_factor=self.backoff_factor, profiler=self.profiler, collection_filter=self.collection_filter)
+        return self._shared['sync_client'].for_database(self.db_name)
+
+    async def __aenter__(self) -> 'AsyncArangoDBClient':
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        session = self._shared['session']
+        self._shared['session'] = None
+        self._shared['limiter'] = None
+        if session is not None:
+            await session.close()
+
+    def _session(self):
+        if self._shared['session'] is None:
+            connector = aiohttp.TCPConnector(limit=self.pool_size)
+            credentials = base64.b64encode(f"{self.username}:{self.password}".encode()).decode()
+            self._shared['session'] = aiohttp.ClientSession(
+                connector=connector, headers={'Authorization': f"Basic {credentials}"},
+                timeout=aiohttp.ClientTimeout(total=self.timeout))
+            self._shared['limiter'] = asyncio.Semaphore(self.max_concurrent_requests)
+        return self._shared['session']
+
+    async def _request(self, method: str, path: str, db_name: Optional[str] = None, retry: bool = True,
+                       **kwargs) -> Dict[str, Any]:
+        """Send one request and return its JSON body.
+
+        429/503 responses and connection errors are retried with exponential backoff, like
+        the synchronous client; retry=False is for cursor continuations, which must not be
+        replayed.
+        """
+        session = self._session()
+        url = f"{self.url}/_db/{db_name or self.db_name}{path}"
+        start = time.perf_counter()
+        status = None
+        body = b''
+        attempt = 0
+        try:
+            for attempt in range(self.retries + 1):
+                if attempt:
+                    await asyncio.sleep(self.backoff_factor * 2 ** (attempt - 1))
+                last_attempt = not retry or attempt == self.retries
+                try:
+                    async with self._shared['limiter']:
+                        async with session.request(method, url, **kwargs) as response:
+                            status = response.status
+                            if status in RETRY_STATUSES and not last_attempt:
+                                continue
+                            response.raise_for_status()
+                            body = await response.read()
+                            return json.loads(body) if body else None
+                except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                    status = None
+                    if last_attempt:
+                        raise
+        finally:
+            if self.profiler is not None:
+                endpoint, collection = profile_endpoint(path, params=kwargs.get('params'))
+                self.profiler.record_request(method, endpoint, collection, status=status, size=len(body),
+                                             retries=attempt, seconds=time.perf_counter() - start)
+
+    async def query(self, aql: str, bind_vars: Optional[Dict[str, Any]] = None, batch_size: int = 1000,
+                    stream: bool = False) -> AsyncIterator[Any]:
+        """Run an AQL query and yield its results, following the cursor batch by batch."""
+        body = {'query': aql, 'bindVars': bind_vars or {}, 'batchSize': batch_size}
+        if stream:
+            body['options'] = {'stream': True}
+        result = await self._request('POST', '/_api/cursor', json=body)
+        for item in result.get('result', []):
+            yield item
+        while result.get('hasMore'):
+            result = await self._request('PUT', f"/_api/cursor/{result['id']}", retry=False)
+            for item in result.get('result', []):
+                yield item
+
+    async def list_databases(self) -> List[str]:
+        """Names of all databases on the server; needs access to _system."""
+        result = await self._request('GET', '/_api/database', db_name='_system')
+        return result.get('result', [])
+
+    async def get_collections(self) -> List[Dict[str, Any]]:
+        """All collections of the database, less those rejected by the collection filter."""
+        all_collections = []
+        has_more = True
+        offset = 0
+        params = {'limit': 1000}
+        if self.collection_filter is not None and self.collection_filter.skip_system:
+            params['excludeSystem'] = 'true'
+
+        while has_more:
+            result = await self._request('GET', '/_api/collection', params=dict(params, offset=offset))
+            collections = result.get('result', [])
+            all_collections.extend(collections)
+            has_more = result.get('hasMore', False)
+            offset += len(collections)
+
+        if self.collection_filter is not None:
+            all_collections = [collection for collection in all_collections
+                               if self.collection_filter.matches(collection['name'])]
+        return all_collections
+
+    async def get_indexes(self, collection_name: str) -> List[Dict[str, Any]]:
+        result = await self._request('GET', '/_api/index', params={'collection': collection_name})
+        return [normalize_index(index) for index in result.get('indexes', [])]
+
+    async def get_collection_details(self, collection_name: str) -> Dict[str, Any]:
+        count, indexes = await asyncio.gather(
+            self._request('GET', f"/_api/collection/{quote(collection_name)}/count"),
+            self.get_indexes(collection_name),
+        )
+        return {'document_count': count.get('count', 0), 'index_count': len(indexes), 'indexes': indexes}
+
+    async def get_collection_revision(self, collection_name: str) -> str:
+        result = await self._request('GET', f"/_api/collection/{quote(collection_name)}/revision")
+        return result.get('revision')
+
+    async def get_collection_checksum(self, collection_name: str, with_revisions: bool = False,
+                                      with_data: bool = True) -> str:
+        params = {'withRevisions': str(with_revisions).lower(), 'withData': str(with_data).lower()}
+        result = await self._request('GET', f"/_api/collection/{quote(collection_name)}/checksum", params=params)
+        return result.get('checksum')
+
+    async def get_analyzers(self) -> List[Dict[str, Any]]:
+        return (await self._request('GET', '/_api/analyzer')).get('result', [])
+
+    async def get_graphs(self) -> List[Dict[str, Any]]:
+        graphs = (await self._request('GET', '/_api/gharial')).get('graphs', [])
+        return [{'name': graph['name'], 'edge_definitions': graph['edgeDefinitions'],
+                 'orphan_collections': graph['orphanCollections']} for graph in graphs]
+
+    async def get_views(self) -> List[Dict[str, Any]]:
+        return (await self._request('GET', '/_api/view')).get('result', [])
+
+    async def _get_collection_details_for(self, collection_name: str) -> Dict[str, Any]:
+        try:
+            return await self.get_collection_details(collection_name)
+        except aiohttp.ClientError as exc:
+            # Keep the original exception type but say which collection failed.
+            exc.args = (f"collection '{collection_name}': {exc}",) + exc.args[1:]
+            raise
+
+    async def get_summary(self) -> Dict[str, Any]:
+        """The same summary as ArangoDBClient.get_summary, with every request issued concurrently."""
+        names = [collection['name'] for collection in await self.get_collections()]
+        graphs, analyzers, views, *all_details = await asyncio.gather(
+            self.get_graphs(), self.get_analyzers(), self.get_views(),
+            *(self._get_collection_details_for(name) for name in names),
+        )
+
+        collection_details = CollectionTable()
+        for name, details in zip(names, all_details):
+            collection_details.add(name, details['document_count'], details['index_count'], details['indexes'])
+        del all_details
+
+        return {
+            'db_name': self.db_name,
+            'total_collections': len(names),
+            'total_documents': column_total(collection_details.document_counts),
+            'total_indexes': column_total(collection_details.index_counts),
+            'total_graphs': len(graphs),
+            'total_analyzers': len(analyzers),
+            'total_views': len(views),
+            'collection_details': collection_details,
+            'graphs': graphs,
+            'analyzers': analyzers,
+            'views': views,
+        }
@@ -1,60 +1,382 @@
-from typing import Dict, Any, List
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from urllib.parse import quote, unquote, urlparse
 import requests
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
+from urllib3.util.retry import Retry
+from .counts import column_total
+from .filters import CollectionFilter
+from .indexes import normalize_index
+from .profile import Profiler, phase
+from .summary import CollectionTable
+
+# Statuses that mean "try again later" rather than a real failure.
+RETRY_STATUSES = (429, 503)
+# How get_summary learns document and index counts.
+METADATA_STRATEGIES = ('per_collection', 'bulk')
+
+# Cursor continuation (PUT) is not safe to replay: a retried batch fetch would skip a batch.
+RETRY_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'POST'])
+
+# Collection names and cursor ids are replaced by placeholders so profiles group requests by endpoint.
+COLLECTION_PATH = re.compile(r'^/_api/collection/([^/]+)')
+CURSOR_PATH = re.compile(r'^/_api/cursor/[^/]+$')
+
+def profile_endpoint(path: str, collection: Optional[str] = None, params=None):
+    """The endpoint template of a request path below /_db/<name>, and the collection it is about."""
+    match = COLLECTION_PATH.match(path)
+    if match:
+        collection = collection or unquote(match.group(1))
+        path = COLLECTION_PATH.sub('/_api/collection/{name}', path)
+    elif CURSOR_PATH.match(path):
+        path = '/_api/cursor/{id}'
+    if collection is None and isinstance(params, dict):
+        collection = params.get('collection')
+    return path, collection
 
 class ArangoDBClient:
-    """Client to interact with ArangoDB"""
+    """Client to interact with ArangoDB
 
-    def __init__(self, url: str, username: str, password: str, db_name: str):
+    All requests go through one pooled requests.Session. The underlying urllib3
+    pool is thread-safe, so the session is shared by the get_summary workers;
+    pool_size defaults to at least max_workers so no worker waits for a socket.
+    """
+
+    def __init__(self, url: str, username: str, password: str, db_name: str, max_workers: int = 1,
+                 pool_size: Optional[int] = None, timeout: float = 60.0, retries: int = 3,
+                 backoff_factor: float = 0.5, metadata_strategy: str = 'per_collection',
+                 bulk_chunk_size: int = 500, max_concurrent_requests: Optional[int] = None,
+                 profiler: Optional[Profiler] = None, collection_filter: Optional[CollectionFilter] = None,
+                 quiet: bool = False):
+        if metadata_strategy not in METADATA_STRATEGIES:
+            raise ValueError(f"Unknown metadata strategy '{metadata_strategy}', expected one of {METADATA_STRATEGIES}")
         self.url = url
         self.auth = HTTPBasicAuth(username, password)
         self.db_name = db_name
+        # Number of concurrent requests used by get_summary; 1 keeps the original serial behaviour.
+        self.max_workers = max(1, max_workers)
+        self.timeout = timeout
+        self.session = self._build_session(pool_size or max(10, self.max_workers), retries, backoff_factor)
+        self.metadata_strategy = metadata_strategy
+        self.bulk_chunk_size = max(1, bulk_chunk_size)
+        # Cleared the first time the server rejects a bulk request so later chunks skip straight to the fallback.
+        self._bulk_supported = True
+        # Caps in-flight requests to this server across every client derived through for_database.
+        self.max_concurrent_requests = max_concurrent_requests
+        self._limiter = threading.BoundedSemaphore(max_concurrent_requests) if max_concurrent_requests else None
+        # Records every request's latency when set; shared with clients derived through for_database.
+        self.profiler = profiler
+        # Collections it rejects are dropped from get_collections, so they never cost another request.
+        self.collection_filter = collection_filter
+        # Silences the bulk metadata fallback notice, like --quiet does for the comparison's progress output.
+        self.quiet = quiet
+
+    def __getstate__(self):
+        # Semaphores cannot be pickled; a worker process gets its own limiter of the same size.
+        # Profiles are not collected across processes.
+        state = self.__dict__.copy()
+        state['_limiter'] = None
+        state['profiler'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.max_concurrent_requests:
+            self._limiter = threading.BoundedSemaphore(self.max_concurrent_requests)
+
+    def for_database(self, db_name: str) -> 'ArangoDBClient':
+        """Return a client for another database on the same server, sharing the session, pool and limiter."""
+        # Not copy.copy: that goes through __getstate__ and would give the copy its own limiter.
+        client = object.__new__(type(self))
+        client.__dict__.update(self.__dict__)
+        client.db_name = db_name
+        client._bulk_supported = True
+        return client
+
+    def _build_session(self, pool_size: int, retries: int, backoff_factor: float) -> requests.Session:
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=RETRY_METHODS,
+            raise_on_status=False,
+            respect_retry_after_header=True,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        session = requests.Session()
+        session.auth = self.auth
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def _request(self, send, url: str, collection: Optional[str] = None, **kwargs) -> requests.Response:
+        start = time.perf_counter()
+        response = None
+        try:
+            if self._limiter is None:
+                response = send(url, timeout=self.timeout, **kwargs)
+            else:
+                with self._limiter:
+                    response = send(url, timeout=self.timeout, **kwargs)
+        finally:
+            if self.profiler is not None:
+                self._profile_request(send.__name__.upper(), url, collection, kwargs.get('params'), response,
+                                      time.perf_counter() - start)
+        response.raise_for_status()
+        return response
+
+    def _profile_request(self, method: str, url: str, collection: Optional[str], params, response,
+                         seconds: float) -> None:
+        path, collection = profile_endpoint(re.sub(r'^/_db/[^/]+', '', urlparse(url).path), collection, params)
+        retries = getattr(getattr(response, 'raw', None), 'retries', None)
+        self.profiler.record_request(
+            method, path, collection,
+            status=response.status_code if response is not None else None,
+            size=len(response.content) if response is not None else 0,
+            retries=len(retries.history) if retries is not None else 0,
+            seconds=seconds,
+        )
+
+    def _get(self, url: str, **kwargs) -> requests.Response:
+        return self._request(self.session.get, url, **kwargs)
+
+    def _post(self, url: str, **kwargs) -> requests.Response:
+        return self._request(self.session.post, url, **kwargs)
+
+    def _put(self, url: str, **kwargs) -> requests.Response:
+        return self._request(self.session.put, url, **kwargs)
+
+    def query(self, aql: str, bind_vars: Optional[Dict[str, Any]] = None, batch_size: int = 1000,
+              stream: bool = False) -> Iterator[Any]:
+        """Run an AQL query and yield its results, following the cursor batch by batch."""
+        cursor_url = f"{self.url}/_db/{self.db_name}/_api/cursor"
+        bind_vars = bind_vars or {}
+        body = {'query': aql, 'bindVars': bind_vars, 'batchSize': batch_size}
+        if stream:
+            body['options'] = {'stream': True}
+        collection = bind_vars.get('@collection', bind_vars.get('collection'))
+        result = self._post(cursor_url, json=body, collection=collection).json()
+        yield from result.get('result', [])
+        while result.get('hasMore'):
+            result = self._put(f"{cursor_url}/{result['id']}", collection=collection).json()
+            yield from result.get('result', [])
+
+    def close(self) -> None:
+        self.session.close()
+
+    def list_databases(self) -> List[str]:
+        """Names of all databases on the server; needs access to _system."""
+        response = self._get(f"{self.url}/_db/_system/_api/database")
+        return response.json().get('result', [])
 
     def get_collections(self) -> List[Dict[str, Any]]:
+        """All collections of the database, less those rejected by the collection filter."""
         collections_url = f"{self.url}/_db/{self.db_name}/_api/collection"
         all_collections = []
         has_more = True
         offset = 0
         limit = 1000  # Adjust the limit as needed
+        params = {'limit': limit}
+        if self.collection_filter is not None and self.collection_filter.skip_system:
+            # Let the server leave system collections out; the filter below still checks.
+            params['excludeSystem'] = 'true'
 
         while has_more:
-            response = requests.get(collections_url, auth=self.auth, params={'offset': offset, 'limit': limit})
-            response.raise_for_status()
+            response = self._get(collections_url, params=dict(params, offset=offset))
             result = response.json()
             collections = result.get('result', [])
             all_collections.extend(collections)
             has_more = result.get('hasMore', False)
             offset += len(collections)
 
+        if self.collection_filter is not None:
+            all_collections = [collection for collection in all_collections
+                               if self.collection_filter.matches(collection['name'])]
         return all_collections
 
-    def get_collection_details(self, collection_name: str) -> Dict[str, Any]:
+    def get_collection_count(self, collection_name: str) -> int:
         collection_url = f"{self.url}/_db/{self.db_name}/_api/collection/{collection_name}/count"
-        response = requests.get(collection_url, auth=self.auth)
-        response.raise_for_status()
-        document_count = response.json().get('count', 0)
+        response = self._get(collection_url)
+        return response.json().get('count', 0)
 
-        indexes_url = f"{self.url}/_db/{self.db_name}/_api/index?collection={collection_name}"
-        response = requests.get(indexes_url, auth=self.auth)
-        response.raise_for_status()
-        index_count = len(response.json().get('indexes', []))
+    def get_collection_details(self, collection_name: str) -> Dict[str, Any]:
+        document_count = self.get_collection_count(collection_name)
+
+        indexes = self.get_indexes(collection_name)
 
         return {
             'document_count': document_count,
-            'index_count': index_count
+            'index_count': len(indexes),
+            'indexes': indexes
         }
 
+    def get_indexes(self, collection_name: str) -> List[Dict[str, Any]]:
+        """Return the collection's index definitions, normalized by indexes.normalize_index."""
+        indexes_url = f"{self.url}/_db/{self.db_name}/_api/index?collection={collection_name}"
+        response = self._get(indexes_url)
+        return [normalize_index(index) for index in response.json().get('indexes', [])]
+
+    def get_bulk_collection_details(self, collection_names: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Fetch document and index counts for many collections in a few requests.
+
+        Counts come from one AQL query per chunk and index lists from one /_api/batch
+        request per chunk. A chunk the server rejects is fetched per collection instead.
+        """
+        return dict(self.iter_bulk_collection_details(collection_names))
+
+    def iter_bulk_collection_details(self, collection_names: List[str]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """get_bulk_collection_details as (name, details) pairs in name order, one chunk held at a time."""
+        chunks = [collection_names[i:i + self.bulk_chunk_size]
+                  for i in range(0, len(collection_names), self.bulk_chunk_size)]
+        if self.max_workers > 1 and len(chunks) > 1:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                for chunk in executor.map(self._get_bulk_chunk, chunks):
+                    yield from chunk.items()
+        else:
+            for chunk in chunks:
+                yield from self._get_bulk_chunk(chunk).items()
+
+    def _get_bulk_chunk(self, collection_names: List[str]) -> Dict[str, Dict[str, Any]]:
+        if self._bulk_supported:
+            try:
+                counts = self._get_bulk_counts(collection_names)
+                indexes = self._get_bulk_indexes(collection_names)
+                return {
+                    name: {
+                        'document_count': counts[name],
+                        'index_count': len(indexes[name]),
+                        'indexes': [normalize_index(index) for index in indexes[name]]
+                    }
+                    for name in collection_names
+                }
+            except (requests.HTTPError, KeyError, ValueError) as exc:
+                if not self.quiet:
+                    print(f"Bulk metadata request rejected by {self.url} ({exc}), falling back to per-collection requests")
+                self._bulk_supported = False
+        return {name: self._get_collection_details_for(name) for name in collection_names}
+
+    def _get_bulk_counts(self, collection_names: List[str]) -> Dict[str, int]:
+        aql = "FOR name IN @names RETURN {name: name, count: COLLECTION_COUNT(name)}"
+        rows = self.query(aql, {'names': collection_names}, batch_size=len(collection_names))
+        return {row['name']: row['count'] for row in rows}
+
+    def _get_bulk_indexes(self, collection_names: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        paths = [f"/_db/{quote(self.db_name)}/_api/index?collection={quote(name)}" for name in collection_names]
+        return {
+            name: part.get('indexes', [])
+            for name, part in zip(collection_names, self._batch_get(paths))
+        }
+
+    def _batch_get(self, paths: List[str]) -> List[Dict[str, Any]]:
+        """Send several GET requests as one multipart /_api/batch request, returning each JSON body in order."""
+        boundary = f"arangocompare-{uuid.uuid4().hex}"
+        body = "".join(
+            f"--{boundary}\r\nContent-Type: application/x-arango-batchpart\r\nContent-Id: {i}\r\n\r\n"
+            f"GET {path} HTTP/1.1\r\n\r\n"
+            for i, path in enumerate(paths)
+        ) + f"--{boundary}--\r\n"
+        batch_url = f"{self.url}/_db/{self.db_name}/_api/batch"
+        response = self._post(batch_url, data=body.encode('utf-8'),
+                              headers={'Content-Type': f'multipart/form-data; boundary={boundary}'})
+        if int(response.headers.get('x-arango-errors', 0)):
+            raise ValueError(f"{response.headers['x-arango-errors']} batch parts failed")
+
+        content_type = response.headers.get('Content-Type', '')
+        response_boundary = content_type.split('boundary=')[-1] if 'boundary=' in content_type else boundary
+        results: Dict[int, Dict[str, Any]] = {}
+        for part in response.text.split(f"--{response_boundary}"):
+            part = part.strip()
+            if not part or part == '--':
+                continue
+            part_headers, _, http_message = part.partition('\r\n\r\n')
+            http_head, _, payload = http_message.partition('\r\n\r\n')
+            status = int(http_head.splitlines()[0].split()[1])
+            if status >= 400:
+                raise ValueError(f"batch part failed with HTTP {status}")
+            content_id = next(
+                int(line.split(':', 1)[1])
+                for line in part_headers.splitlines()
+                if line.lower().startswith('content-id:')
+            )
+            results[content_id] = json.loads(payload)
+        return [results[i] for i in range(len(paths))]
+
+    def get_collection_revision(self, collection_name: str) -> str:
+        revision_url = f"{self.url}/_db/{self.db_name}/_api/collection/{collection_name}/revision"
+        response = self._get(revision_url)
+        return response.json().get('revision')
+
+    def get_collection_checksum(self, collection_name: str, with_revisions: bool = False,
+                                with_data: bool = True) -> str:
+        checksum_url = f"{self.url}/_db/{self.db_name}/_api/collection/{collection_name}/checksum"
+        params = {'withRevisions': str(with_revisions).lower(), 'withData': str(with_data).lower()}
+        response = self._get(checksum_url, params=params)
+        return response.json().get('checksum')
+
+    def stream_documents(self, collection_name: str, batch_size: int = 1000, lower: Optional[str] = None,
+                         upper: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Stream the documents of a collection ordered by _key without materializing the result server-side.
+
+        lower (inclusive) and upper (exclusive) restrict the scan to a _key range.
+        """
+        bind_vars = {'@collection': collection_name}
+        aql = f"FOR d IN @@collection {self._key_range_filter(bind_vars, lower, upper)}SORT d._key RETURN d"
+        return self.query(aql, bind_vars, batch_size=batch_size, stream=True)
+
+    def sample_keys(self, collection_name: str, sample_size: int, population: int, lower: Optional[str] = None,
+                    upper: Optional[str] = None) -> List[str]:
+        """Return up to sample_size randomly chosen _key values, optionally from a _key range.
+
+        population is about how many documents the collection (or range) holds. The server
+        keeps each document with a probability chosen to return a few more keys than asked
+        for, in one pass without sorting, and the surplus is dropped here. The LIMIT only
+        guards against a population that is far too low, since it would favour keys early
+        in the scan.
+        """
+        expected = sample_size + 4 * math.sqrt(sample_size) + 16
+        bind_vars = {'@collection': collection_name, 'fraction': min(1.0, expected / max(1, population)),
+                     'limit': int(2 * expected)}
+        aql = (f"FOR d IN @@collection {self._key_range_filter(bind_vars, lower, upper)}"
+               "FILTER RAND() < @fraction LIMIT @limit RETURN d._key")
+        keys = list(self.query(aql, bind_vars, batch_size=max(1, min(bind_vars['limit'], 10000))))
+        return random.sample(keys, sample_size) if len(keys) > sample_size else keys
+
+    def get_documents(self, collection_name: str, keys: List[str],
+                      batch_size: int = 1000) -> Iterator[Optional[Dict[str, Any]]]:
+        """Fetch the documents with the given keys in the order given, yielding None for keys that do not exist."""
+        aql = "FOR key IN @keys RETURN DOCUMENT(@collection, key)"
+        return self.query(aql, {'collection': collection_name, 'keys': keys}, batch_size=batch_size)
+
+    @staticmethod
+    def _key_range_filter(bind_vars: Dict[str, Any], lower: Optional[str], upper: Optional[str]) -> str:
+        filters = []
+        if lower is not None:
+            filters.append("d._key >= @lower")
+            bind_vars['lower'] = lower
+        if upper is not None:
+            filters.append("d._key < @upper")
+            bind_vars['upper'] = upper
+        return f"FILTER {' AND '.join(filters)} " if filters else ""
 
     def get_analyzers(self) -> List[Dict[str, Any]]:
         analyzers_url = f"{self.url}/_db/{self.db_name}/_api/analyzer"
-        response = requests.get(analyzers_url, auth=self.auth)
-        response.raise_for_status()
+        response = self._get(analyzers_url)
         return response.json().get('result', [])
 
     def get_graphs(self) -> List[Dict[str, Any]]:
         graphs_url = f"{self.url}/_db/{self.db_name}/_api/gharial"
-        response = requests.get(graphs_url, auth=self.auth)
-        response.raise_for_status()
+        response = self._get(graphs_url)
         graphs_data = response.json().get('graphs', [])
         graph_details = []
         for graph in graphs_data:
@@ -66,52 +388,58 @@ class ArangoDBClient:
             graph_details.append(detail)
         return graph_details
 
-    # def get_indexes(self) -> List[Dict[str, Any]]:
-    #     all_indexes = []
-    #     collections = self.get_collections()
-    #     for collection in collections:
-    #         collection_name = collection['name']
-    #         indexes_url = f"{self.url}/_db/{self.db_name}/_api/index?collection={collection_name}"
-    #         response = requests.get(indexes_url, auth=self.auth)
-    #         response.raise_for_status()
-    #         indexes_data = response.json().get('indexes', [])
-    #         for index in indexes_data:
-    #             index_detail = {
-    #                 'id': index['id'],
-    #                 'type': index['type'],
-    #                 'fields': index.get('fields', []),
-    #                 'collection': collection_name
-    #             }
-    #             all_indexes.append(index_detail)
-    #     return all_indexes
-
     def get_views(self) -> List[Dict[str, Any]]:
         views_url = f"{self.url}/_db/{self.db_name}/_api/view"
-        response = requests.get(views_url, auth=self.auth)
-        response.raise_for_status()
+        response = self._get(views_url)
         return response.json().get('result', [])
 
-
     def get_summary(self) -> Dict[str, Any]:
-        collections = self.get_collections()
-        total_collections = len(collections)
-        total_documents = 0
-        total_indexes = 0
-        collection_details = {}
-
-        for collection in collections:
-            details = self.get_collection_details(collection['name'])
-            total_documents += details['document_count']
-            total_indexes += details['index_count']
-            collection_details[collection['name']] = details
-
-        graphs = self.get_graphs()  # Updated to use the new get_graphs method
+        with phase(self.profiler, 'summary'):
+            return self._build_summary()
+
+    def _build_summary(self) -> Dict[str, Any]:
+        # Only the names are kept; the raw collection listing is dropped right away.
+        names = [collection['name'] for collection in self.get_collections()]
+        total_collections = len(names)
+        # Each collection goes into the table's columns as soon as its metadata arrives,
+        # so the per-collection dicts never all exist at once.
+        collection_details = CollectionTable()
+
+        def add(name, details):
+            collection_details.add(name, details['document_count'], details['index_count'], details.get('indexes', ()))
+
+        if self.metadata_strategy == 'bulk':
+            for name, details in self.iter_bulk_collection_details(names):
+                add(name, details)
+            graphs = self.get_graphs()
+            analyzers = self.get_analyzers()
+            views = self.get_views()
+        elif self.max_workers > 1:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                # Database-level catalogs are fetched alongside the per-collection details.
+                graphs_future = executor.submit(self.get_graphs)
+                analyzers_future = executor.submit(self.get_analyzers)
+                views_future = executor.submit(self.get_views)
+                # map() yields in submission order, so the table matches the serial run
+                # and the first failing collection re-raises its own exception.
+                for name, details in zip(names, executor.map(self._get_collection_details_for, names)):
+                    add(name, details)
+                graphs = graphs_future.result()
+                analyzers = analyzers_future.result()
+                views = views_future.result()
+        else:
+            for name in names:
+                add(name, self._get_collection_details_for(name))
+            graphs = self.get_graphs()
+            analyzers = self.get_analyzers()
+            views = self.get_views()
+
+        total_documents = column_total(collection_details.document_counts)
+        total_indexes = column_total(collection_details.index_counts)
+
         total_graphs = len(graphs)
-        analyzers = self.get_analyzers()
         total_analyzers = len(analyzers)
-        views = self.get_views()
         total_views = len(views)
-        # indexes = self.get_indexes()
 
         return {
             'db_name': self.db_name,
@@ -127,6 +455,14 @@ class ArangoDBClient:
             'views': views
         }
 
+    def _get_collection_details_for(self, collection_name: str) -> Dict[str, Any]:
+        try:
+            return self.get_collection_details(collection_name)
+        except requests.RequestException as exc:
+            # Keep the original exception type but say which collection failed.
+            exc.args = (f"collection '{collection_name}': {exc}",) + exc.args[1:]
+            raise
+
     # def get_summary(self) -> Dict[str, Any]:
     #     collections = self.get_collections()
     #     total_collections = len(collections)
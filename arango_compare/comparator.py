@@ -1,125 +1,335 @@
 import os
 import datetime
-from typing import Dict, Any
-from .formatter import print_and_write, write_view_differences
-
-# Compares entities from two databases, identifying unique and differing entities, and generates a markdown report detailing these differences.
-
-def compare_entities(entity1_list, entity2_list, entity_name, log_subdir):
-    entity1_dict = {entity['name']: entity for entity in entity1_list}
-    entity2_dict = {entity['name']: entity for entity in entity2_list}
-    unique_to_db1 = []
-    unique_to_db2 = []
-    differences_exist = False
-
-    diff_file = os.path.join(log_subdir, f"{entity_name}.md")
-    with open(diff_file, 'w') as output:
-        print_and_write(f"# {entity_name.capitalize()} Differences", output)
-
-        for name in entity1_dict:
-            if name not in entity2_dict:
-                unique_to_db1.append(name)
-            else:
-                differences = []
-                for key in entity1_dict[name]:
-                    if key in entity2_dict[name] and entity1_dict[name][key] != entity2_dict[name][key]:
-                        differences.append((key, entity1_dict[name][key], entity2_dict[name][key]))
-                        differences_exist = True
-
-        for name in entity2_dict:
-            if name not in entity1_dict:
-                unique_to_db2.append(name)
-
-        if unique_to_db1:
-            print_and_write(f"\n## {entity_name.capitalize()} only in DB1:", output)
-            for name in unique_to_db1:
-                print_and_write(f"- {name}", output)
-
-        if unique_to_db2:
-            print_and_write(f"\n## {entity_name.capitalize()} only in DB2:", output)
-            for name in unique_to_db2:
-                print_and_write(f"- {name}", output)
-
-        if differences_exist:
-            print_and_write("\n## Difference Details", output)
-            for name in entity1_dict:
-                if name in entity2_dict:
-                    differences = []
-                    for key in entity1_dict[name]:
-                        if key in entity2_dict[name] and entity1_dict[name][key] != entity2_dict[name][key]:
-                            differences.append((key, entity1_dict[name][key], entity2_dict[name][key]))
-
-                    if differences:
-                        print_and_write(f"\n### {entity_name.capitalize()}: {name}", output)
-                        for key, value1, value2 in differences:
-                            print_and_write(f"- **{key}**:\n  - DB1: {value1}\n  - DB2: {value2}", output)
-
-def compare_databases(client1, client2, summary1: Dict[str, Any], summary2: Dict[str, Any], log_dir: str) -> None:
-    collections1 = set(summary1['collection_details'].keys())
-    collections2 = set(summary2['collection_details'].keys())
-
-    unique_to_db1 = collections1 - collections2
-    unique_to_db2 = collections2 - collections1
-    matching_collections = collections1 & collections2
-
-    mismatched_collections = []
+import time
+from typing import Dict, Any, Optional
+from .counts import compare_counts
+from .diff import diff_entities
+from .report import build_sinks
+from .indexes import diff_indexes
+from .profile import phase
+from .summary import CollectionTable
+
+# How far compare_databases looks into matching collections, cheapest first: counts only,
+# a random sample of documents, server-side collection checksums, server-side bucket digests
+# that descend into differing buckets, or every document. Each depth runs the cheaper tiers
+# first and only escalates the collections they could not clear; 'sample' is approximate
+# and follows the count tier on its own.
+DEPTHS = ('count', 'sample', 'checksum', 'hash', 'documents')
+
+# Differing keys kept per collection in a snapshot outcome, so a reused result can still list them.
+SNAPSHOT_KEY_LIMIT = 1000
+
+TOTALS = ('total_collections', 'total_documents', 'total_indexes', 'total_graphs', 'total_analyzers', 'total_views')
+
+# Compares entities from two databases, identifying unique and differing entities, and reports the differences as one event.
+
+def compare_entities(entity1_list, entity2_list, entity_name, report):
+    differences = diff_entities(entity1_list, entity2_list)
+    report.emit(dict(differences, report=entity_name, event='entity_differences', entity=entity_name))
+    return differences
+
+def collection_differ(depth, batch_size=1000, hash_mode='content', scan_ranges=1, scan_processes=None,
+                      scan_state_dir=None, report=None, table=None):
+    # The deep tiers are imported on first use, so count-only runs never load them.
+    if depth == 'hash':
+        from .hashtree import compare_collection_hashes
+        return lambda client1, client2, collection: compare_collection_hashes(
+            client1, client2, collection, mode=hash_mode, batch_size=batch_size)
+    from .documents import compare_collection_documents, compare_collection_documents_parallel
+    if scan_ranges > 1:
+        def scan_progress(collection):
+            if report is None:
+                return None
+            return lambda done, total: report.emit({'report': 'documents', 'event': 'scan_progress',
+                                                    'collection': collection, 'done': done, 'total': total})
+        return lambda client1, client2, collection: compare_collection_documents_parallel(
+            client1, client2, collection, scan_ranges, scan_processes, batch_size, scan_state_dir,
+            scan_progress(collection), table.document_count(collection) if table is not None else None)
+    return lambda client1, client2, collection: compare_collection_documents(
+        client1, client2, collection, batch_size)
+
+def compare_indexes(summary1, summary2, collections, report):
+    """Diff normalized index definitions per collection, reporting each collection that differs."""
+    collections_with_differences = []
+    table1 = CollectionTable.from_details(summary1['collection_details'])
+    table2 = CollectionTable.from_details(summary2['collection_details'])
+    report.emit({'report': 'indexes', 'event': 'report_started'})
+    for collection in collections:
+        only_in_db1, only_in_db2 = diff_indexes(table1.indexes(collection), table2.indexes(collection))
+        if only_in_db1 or only_in_db2:
+            collections_with_differences.append(collection)
+            report.emit({'report': 'indexes', 'event': 'index_difference', 'collection': collection,
+                         'only_in_db1': only_in_db1, 'only_in_db2': only_in_db2})
+    return collections_with_differences
+
+def compare_checksums(client1, client2, collections, with_revisions=False, with_data=True):
+    """Return the collections whose server-side checksums differ."""
+    differing = []
+    for collection in collections:
+        checksum1 = client1.get_collection_checksum(collection, with_revisions, with_data)
+        checksum2 = client2.get_collection_checksum(collection, with_revisions, with_data)
+        if checksum1 != checksum2:
+            differing.append(collection)
+    return differing
+
+def compare_samples(client1, client2, collections, report, table1, sample_size=1000, strata=1, confidence=0.95,
+                    batch_size=1000):
+    """Check a random sample of documents per collection, reporting differing keys and the estimated mismatch rate."""
+    from .sampling import compare_collection_sample
+    collections_with_differences = []
+    report.emit({'report': 'samples', 'event': 'report_started'})
+    for collection in collections:
+        population = table1.document_count(collection)
+        report.emit({'report': 'samples', 'event': 'collection_started', 'collection': collection})
+        result = compare_collection_sample(client1, client2, collection, sample_size, strata, confidence,
+                                           population, batch_size)
+        for status, key in result['differences']:
+            report.emit({'report': 'samples', 'event': 'document_difference', 'collection': collection,
+                         'status': status, 'key': key})
+        report.emit({
+            'report': 'samples', 'event': 'sample_result', 'collection': collection,
+            'population': population, 'sampled': result['sampled'], 'mismatched': len(result['differences']),
+            'rate': result['rate'], 'lower': result['lower'], 'upper': result['upper'], 'confidence': confidence,
+        })
+        if result['differences']:
+            collections_with_differences.append(collection)
+    return collections_with_differences
+
+def collection_state(client, details, collection):
+    """What a collection looks like cheaply: its summary details plus the server's revision id."""
+    return dict(details, revision=client.get_collection_revision(collection))
+
+def load_snapshot_outcomes(client1, client2, table1, table2, collections, snapshot, snapshot_key):
+    """Look up the stored outcome of each collection by its current state on both servers.
+
+    The state is the summary details plus each server's /revision, which is cheap, so
+    collections unchanged since the last run skip the checksum, hash and documents tiers.
+    Returns the states (to save the new outcomes under) and the reusable outcomes.
+    """
+    states = {}
+    reused = {}
+    for collection in collections:
+        states[collection] = {
+            'db1': collection_state(client1, table1[collection], collection),
+            'db2': collection_state(client2, table2[collection], collection),
+        }
+        previous = snapshot.load_outcome(snapshot_key(collection), collection, states[collection])
+        if previous is not None:
+            reused[collection] = previous
+    return states, reused
+
+def compare_documents(client1, client2, collections, report, differ, reused=None):
+    """Diff the contents of each collection, reporting every differing key and per-collection totals.
+
+    A collection in reused (a snapshot outcome from an earlier run) is not diffed again;
+    its stored keys are reported instead. A collection whose diff raises (e.g. keys out of
+    the expected order) is reported as failed and the others are still compared.
+
+    Returns the outcome of each diffed collection, in the form the snapshot stores, and a
+    {collection: error} dict of the failed ones.
+    """
+    reused = reused or {}
+    outcomes = {}
+    failed = {}
+    report.emit({'report': 'documents', 'event': 'report_started'})
+    for collection in collections:
+        report.emit({'report': 'documents', 'event': 'collection_started', 'collection': collection})
+        previous = reused.get(collection)
+        if previous is not None:
+            for status, key in previous['keys']:
+                report.emit({'report': 'documents', 'event': 'document_difference', 'collection': collection,
+                             'status': status, 'key': key})
+            report.emit(dict(previous['counts'], report='documents', event='document_totals', collection=collection,
+                             reused_from=previous['taken_at'], omitted=previous['omitted']))
+            continue
+
+        counts = {'added': 0, 'removed': 0, 'changed': 0}
+        keys = []
+        try:
+            for status, key in differ(client1, client2, collection):
+                counts[status] += 1
+                if len(keys) < SNAPSHOT_KEY_LIMIT:
+                    keys.append((status, key))
+                report.emit({'report': 'documents', 'event': 'document_difference', 'collection': collection,
+                             'status': status, 'key': key})
+        except Exception as exc:
+            failed[collection] = f"{type(exc).__name__}: {exc}"
+            report.emit({'report': 'documents', 'event': 'collection_failed', 'collection': collection,
+                         'error': failed[collection]})
+            continue
+        differences = sum(counts.values())
+        outcomes[collection] = {'differs': bool(differences), 'counts': counts, 'keys': keys,
+                                'omitted': differences - len(keys)}
+        report.emit(dict(counts, report='documents', event='document_totals', collection=collection,
+                         reused_from=None))
+    return outcomes, failed
+
+def compare_databases(client1, client2, summary1: Dict[str, Any], summary2: Dict[str, Any], log_dir: str,
+                      depth: str = 'count', batch_size: int = 1000, hash_mode: str = 'content',
+                      snapshot=None, checksum_with_revisions: bool = False, checksum_with_data: bool = True,
+                      scan_ranges: int = 1, scan_processes: Optional[int] = None,
+                      scan_state_dir: Optional[str] = None, quiet: bool = False, extra_sinks=None,
+                      output_formats=('markdown',), report_label: Optional[str] = None,
+                      profiler=None, drift_threshold: float = 0.0, sample_size: int = 1000,
+                      sample_strata: int = 1, sample_confidence: float = 0.95,
+                      collection_depths=None, compare_graphs: bool = False,
+                      check_dangling_edges: bool = False) -> Dict[str, Any]:
+    """Compare two summaries, writing the reports to a timestamped directory under log_dir.
+
+    report_label is added to the directory name to keep several comparisons of the same
+    database apart. With a profile.Profiler, the duration of each phase is recorded in it.
+    Collections whose only difference is a document count drift below drift_threshold
+    percent are listed as tolerated and not compared further. The sample depth checks
+    sample_size documents per collection, drawn from sample_strata key ranges. A
+    filters.CollectionDepths in collection_depths overrides depth for the collections it matches.
+    With compare_graphs, the edges of the graphs defined on both servers are compared as well.
+
+    Returns the collection-level differences together with the report directory.
+    """
+    for requested in [depth] + (collection_depths.depths() if collection_depths else []):
+        if requested not in DEPTHS:
+            raise ValueError(f"Unknown comparison depth '{requested}', expected one of {DEPTHS}")
+
+    table1 = CollectionTable.from_details(summary1['collection_details'])
+    table2 = CollectionTable.from_details(summary2['collection_details'])
+
+    unique_to_db1 = table1.keys() - table2.keys()
+    unique_to_db2 = table2.keys() - table1.keys()
+    matching_collections = table1.keys() & table2.keys()
 
     db_name = summary1['db_name']
     date_str = datetime.datetime.now().strftime('%Y-%m-%d-%H-%M')
-    log_subdir = os.path.join(log_dir, f"{db_name}-{date_str}")
+    subdir_name = f"{db_name}-{report_label}-{date_str}" if report_label else f"{db_name}-{date_str}"
+    log_subdir = os.path.join(log_dir, subdir_name)
     os.makedirs(log_subdir, exist_ok=True)
-    output_file = os.path.join(log_subdir, "summary.md")
-
-    output = open(output_file, 'w') if output_file else None
-
-    compare_entities(summary1['analyzers'], summary2['analyzers'], 'analyzers', log_subdir)
-    compare_entities(summary1['graphs'], summary2['graphs'], 'graphs', log_subdir)
-    compare_entities(summary1['views'], summary2['views'], 'views', log_subdir)
-    # compare_entities(summary1['indexes'], summary2['indexes'], 'indexes', log_subdir)
-
-    print_and_write("# Document Checks", output)
-    print_and_write(f"\nComparing collections in database on servers **{summary1['db_name']}** and **{summary2['db_name']}**...\n", output)
-
-    for collection in matching_collections:
-        details1 = summary1['collection_details'][collection]
-        details2 = summary2['collection_details'][collection]
-        if details1['document_count'] != details2['document_count'] or details1['index_count'] != details2['index_count']:
-            mismatched_collections.append(collection)
-            print_and_write(f"\nCollection name: {collection}", output)
-            print_and_write(f"  Server1 - Document count: {details1['document_count']}, Index count: {details1['index_count']}", output)
-            print_and_write(f"  Server2 - Document count: {details2['document_count']}, Index count: {details2['index_count']}", output)
-
-    print_and_write("# Summary of Differences", output)
-
-    print_and_write(f"\n**Number of collections in DB1 not in DB2:** {len(unique_to_db1)}", output)
-    if unique_to_db1:
-        print_and_write("### Collections unique to DB1:", output)
-        for collection in unique_to_db1:
-            print_and_write(f"- {collection}", output)
-
-    print_and_write(f"\n**Number of collections in DB2 not in DB1:** {len(unique_to_db2)}", output)
-    if unique_to_db2:
-        print_and_write("### Collections unique to DB2:", output)
-        for collection in unique_to_db2:
-            print_and_write(f"- {collection}", output)
-
-    print_and_write(f"\n**Number of collections with mismatched document or index counts:** {len(mismatched_collections)}", output)
-    if mismatched_collections:
-        print_and_write("### Collections with mismatched counts:", output)
+    report = build_sinks(log_subdir, quiet, extra_sinks, output_formats)
+    try:
+        with phase(profiler, 'entities'):
+            compare_entities(summary1['analyzers'], summary2['analyzers'], 'analyzers', report)
+            compare_entities(summary1['graphs'], summary2['graphs'], 'graphs', report)
+            compare_entities(summary1['views'], summary2['views'], 'views', report)
+        with phase(profiler, 'indexes'):
+            index_mismatches = compare_indexes(summary1, summary2, sorted(matching_collections), report)
+
+        report.emit({'report': 'summary', 'event': 'comparison_started',
+                     'db1': summary1['db_name'], 'db2': summary2['db_name']})
+
+        tiers = []
+        start = time.perf_counter()
+        counts = compare_counts(table1, table2, sorted(matching_collections), drift_threshold)
+        mismatched_collections = counts['count_mismatches']
+        count_mismatches = counts['document_mismatches']
         for collection in mismatched_collections:
-            print_and_write(f"- {collection}", output)
+            report.emit(dict(counts['details'][collection], report='summary', event='count_mismatch',
+                             collection=collection))
+        tiers.append(('count', len(matching_collections), len(count_mismatches), time.perf_counter() - start))
+
+        # Each collection goes as deep as its own depth: the global one unless a rule overrides it.
+        depth_of = {collection: collection_depths.depth_for(collection, depth) if collection_depths else depth
+                    for collection in matching_collections}
+        depths = set(depth_of.values()) | {depth}
+        deepest = max(depths, key=DEPTHS.index)
+        # Collections with different document counts already differ; only the rest need their contents checked.
+        candidates = sorted(matching_collections - set(count_mismatches) - set(counts['tolerated']))
+        content_mismatches = list(count_mismatches)
+
+        states = {}
+        reused = {}
+        if snapshot is not None and DEPTHS.index(deepest) >= DEPTHS.index('checksum'):
+            start = time.perf_counter()
+            pair = f"{client1.url}/{summary1['db_name']}|{client2.url}/{summary2['db_name']}"
+            snapshot_key = lambda collection: f"{pair}|{depth_of[collection]}:{hash_mode}"
+            # Count mismatches already differ; only a key-level diff of them is worth reusing.
+            looked_up = ([collection for collection in candidates
+                          if DEPTHS.index(depth_of[collection]) >= DEPTHS.index('checksum')] +
+                         [collection for collection in count_mismatches if depth_of[collection] in ('hash', 'documents')])
+            states, reused = load_snapshot_outcomes(client1, client2, table1, table2, looked_up, snapshot, snapshot_key)
+            candidates = [collection for collection in candidates if collection not in reused]
+            content_mismatches += [collection for collection, outcome in reused.items()
+                                   if outcome['differs'] and collection not in count_mismatches]
+            unchanged_and_equal = sum(1 for outcome in reused.values() if not outcome['differs'])
+            tiers.append(('snapshot', len(looked_up), len(looked_up) - unchanged_and_equal,
+                          time.perf_counter() - start))
+
+        if 'sample' in depths:
+            start = time.perf_counter()
+            sampled = [collection for collection in candidates if depth_of[collection] == 'sample']
+            sample_mismatches = compare_samples(client1, client2, sampled, report, table1, sample_size,
+                                                sample_strata, sample_confidence, batch_size)
+            content_mismatches += sample_mismatches
+            tiers.append(('sample', len(sampled), len(sample_mismatches), time.perf_counter() - start))
+
+        if DEPTHS.index(deepest) >= DEPTHS.index('checksum'):
+            start = time.perf_counter()
+            checksummed = [collection for collection in candidates
+                           if DEPTHS.index(depth_of[collection]) >= DEPTHS.index('checksum')]
+            checksum_mismatches = compare_checksums(client1, client2, checksummed,
+                                                    checksum_with_revisions, checksum_with_data)
+            content_mismatches += checksum_mismatches
+            tiers.append(('checksum', len(checksummed), len(checksum_mismatches), time.perf_counter() - start))
+        content_mismatches.sort()
+
+        failed_collections = {}
+        outcomes = {}
+
+        for deep_depth in ('hash', 'documents'):
+            if deep_depth not in depths:
+                continue
+            start = time.perf_counter()
+            escalated = [collection for collection in content_mismatches if depth_of[collection] == deep_depth]
+            differ = collection_differ(deep_depth, batch_size, hash_mode, scan_ranges, scan_processes, scan_state_dir,
+                                       report, table1)
+            diffed, failed = compare_documents(client1, client2, escalated, report, differ, reused)
+            outcomes.update(diffed)
+            failed_collections.update(failed)
+            confirmed = [collection for collection in escalated
+                         if collection in diffed and diffed[collection]['differs'] or collection in reused]
+            # A failed collection is not cleared: the cheaper tier already found it differing.
+            cleared = set(escalated) - set(confirmed) - set(failed)
+            content_mismatches = [collection for collection in content_mismatches if collection not in cleared]
+            tiers.append((deep_depth, len(escalated), len(confirmed), time.perf_counter() - start))
 
-    print_and_write("# Overall Feature Counts", output)
-    print_and_write(f"{'Feature':<30} {'DB1':>20} {'DB2':>20}", output)
-    print_and_write("-"*80, output)
-    print_and_write(f"{'Total collections':<30} {summary1['total_collections']:>20} {summary2['total_collections']:>20}", output)
-    print_and_write(f"{'Total documents':<30} {summary1['total_documents']:>20} {summary2['total_documents']:>20}", output)
-    print_and_write(f"{'Total indexes':<30} {summary1['total_indexes']:>20} {summary2['total_indexes']:>20}", output)
-    print_and_write(f"{'Total graphs':<30} {summary1['total_graphs']:>20} {summary2['total_graphs']:>20}", output)
-    print_and_write(f"{'Total analyzers':<30} {summary1['total_analyzers']:>20} {summary2['total_analyzers']:>20}", output)
-    print_and_write(f"{'Total views':<30} {summary1['total_views']:>20} {summary2['total_views']:>20}", output)
+        for collection, state in states.items():
+            if collection in reused or collection in failed_collections:
+                continue
+            outcome = outcomes.get(collection) or {'differs': collection in content_mismatches, 'counts': None,
+                                                   'keys': [], 'omitted': 0}
+            snapshot.save_outcome(snapshot_key(collection), collection, state, outcome)
 
-    if output:
-        output.close()
+        topology_mismatches = None
+        if compare_graphs:
+            from .graphs import compare_graph_topology
+            with phase(profiler, 'graphs'):
+                topology_mismatches = compare_graph_topology(client1, client2, summary1['graphs'], summary2['graphs'],
+                                                             table1, table2, report, batch_size,
+                                                             check_dangling_edges)
 
+        differences = {
+            'unique_to_db1': sorted(unique_to_db1),
+            'unique_to_db2': sorted(unique_to_db2),
+            'count_mismatches': mismatched_collections,
+            'index_mismatches': index_mismatches,
+            'content_mismatches': content_mismatches if deepest != 'count' else None,
+            'tolerated_drift': counts['tolerated'],
+            'topology_mismatches': topology_mismatches,
+            'failed_collections': sorted(failed_collections),
+        }
+        report.emit(dict(differences, report='summary', event='difference_summary'))
+        report.emit({
+            'report': 'summary', 'event': 'tiers',
+            'tiers': [{'tier': tier, 'checked': checked, 'differing': differing, 'seconds': seconds}
+                      for tier, checked, differing, seconds in tiers],
+        })
+        report.emit({
+            'report': 'summary', 'event': 'feature_counts',
+            'db1': {key: summary1[key] for key in TOTALS},
+            'db2': {key: summary2[key] for key in TOTALS},
+        })
+    finally:
+        with phase(profiler, 'report'):
+            report.close()
+    if profiler is not None:
+        for tier, _, _, seconds in tiers:
+            profiler.record_phase(f"tier:{tier}", seconds)
 
+    return dict(differences, db1=summary1['db_name'], db2=summary2['db_name'], report_dir=log_subdir)
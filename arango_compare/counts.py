@@ -0,0 +1,95 @@
+import math
+from array import array
+from typing import Any, Dict, List
+
+# numpy is optional and imported on first use: the array fallback gives the same results,
+# and below NUMPY_MIN_ROWS rows it is faster than importing numpy at all.
+NUMPY_MIN_ROWS = 10000
+_NOT_LOADED = object()
+numpy = _NOT_LOADED
+
+def load_numpy():
+    """The numpy module, or None when it is not installed."""
+    global numpy
+    if numpy is _NOT_LOADED:
+        try:
+            import numpy as module
+        except ImportError:
+            module = None
+        numpy = module
+    return numpy
+
+def use_numpy(rows: int) -> bool:
+    return rows >= max(1, NUMPY_MIN_ROWS) and load_numpy() is not None
+
+def column_total(column: array) -> int:
+    """Sum of an array('q') column."""
+    if use_numpy(len(column)):
+        return int(numpy.frombuffer(column, dtype=numpy.int64).sum())
+    return sum(column)
+
+def compare_counts(table1, table2, names: List[str], drift_threshold: float = 0.0) -> Dict[str, Any]:
+    """Compare the count columns of two CollectionTables for the given collections at once.
+
+    The rows of both tables are aligned by name, then document and index count
+    mismatches, document deltas (db2 - db1) and drift as a percentage of db1's count are
+    computed column-wise. A collection whose index counts match and whose document drift
+    is below drift_threshold percent is tolerated rather than reported as a mismatch.
+
+    Returns the mismatched collections (document or index counts differ), the subset
+    whose document counts differ, the tolerated ones, and per-collection details for
+    both groups; collections keep the order of names.
+    """
+    if use_numpy(len(names)):
+        columns = _numpy_columns(table1, table2, names, drift_threshold)
+    else:
+        columns = _array_columns(table1, table2, names, drift_threshold)
+    documents1, documents2, indexes1, indexes2, drift, flagged, tolerated_flags = columns
+
+    result = {'count_mismatches': [], 'document_mismatches': [], 'tolerated': [], 'details': {}}
+    for i in flagged:
+        name = names[i]
+        details = {
+            'db1': {'document_count': int(documents1[i]), 'index_count': int(indexes1[i])},
+            'db2': {'document_count': int(documents2[i]), 'index_count': int(indexes2[i])},
+            'document_delta': int(documents2[i] - documents1[i]),
+            # None when db1 is empty, where a percentage means nothing.
+            'drift_percent': float(drift[i]) if math.isfinite(drift[i]) else None,
+        }
+        result['details'][name] = details
+        if tolerated_flags[i]:
+            result['tolerated'].append(name)
+            continue
+        result['count_mismatches'].append(name)
+        if details['document_delta']:
+            result['document_mismatches'].append(name)
+    return result
+
+def _numpy_columns(table1, table2, names, drift_threshold):
+    rows1 = numpy.fromiter((table1.row(name) for name in names), dtype=numpy.int64, count=len(names))
+    rows2 = numpy.fromiter((table2.row(name) for name in names), dtype=numpy.int64, count=len(names))
+    documents1 = numpy.frombuffer(table1.document_counts, dtype=numpy.int64)[rows1]
+    documents2 = numpy.frombuffer(table2.document_counts, dtype=numpy.int64)[rows2]
+    indexes1 = numpy.frombuffer(table1.index_counts, dtype=numpy.int64)[rows1]
+    indexes2 = numpy.frombuffer(table2.index_counts, dtype=numpy.int64)[rows2]
+
+    delta = numpy.abs(documents2 - documents1)
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        drift = numpy.where(delta == 0, 0.0, delta * 100.0 / documents1)
+    index_mismatch = indexes1 != indexes2
+    flagged = numpy.flatnonzero((delta != 0) | index_mismatch)
+    tolerated = ~index_mismatch & (drift < drift_threshold)
+    return documents1, documents2, indexes1, indexes2, drift, flagged.tolist(), tolerated
+
+def _array_columns(table1, table2, names, drift_threshold):
+    documents1 = array('q', (table1.document_count(name) for name in names))
+    documents2 = array('q', (table2.document_count(name) for name in names))
+    indexes1 = array('q', (table1.index_count(name) for name in names))
+    indexes2 = array('q', (table2.index_count(name) for name in names))
+
+    drift = [0.0 if d1 == d2 else (abs(d2 - d1) * 100.0 / d1 if d1 else math.inf)
+             for d1, d2 in zip(documents1, documents2)]
+    flagged = [i for i, (d1, d2, i1, i2) in enumerate(zip(documents1, documents2, indexes1, indexes2))
+               if d1 != d2 or i1 != i2]
+    tolerated = [i1 == i2 and d < drift_threshold for i1, i2, d in zip(indexes1, indexes2, drift)]
+    return documents1, documents2, indexes1, indexes2, drift, flagged, tolerated
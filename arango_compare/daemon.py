@@ -0,0 +1,177 @@
+import datetime
+import json
+import threading
+import time
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Optional, Tuple
+from .profile import Profiler, render_openmetrics
+
+# Difference categories of a compare_databases result, in report order.
+CATEGORIES = ('unique_to_db1', 'unique_to_db2', 'count_mismatches', 'index_mismatches', 'content_mismatches',
+              'topology_mismatches')
+
+def differing_collections(results) -> Dict[str, set]:
+    """Map '<db1>|<db2>' to the set of (category, collection) differences of each compared pair."""
+    differing = {}
+    for result in results if isinstance(results, list) else [results]:
+        if 'error' in result:
+            continue
+        key = f"{result['db1']}|{result.get('target', result['db2'])}"
+        differing[key] = {(category, collection) for category in CATEGORIES
+                          for collection in result.get(category) or ()}
+    return differing
+
+def drift_status(results, previous: Optional[Dict[str, set]] = None) -> Tuple[Dict[str, Any], Dict[str, set]]:
+    """Condense one run's results into per-category counts, errors and what changed since the previous run.
+
+    previous is the second value returned for the previous run; it is returned again so the
+    caller can keep it for the next one.
+    """
+    results = results if isinstance(results, list) else [results]
+    current = differing_collections(results)
+    counts = {category: 0 for category in CATEGORIES}
+    for differences in current.values():
+        for category, _ in differences:
+            counts[category] += 1
+    status = {
+        'drift': any(counts.values()),
+        'differences': counts,
+        'errors': [result['error'] for result in results if 'error' in result],
+        'failed_collections': {f"{result['db1']}|{result.get('target', result['db2'])}": result['failed_collections']
+                               for result in results if result.get('failed_collections')},
+        'new_differences': {},
+        'resolved_differences': {},
+    }
+    if previous is not None:
+        for key, differences in current.items():
+            before = previous.get(key, set())
+            new = sorted(f"{category}: {collection}" for category, collection in differences - before)
+            resolved = sorted(f"{category}: {collection}" for category, collection in before - differences)
+            if new:
+                status['new_differences'][key] = new
+            if resolved:
+                status['resolved_differences'][key] = resolved
+    return status, current
+
+class ComparisonDaemon:
+    """Re-runs a comparison every interval seconds and serves the latest drift status over HTTP.
+
+    run_comparison is called with no arguments and returns what compare_databases,
+    compare_database_pairs or compare_one_to_many return; the clients it closes over stay
+    alive between runs, so their connection pools stay warm. GET /status returns the
+    latest status as JSON, GET /metrics returns it in OpenMetrics text format together with
+    the request profile of the run in progress or last finished, and GET /healthz answers
+    once the server is up.
+    """
+
+    def __init__(self, run_comparison: Callable[[], Any], interval: float, host: str = '0.0.0.0',
+                 port: Optional[int] = None, profiler: Optional[Profiler] = None):
+        self.run_comparison = run_comparison
+        self.interval = interval
+        self.profiler = profiler
+        self.status: Dict[str, Any] = {'runs': 0, 'failures': 0, 'last_run': None}
+        self._previous: Optional[Dict[str, set]] = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class()) if port is not None else None
+
+    def run_once(self) -> Dict[str, Any]:
+        if self.profiler is not None:
+            self.profiler.reset()
+        started = datetime.datetime.now(datetime.timezone.utc)
+        start = time.perf_counter()
+        try:
+            status, self._previous = drift_status(self.run_comparison(), self._previous)
+            status['ok'] = True
+        except Exception as exc:
+            traceback.print_exc()
+            status = {'ok': False, 'error': f"{type(exc).__name__}: {exc}"}
+        status.update(started_at=started.isoformat(), seconds=time.perf_counter() - start)
+        with self._lock:
+            self.status['runs'] += 1
+            self.status['failures'] += 0 if status['ok'] else 1
+            self.status['last_run'] = status
+        return status
+
+    def serve_forever(self) -> None:
+        if self._httpd is not None:
+            threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        try:
+            while not self._stopped.is_set():
+                start = time.monotonic()
+                self.run_once()
+                self._stopped.wait(max(0.0, self.interval - (time.monotonic() - start)))
+        finally:
+            if self._httpd is not None:
+                self._httpd.shutdown()
+                self._httpd.server_close()
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    @property
+    def server_address(self):
+        return self._httpd.server_address if self._httpd is not None else None
+
+    def current_status(self) -> Dict[str, Any]:
+        with self._lock:
+            return json.loads(json.dumps(self.status))
+
+    def render_metrics(self) -> str:
+        status = self.current_status()
+        last_run = status['last_run'] or {}
+        lines = [
+            "# TYPE arangocompare_runs counter",
+            f"arangocompare_runs_total {status['runs']}",
+            "# TYPE arangocompare_run_failures counter",
+            f"arangocompare_run_failures_total {status['failures']}",
+        ]
+        if last_run:
+            started = datetime.datetime.fromisoformat(last_run['started_at']).timestamp()
+            lines += [
+                "# TYPE arangocompare_last_run_timestamp_seconds gauge",
+                f"arangocompare_last_run_timestamp_seconds {started:.3f}",
+                "# TYPE arangocompare_last_run_duration_seconds gauge",
+                f"arangocompare_last_run_duration_seconds {last_run['seconds']:.3f}",
+            ]
+        if last_run.get('ok'):
+            lines += ["# TYPE arangocompare_drift gauge", f"arangocompare_drift {int(last_run['drift'])}",
+                      "# TYPE arangocompare_differences gauge"]
+            lines += [f'arangocompare_differences{{category="{category}"}} {count}'
+                      for category, count in last_run['differences'].items()]
+            lines += ["# TYPE arangocompare_pair_errors gauge",
+                      f"arangocompare_pair_errors {len(last_run['errors'])}"]
+        text = '\n'.join(lines) + '\n'
+        if self.profiler is not None:
+            return text + render_openmetrics(self.profiler.summary())
+        return text + "# EOF\n"
+
+    def _handler_class(self):
+        daemon = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path == '/status':
+                    self._send(200, 'application/json', json.dumps(daemon.current_status()))
+                elif self.path == '/metrics':
+                    self._send(200, 'application/openmetrics-text; version=1.0.0; charset=utf-8',
+                               daemon.render_metrics())
+                elif self.path == '/healthz':
+                    self._send(200, 'text/plain', 'ok\n')
+                else:
+                    self._send(404, 'text/plain', 'not found\n')
+
+            def _send(self, status: int, content_type: str, body: str):
+                data = body.encode()
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
@@ -0,0 +1,103 @@
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+# List items carrying one of these attributes are matched by it instead of by position.
+IDENTITY_KEYS = ('name', 'collection')
+
+def diff_entities(entity1_list: List[Dict[str, Any]], entity2_list: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Compare two lists of named entities in one pass.
+
+    Returns the names only in each list and, for entities present in both, the list of
+    path-level changes produced by deep_diff.
+    """
+    entity1_dict = {entity['name']: entity for entity in entity1_list}
+    entity2_dict = {entity['name']: entity for entity in entity2_list}
+    result = {'only_in_db1': [], 'only_in_db2': [], 'changed': {}}
+    for name, entity1 in entity1_dict.items():
+        entity2 = entity2_dict.get(name)
+        if entity2 is None:
+            result['only_in_db1'].append(name)
+            continue
+        changes = deep_diff(entity1, entity2)
+        if changes:
+            result['changed'][name] = changes
+    result['only_in_db2'] = [name for name in entity2_dict if name not in entity1_dict]
+    return result
+
+def deep_diff(value1: Any, value2: Any, path: str = '') -> List[Dict[str, Any]]:
+    """Return the changes between two JSON-like values as {'path', 'kind', 'db1', 'db2'} records.
+
+    kind is 'changed' for differing values, 'removed'/'added' for dict keys or
+    identified list items present on one side only, and 'items' for unordered lists
+    of scalars, where db1/db2 hold the items found only on that side.
+    """
+    changes: List[Dict[str, Any]] = []
+    _diff(value1, value2, path, changes)
+    return changes
+
+def _diff(value1: Any, value2: Any, path: str, changes: List[Dict[str, Any]]) -> None:
+    if value1 == value2:
+        return
+    if isinstance(value1, dict) and isinstance(value2, dict):
+        for key in value1:
+            child = f"{path}.{key}" if path else str(key)
+            if key not in value2:
+                changes.append({'path': child, 'kind': 'removed', 'db1': value1[key], 'db2': None})
+            else:
+                _diff(value1[key], value2[key], child, changes)
+        for key in value2:
+            if key not in value1:
+                child = f"{path}.{key}" if path else str(key)
+                changes.append({'path': child, 'kind': 'added', 'db1': None, 'db2': value2[key]})
+    elif isinstance(value1, list) and isinstance(value2, list):
+        _diff_lists(value1, value2, path, changes)
+    else:
+        changes.append({'path': path, 'kind': 'changed', 'db1': value1, 'db2': value2})
+
+def _diff_lists(list1: List[Any], list2: List[Any], path: str, changes: List[Dict[str, Any]]) -> None:
+    identity = _identity_key(list1, list2)
+    if identity is not None:
+        items1 = {item[identity]: item for item in list1}
+        items2 = {item[identity]: item for item in list2}
+        for item_id, item in items1.items():
+            child = f"{path}[{item_id}]"
+            if item_id not in items2:
+                changes.append({'path': child, 'kind': 'removed', 'db1': item, 'db2': None})
+            else:
+                _diff(item, items2[item_id], child, changes)
+        for item_id, item in items2.items():
+            if item_id not in items1:
+                changes.append({'path': f"{path}[{item_id}]", 'kind': 'added', 'db1': None, 'db2': item})
+    elif all(_is_scalar(item) for item in list1 + list2):
+        # Scalar lists (features, from/to collections, ...) are treated as unordered.
+        counts1 = Counter(list1)
+        counts2 = Counter(list2)
+        if counts1 != counts2:
+            changes.append({
+                'path': path,
+                'kind': 'items',
+                'db1': sorted((counts1 - counts2).elements(), key=repr),
+                'db2': sorted((counts2 - counts1).elements(), key=repr),
+            })
+    elif len(list1) != len(list2):
+        changes.append({'path': path, 'kind': 'changed', 'db1': list1, 'db2': list2})
+    else:
+        for index, (item1, item2) in enumerate(zip(list1, list2)):
+            _diff(item1, item2, f"{path}[{index}]", changes)
+
+def _identity_key(list1: List[Any], list2: List[Any]) -> Optional[str]:
+    """Pick an attribute that names every item uniquely on both sides, if there is one."""
+    if not list1 + list2 or not all(isinstance(item, dict) for item in list1 + list2):
+        return None
+    for key in IDENTITY_KEYS:
+        usable = True
+        for items in (list1, list2):
+            values = [item.get(key) for item in items]
+            if not all(_is_scalar(value) and value is not None for value in values) or len(set(values)) != len(values):
+                usable = False
+        if usable:
+            return key
+    return None
+
+def _is_scalar(value: Any) -> bool:
+    return value is None or isinstance(value, (str, int, float, bool))
@@ -0,0 +1,194 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# System attributes that legitimately differ between two servers holding the same data.
+IGNORED_FIELDS = ('_id', '_rev')
+
+def document_digest(document: Dict[str, Any]) -> str:
+    content = {key: value for key, value in document.items() if key not in IGNORED_FIELDS}
+    encoded = json.dumps(content, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha1(encoded.encode('utf-8')).hexdigest()
+
+def stream_document_digests(client, collection_name: str, batch_size: int = 1000, lower: Optional[str] = None,
+                            upper: Optional[str] = None) -> Iterator[Tuple[str, str]]:
+    """Yield (key, digest) for every document in a collection (or _key range), in the server's _key order.
+
+    The merge-join relies on the server sorting keys the same way Python compares
+    strings, so an out-of-order key is an error rather than a silent misreport.
+    """
+    previous_key = None
+    for document in client.stream_documents(collection_name, batch_size=batch_size, lower=lower, upper=upper):
+        key = document['_key']
+        if previous_key is not None and key < previous_key:
+            raise ValueError(f"Collection '{collection_name}' returned key '{key}' after '{previous_key}'")
+        previous_key = key
+        yield key, document_digest(document)
+
+def diff_documents(stream1: Iterable[Tuple[str, str]], stream2: Iterable[Tuple[str, str]]) -> Iterator[Tuple[str, str]]:
+    """Merge-join two key-ordered (key, digest) streams.
+
+    Yields ('removed', key) for keys only in the first stream, ('added', key) for keys
+    only in the second and ('changed', key) for keys whose digests differ. Only the
+    current item of each stream is held in memory.
+    """
+    it1 = iter(stream1)
+    it2 = iter(stream2)
+    item1 = next(it1, None)
+    item2 = next(it2, None)
+    while item1 is not None and item2 is not None:
+        key1, digest1 = item1
+        key2, digest2 = item2
+        if key1 == key2:
+            if digest1 != digest2:
+                yield 'changed', key1
+            item1 = next(it1, None)
+            item2 = next(it2, None)
+        elif key1 < key2:
+            yield 'removed', key1
+            item1 = next(it1, None)
+        else:
+            yield 'added', key2
+            item2 = next(it2, None)
+    while item1 is not None:
+        yield 'removed', item1[0]
+        item1 = next(it1, None)
+    while item2 is not None:
+        yield 'added', item2[0]
+        item2 = next(it2, None)
+
+def compare_collection_documents(client1, client2, collection_name: str, batch_size: int = 1000) -> Iterator[Tuple[str, str]]:
+    return diff_documents(
+        stream_document_digests(client1, collection_name, batch_size),
+        stream_document_digests(client2, collection_name, batch_size),
+    )
+
+def split_key_ranges(keys: Iterable[str], ranges: int) -> List[Tuple[Optional[str], Optional[str]]]:
+    """Split the _key space into (lower, upper) ranges holding about equal shares of the given random keys.
+
+    The first range has no lower bound and the last no upper bound, so together they
+    cover every key on either server.
+    """
+    if ranges <= 1:
+        return [(None, None)]
+    keys = sorted(set(keys))
+    boundaries = sorted(set(keys[len(keys) * i // ranges] for i in range(1, ranges))) if keys else []
+    bounds = [None] + boundaries + [None]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def sample_key_ranges(client, collection_name: str, ranges: int, population: int,
+                      sample_size: Optional[int] = None) -> List[Tuple[Optional[str], Optional[str]]]:
+    """Split the _key space of a collection of about population documents into roughly equal ranges."""
+    if ranges <= 1:
+        return [(None, None)]
+    return split_key_ranges(client.sample_keys(collection_name, sample_size or ranges * 32, population), ranges)
+
+def diff_key_range(client1, client2, collection_name: str, lower: Optional[str], upper: Optional[str],
+                   batch_size: int, out_path: str) -> Dict[str, int]:
+    """Diff one _key range, writing 'status<TAB>key' lines to out_path and returning the totals."""
+    counts = {'added': 0, 'removed': 0, 'changed': 0}
+    with open(out_path, 'w') as out:
+        for status, key in diff_documents(
+            stream_document_digests(client1, collection_name, batch_size, lower, upper),
+            stream_document_digests(client2, collection_name, batch_size, lower, upper),
+        ):
+            counts[status] += 1
+            out.write(f"{status}\t{key}\n")
+    return counts
+
+def scan_state_path(state_dir: str, client1, client2, collection_name: str) -> str:
+    """Where the resumable state of one collection's scan lives, apart from every other server pair and database."""
+    pair = f"{client1.url}/{client1.db_name}|{client2.url}/{client2.db_name}"
+    return os.path.join(state_dir, hashlib.sha1(pair.encode('utf-8')).hexdigest()[:16], collection_name)
+
+def load_scan_ranges(ranges_file: str, revisions: List[str]) -> Optional[List[Tuple[Optional[str], Optional[str]]]]:
+    """The key ranges of an interrupted scan, or None if there is none or either collection changed since."""
+    if not os.path.exists(ranges_file):
+        return None
+    with open(ranges_file) as f:
+        state = json.load(f)
+    if not isinstance(state, dict) or state.get('revisions') != revisions:
+        return None
+    return [tuple(r) for r in state['ranges']]
+
+def compare_collection_documents_parallel(client1, client2, collection_name: str, ranges: int = 8,
+                                          processes: Optional[int] = None, batch_size: int = 1000,
+                                          state_dir: Optional[str] = None,
+                                          progress: Optional[Callable[[int, int], None]] = None,
+                                          population: Optional[int] = None) -> Iterator[Tuple[str, str]]:
+    """Diff a collection as concurrently scanned _key ranges, yielding the same results as diff_documents.
+
+    Each range is scanned in a worker process and writes its differences to its own file,
+    so the parent never holds more than one line. With a state_dir, the chosen ranges, both
+    collections' revisions and every finished range are recorded in a directory of that
+    server pair, database and collection. A later run picks up from the ranges that had not
+    finished, unless either collection has changed since, in which case the state is
+    discarded. The state is removed once the collection is reported. progress is called
+    with the finished and total number of ranges. population is the document count of the
+    first collection, fetched if not given.
+    """
+    if state_dir:
+        work_dir = scan_state_path(state_dir, client1, client2, collection_name)
+        revisions = [client1.get_collection_revision(collection_name), client2.get_collection_revision(collection_name)]
+    else:
+        work_dir = tempfile.mkdtemp(prefix='arangocompare-')
+        revisions = None
+    ranges_file = os.path.join(work_dir, 'ranges.json')
+    progress_file = os.path.join(work_dir, 'progress.json')
+
+    # Ranges come from a random sample, so a resumed run must reuse the ones it started with.
+    key_ranges = load_scan_ranges(ranges_file, revisions) if state_dir else None
+    if key_ranges is None:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        os.makedirs(work_dir)
+        if population is None:
+            population = client1.get_collection_count(collection_name)
+        key_ranges = sample_key_ranges(client1, collection_name, ranges, population)
+        with open(ranges_file, 'w') as f:
+            json.dump({'revisions': revisions, 'ranges': key_ranges}, f)
+    finished = {}
+    if os.path.exists(progress_file):
+        with open(progress_file) as f:
+            finished = json.load(f)
+
+    pending = [i for i in range(len(key_ranges)) if str(i) not in finished]
+    if pending and progress is not None:
+        progress(len(finished), len(key_ranges))
+
+    def record(index, counts):
+        finished[str(index)] = counts
+        with open(progress_file, 'w') as f:
+            json.dump(finished, f)
+        if progress is not None:
+            progress(len(finished), len(key_ranges))
+
+    def range_args(index):
+        lower, upper = key_ranges[index]
+        return (client1, client2, collection_name, lower, upper, batch_size,
+                os.path.join(work_dir, f"range-{index}.tsv"))
+
+    if processes == 1:
+        for index in pending:
+            record(index, diff_key_range(*range_args(index)))
+    elif pending:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            futures = {executor.submit(diff_key_range, *range_args(index)): index for index in pending}
+            for future in as_completed(futures):
+                record(futures[future], future.result())
+
+    for index in range(len(key_ranges)):
+        with open(os.path.join(work_dir, f"range-{index}.tsv")) as f:
+            for line in f:
+                status, key = line.rstrip('\n').split('\t', 1)
+                yield status, key
+    shutil.rmtree(work_dir, ignore_errors=True)
+    if state_dir:
+        try:
+            # The server pair's directory, once its last collection is done.
+            os.rmdir(os.path.dirname(work_dir))
+        except OSError:
+            pass
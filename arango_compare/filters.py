@@ -0,0 +1,61 @@
+import fnmatch
+import re
+from typing import Iterable, List, Pattern, Tuple
+
+def compile_pattern(pattern: str) -> Pattern:
+    """'re:<regex>' is a regular expression searched for in the name; anything else is a glob matched against it."""
+    if pattern.startswith('re:'):
+        return re.compile(pattern[3:])
+    # fnmatch.translate anchors the end only.
+    return re.compile('^' + fnmatch.translate(pattern))
+
+def parse_patterns(spec: str) -> List[str]:
+    """Split a comma-separated pattern list such as 'staging_*, re:^tmp_[0-9]+$'."""
+    return [pattern.strip() for pattern in spec.split(',') if pattern.strip()]
+
+def parse_collection_depths(spec: str) -> List[Tuple[str, str]]:
+    """Split 'pattern=depth' pairs such as 'logs_*=count,orders=documents'."""
+    rules = []
+    for item in parse_patterns(spec):
+        pattern, separator, depth = item.rpartition('=')
+        if not separator:
+            raise ValueError(f"Expected 'pattern=depth', got '{item}'")
+        rules.append((pattern.strip(), depth.strip()))
+    return rules
+
+def matches_any(name: str, patterns: Iterable[Pattern]) -> bool:
+    return any(pattern.search(name) for pattern in patterns)
+
+class CollectionFilter:
+    """Decides which collections a client looks at, before any per-collection request is made.
+
+    A collection is kept if it matches at least one include pattern (or there are none),
+    matches no exclude pattern, and is not a system collection when skip_system is set.
+    """
+
+    def __init__(self, include: Iterable[str] = (), exclude: Iterable[str] = (), skip_system: bool = False):
+        self.include = [compile_pattern(pattern) for pattern in include]
+        self.exclude = [compile_pattern(pattern) for pattern in exclude]
+        self.skip_system = skip_system
+
+    def matches(self, name: str) -> bool:
+        if self.skip_system and name.startswith('_'):
+            return False
+        if self.include and not matches_any(name, self.include):
+            return False
+        return not matches_any(name, self.exclude)
+
+class CollectionDepths:
+    """Per-collection comparison depths: the first rule whose pattern matches a collection wins."""
+
+    def __init__(self, rules: Iterable[Tuple[str, str]] = ()):
+        self.rules = [(compile_pattern(pattern), depth) for pattern, depth in rules]
+
+    def depth_for(self, name: str, default: str) -> str:
+        for pattern, depth in self.rules:
+            if pattern.search(name):
+                return depth
+        return default
+
+    def depths(self) -> List[str]:
+        return [depth for _, depth in self.rules]
@@ -1,9 +1,247 @@
+import json
+import math
 import os
 
-def print_and_write(msg: str, output) -> None:
-    print(msg)
-    if output:
-        output.write(msg + '\n')
+# Titles written when a multi-section report starts.
+REPORT_TITLES = {
+    'indexes': "# Index Differences",
+    'documents': "# Document Differences",
+    'samples': "# Sampled Document Checks",
+    'topology': "# Graph Topology Differences",
+}
+
+# Counters of a topology_totals event; an edge collection with all of them zero matches. The
+# dangling counters are None when the dangling edge check was not run.
+TOPOLOGY_TOTALS = ('added', 'removed', 'changed', 'missing_vertices', 'dangling_db1', 'dangling_db2')
+
+FEATURES = (
+    ('Total collections', 'total_collections'),
+    ('Total documents', 'total_documents'),
+    ('Total indexes', 'total_indexes'),
+    ('Total graphs', 'total_graphs'),
+    ('Total analyzers', 'total_analyzers'),
+    ('Total views', 'total_views'),
+)
+
+def render_markdown(event):
+    """Render one report event as markdown text, or None if it has no markdown form."""
+    renderer = MARKDOWN_RENDERERS.get(event['event'])
+    return renderer(event) if renderer else None
+
+def render_console(event):
+    """Like render_markdown, but leaves out per-document lines and clean collections."""
+    if event['event'] in ('document_difference', 'collection_started', 'edge_difference', 'missing_vertex'):
+        return None
+    if event['event'] == 'scan_progress':
+        return f"Collection {event['collection']}: {event['done']}/{event['total']} key ranges done"
+    if event['event'] == 'collection_failed':
+        return f"\nCollection name: {event['collection']}\n  Comparison failed: {event['error']}"
+    if event['event'] == 'document_totals':
+        if not (event['added'] or event['removed'] or event['changed']):
+            return None
+        return f"\nCollection name: {event['collection']}\n  {format_document_totals(event)}"
+    if event['event'] == 'sample_result':
+        if not event['mismatched']:
+            return None
+        return f"\nCollection name: {event['collection']}\n  {format_sample_result(event)}"
+    if event['event'] == 'topology_totals':
+        if not any(event[key] for key in TOPOLOGY_TOTALS):
+            return None
+        return f"\nEdge collection: {event['collection']}\n  {format_topology_totals(event)}"
+    return render_markdown(event)
+
+def render_report_started(event):
+    return REPORT_TITLES.get(event['report'])
+
+def render_comparison_started(event):
+    return ("# Document Checks\n"
+            f"\nComparing collections in database on servers **{event['db1']}** and **{event['db2']}**...\n")
+
+def render_count_mismatch(event):
+    db1 = event['db1']
+    db2 = event['db2']
+    text = (f"\nCollection name: {event['collection']}\n"
+            f"  Server1 - Document count: {db1['document_count']}, Index count: {db1['index_count']}\n"
+            f"  Server2 - Document count: {db2['document_count']}, Index count: {db2['index_count']}")
+    if event.get('document_delta'):
+        drift = f" ({event['drift_percent']:.2f}%)" if event.get('drift_percent') is not None else ""
+        text += f"\n  Drift: {event['document_delta']:+} documents{drift}"
+    return text
+
+def render_difference_summary(event):
+    sections = [
+        ("Number of collections in DB1 not in DB2", "Collections unique to DB1", event['unique_to_db1']),
+        ("Number of collections in DB2 not in DB1", "Collections unique to DB2", event['unique_to_db2']),
+        ("Number of collections with mismatched document or index counts", "Collections with mismatched counts",
+         event['count_mismatches']),
+        ("Number of collections with differing index definitions", "Collections with differing index definitions",
+         event['index_mismatches']),
+    ]
+    if event.get('tolerated_drift'):
+        sections.append(("Number of collections with document drift under the threshold",
+                         "Collections with tolerated drift", event['tolerated_drift']))
+    if event.get('content_mismatches') is not None:
+        sections.append(("Number of collections with differing documents", "Collections with differing documents",
+                         event['content_mismatches']))
+    if event.get('failed_collections'):
+        sections.append(("Number of collections whose document comparison failed",
+                         "Collections whose document comparison failed (see documents.md)",
+                         event['failed_collections']))
+    if event.get('topology_mismatches') is not None:
+        sections.append(("Number of edge collections with differing graph topology",
+                         "Edge collections with differing graph topology", event['topology_mismatches']))
+
+    lines = ["# Summary of Differences"]
+    for label, heading, collections in sections:
+        lines.append(f"\n**{label}:** {len(collections)}")
+        if collections:
+            lines.append(f"### {heading}:")
+            lines.extend(f"- {collection}" for collection in collections)
+    return '\n'.join(lines)
+
+def render_tiers(event):
+    lines = [
+        "# Comparison Tiers",
+        f"{'Tier':<20} {'Checked':>12} {'Differing':>12} {'Cleared':>12} {'Seconds':>12}",
+        "-"*72,
+    ]
+    for tier in event['tiers']:
+        cleared = tier['checked'] - tier['differing']
+        lines.append(f"{tier['tier']:<20} {tier['checked']:>12} {tier['differing']:>12} {cleared:>12} {tier['seconds']:>12.2f}")
+    return '\n'.join(lines)
+
+def render_feature_counts(event):
+    lines = [
+        "# Overall Feature Counts",
+        f"{'Feature':<30} {'DB1':>20} {'DB2':>20}",
+        "-"*80,
+    ]
+    for label, key in FEATURES:
+        lines.append(f"{label:<30} {event['db1'][key]:>20} {event['db2'][key]:>20}")
+    return '\n'.join(lines)
+
+def render_entity_differences(event):
+    """Render the structured diff from diff.diff_entities as markdown."""
+    title = event['entity'].capitalize()
+    lines = [f"# {title} Differences"]
+
+    if event['only_in_db1']:
+        lines.append(f"\n## {title} only in DB1:")
+        lines.extend(f"- {name}" for name in event['only_in_db1'])
+
+    if event['only_in_db2']:
+        lines.append(f"\n## {title} only in DB2:")
+        lines.extend(f"- {name}" for name in event['only_in_db2'])
+
+    if event['changed']:
+        lines.append("\n## Difference Details")
+        for name, changes in event['changed'].items():
+            lines.append(f"\n### {title}: {name}")
+            lines.extend(format_change(change) for change in changes)
+    return '\n'.join(lines)
+
+def render_index_difference(event):
+    lines = [f"\n## Collection: {event['collection']}"]
+    for label, key in (('DB1', 'only_in_db1'), ('DB2', 'only_in_db2')):
+        if event[key]:
+            lines.append(f"### Indexes only in {label}:")
+            lines.extend(f"- {format_index(index)}" for index in event[key])
+    return '\n'.join(lines)
+
+def render_collection_started(event):
+    return f"\n## Collection: {event['collection']}"
+
+def render_document_difference(event):
+    return f"- {event['status']}: {event['key']}"
+
+def render_collection_failed(event):
+    return f"\nComparison failed, the differences above may be incomplete: {event['error']}"
+
+def render_document_totals(event):
+    text = f"\n{format_document_totals(event)}"
+    if event.get('reused_from'):
+        text = f"\nUnchanged since {event['reused_from']}, reusing its result.{text}"
+    if event.get('omitted'):
+        text += f"\n{event['omitted']} further differing keys were not kept in the snapshot and are not listed."
+    return text
+
+def render_sample_result(event):
+    return f"\n{format_sample_result(event)}"
+
+def format_sample_result(event) -> str:
+    population = event['population']
+    return (f"Sampled {event['sampled']} of {population} documents, {event['mismatched']} differ. "
+            f"Estimated mismatch rate {event['rate']:.3%} ({event['confidence']:.0%} interval "
+            f"{event['lower']:.3%} to {event['upper']:.3%}, about {math.floor(event['lower'] * population)} "
+            f"to {math.ceil(event['upper'] * population)} documents)")
+
+def render_edge_difference(event):
+    return f"- {event['status']}: {event['from']} -> {event['to']}"
+
+def render_missing_vertex(event):
+    return f"- vertex {event['vertex']} missing on {event['server'].upper()}"
+
+def render_dangling_edges(event):
+    lines = [f"\n{event['count']} dangling edges on {event['server'].upper()}:"]
+    lines.extend(f"- {example['from']} -> {example['to']} (missing: {', '.join(example['missing'])})"
+                 for example in event['examples'])
+    if event['count'] > len(event['examples']):
+        lines.append(f"- ... and {event['count'] - len(event['examples'])} more")
+    return '\n'.join(lines)
+
+def render_topology_totals(event):
+    return f"\nGraphs: {', '.join(event['graphs'])}\n{format_topology_totals(event)}"
+
+def format_topology_totals(event) -> str:
+    text = (f"Edges added in DB2: {event['added']}, Removed from DB2: {event['removed']}, "
+            f"Changed multiplicity: {event['changed']}, Missing vertices: {event['missing_vertices']}")
+    if event['dangling_db1'] is None:
+        return text
+    return f"{text}, Dangling edges: {event['dangling_db1']} in DB1, {event['dangling_db2']} in DB2"
+
+def format_document_totals(event) -> str:
+    return f"Added in DB2: {event['added']}, Removed from DB2: {event['removed']}, Changed: {event['changed']}"
+
+def format_change(change) -> str:
+    if change['kind'] == 'items':
+        return (f"- **{change['path']}** (unordered):\n"
+                f"  - Only in DB1: {change['db1']}\n  - Only in DB2: {change['db2']}")
+    if change['kind'] == 'removed':
+        return f"- **{change['path']}**: only in DB1\n  - DB1: {change['db1']}"
+    if change['kind'] == 'added':
+        return f"- **{change['path']}**: only in DB2\n  - DB2: {change['db2']}"
+    return f"- **{change['path']}**:\n  - DB1: {change['db1']}\n  - DB2: {change['db2']}"
+
+def format_index(index) -> str:
+    fields = ', '.join(index.get('fields', []))
+    flags = [flag for flag in ('unique', 'sparse') if index.get(flag)]
+    extra = {key: value for key, value in index.items() if key not in ('type', 'fields', 'unique', 'sparse')}
+    text = f"{index.get('type', 'unknown')} [{fields}]"
+    if flags:
+        text += f" ({', '.join(flags)})"
+    if extra:
+        text += f" {json.dumps(extra, sort_keys=True)}"
+    return text
+
+MARKDOWN_RENDERERS = {
+    'report_started': render_report_started,
+    'comparison_started': render_comparison_started,
+    'count_mismatch': render_count_mismatch,
+    'difference_summary': render_difference_summary,
+    'tiers': render_tiers,
+    'feature_counts': render_feature_counts,
+    'entity_differences': render_entity_differences,
+    'index_difference': render_index_difference,
+    'collection_started': render_collection_started,
+    'document_difference': render_document_difference,
+    'document_totals': render_document_totals,
+    'collection_failed': render_collection_failed,
+    'sample_result': render_sample_result,
+    'edge_difference': render_edge_difference,
+    'missing_vertex': render_missing_vertex,
+    'dangling_edges': render_dangling_edges,
+    'topology_totals': render_topology_totals,
+}
 
 def write_view_differences(differences, log_subdir):
     views_diff_file = os.path.join(log_subdir, "views.md")
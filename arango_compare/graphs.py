@@ -0,0 +1,162 @@
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+from .hashtree import find_differing_buckets, zip_buckets
+
+# hashtree (key, hashed) expressions for edges: bucketed by the MD5 of their (_from, _to) pair,
+# so parallel edges share a bucket but a bucket stays small even when a few vertices have
+# millions of edges.
+EDGE_HASH_EXPRESSIONS = ("[d._from, d._to]", "[d._from, d._to]")
+
+# Every differing leaf is fetched in one scan, ordered by bucket so the client holds one bucket at a time.
+EDGE_BUCKET_ITEMS_AQL = """
+FOR d IN @@collection
+  LET bucket = SUBSTRING(MD5(TO_STRING([d._from, d._to])), 0, @prefix_length)
+  FILTER bucket IN @buckets
+  COLLECT leaf = bucket, source = d._from, target = d._to WITH COUNT INTO n
+  SORT leaf
+  RETURN [leaf, source, target, n]
+"""
+
+DANGLING_EDGES_AQL = """
+FOR d IN @@collection
+  LET source_exists = DOCUMENT(d._from) != null
+  LET target_exists = DOCUMENT(d._to) != null
+  FILTER NOT (source_exists AND target_exists)
+  RETURN [d._from, d._to, source_exists, target_exists]
+"""
+
+VERTICES_EXIST_AQL = """
+FOR id IN @ids
+  RETURN [id, DOCUMENT(id) != null]
+"""
+
+# Number of hex digits of the bucket prefix never goes beyond this (16**8 buckets).
+MAX_BUCKET_DEPTH = 8
+
+def graph_edge_collections(graphs1: List[Dict[str, Any]], graphs2: List[Dict[str, Any]]) -> Dict[str, List[str]]:
+    """Edge collections used by graphs defined on both servers, each mapped to the graphs using it."""
+    names2 = {graph['name'] for graph in graphs2}
+    edge_collections: Dict[str, List[str]] = {}
+    for graph in graphs1:
+        if graph['name'] not in names2:
+            continue
+        for definition in graph['edge_definitions']:
+            edge_collections.setdefault(definition['collection'], []).append(graph['name'])
+    return edge_collections
+
+def leaf_depth(edge_count: int, bucket_size: int = 4096) -> int:
+    """Bucket prefix length at which a bucket holds about bucket_size edges or fewer."""
+    depth = 1
+    while depth < MAX_BUCKET_DEPTH and edge_count > bucket_size * 16 ** depth:
+        depth += 1
+    return depth
+
+def get_bucket_edges(client, collection_name: str, prefix_length: int, buckets: List[str],
+                     batch_size: int = 1000) -> Iterator[Any]:
+    """Stream [bucket, from, to, count] rows of the given buckets, ordered by bucket."""
+    bind_vars = {'@collection': collection_name, 'prefix_length': prefix_length, 'buckets': buckets}
+    return client.query(EDGE_BUCKET_ITEMS_AQL, bind_vars, batch_size=batch_size, stream=True)
+
+def diff_adjacency(edges1: Dict[Tuple[str, str], int],
+                   edges2: Dict[Tuple[str, str], int]) -> Iterator[Tuple[str, str, str]]:
+    """Yield ('removed' | 'added' | 'changed', from, to); 'changed' means a different number of parallel edges."""
+    for pair in sorted(edges1.keys() | edges2.keys()):
+        if pair not in edges2:
+            yield ('removed',) + pair
+        elif pair not in edges1:
+            yield ('added',) + pair
+        elif edges1[pair] != edges2[pair]:
+            yield ('changed',) + pair
+
+def compare_edge_collection(client1, client2, collection_name: str, edge_count: int = 0,
+                            bucket_size: int = 4096, batch_size: int = 1000) -> Iterator[List[Tuple[str, str, str]]]:
+    """Yield the edge differences of an edge collection, one list per differing leaf bucket.
+
+    The servers compare bucket digests of hashed (_from, _to) pairs and descend only into
+    buckets that differ, deep enough that a leaf bucket holds about bucket_size edges. The
+    differing leaves are then fetched in one streamed scan per server and compared a bucket
+    at a time, so memory is bounded by one bucket however large the collection is.
+    """
+    max_depth = leaf_depth(edge_count, bucket_size)
+    prefix_length, buckets = find_differing_buckets(client1, client2, collection_name, EDGE_HASH_EXPRESSIONS,
+                                                    max_depth)
+    if not buckets:
+        return
+    rows1 = get_bucket_edges(client1, collection_name, prefix_length, buckets, batch_size)
+    rows2 = get_bucket_edges(client2, collection_name, prefix_length, buckets, batch_size)
+    for bucket1, bucket2 in zip_buckets(rows1, rows2):
+        edges1 = {(source, target): n for source, target, n in bucket1}
+        edges2 = {(source, target): n for source, target, n in bucket2}
+        yield list(diff_adjacency(edges1, edges2))
+
+def find_dangling_edges(client, collection_name: str, example_limit: int = 10,
+                        batch_size: int = 1000) -> Dict[str, Any]:
+    """Count edges whose _from or _to vertex does not exist, keeping the first example_limit of them."""
+    count = 0
+    examples = []
+    for source, target, source_exists, target_exists in client.query(
+            DANGLING_EDGES_AQL, {'@collection': collection_name}, batch_size=batch_size, stream=True):
+        count += 1
+        if len(examples) < example_limit:
+            examples.append({'from': source, 'to': target,
+                             'missing': [vertex for vertex, exists in ((source, source_exists), (target, target_exists))
+                                         if not exists]})
+    return {'count': count, 'examples': examples}
+
+def missing_vertices(client, vertex_ids: Iterable[str], batch_size: int = 1000) -> List[str]:
+    """Those of vertex_ids that do not exist on the client's server."""
+    vertex_ids = sorted(set(vertex_ids))
+    missing = []
+    for i in range(0, len(vertex_ids), batch_size):
+        bind_vars = {'ids': vertex_ids[i:i + batch_size]}
+        missing.extend(vertex for vertex, exists in client.query(VERTICES_EXIST_AQL, bind_vars, batch_size=batch_size)
+                       if not exists)
+    return missing
+
+def compare_graph_topology(client1, client2, graphs1, graphs2, table1, table2, report, batch_size: int = 1000,
+                           check_dangling: bool = False, dangling_examples: int = 10) -> List[str]:
+    """Compare the edges of every edge collection used by a graph defined on both servers.
+
+    Reports added, removed and changed (from, to) pairs and the endpoints of those edges
+    that do not exist on the server lacking the edge. With check_dangling, also each
+    server's dangling edges, which takes a full scan with two lookups per edge. Returns
+    the edge collections that differ in any of these.
+    """
+    collections_with_differences = []
+    report.emit({'report': 'topology', 'event': 'report_started'})
+    for collection, graphs in sorted(graph_edge_collections(graphs1, graphs2).items()):
+        if collection not in table1 or collection not in table2:
+            # A missing edge collection is already reported as a unique collection.
+            continue
+        report.emit({'report': 'topology', 'event': 'collection_started', 'collection': collection,
+                     'graphs': graphs})
+        totals = {'added': 0, 'removed': 0, 'changed': 0, 'missing_vertices': 0}
+        edge_count = max(table1.document_count(collection), table2.document_count(collection))
+        for differences in compare_edge_collection(client1, client2, collection, edge_count, batch_size=batch_size):
+            # Endpoints of edges only one server has, checked on the server that lacks the edge.
+            lacking = {'db1': set(), 'db2': set()}
+            for status, source, target in differences:
+                totals[status] += 1
+                report.emit({'report': 'topology', 'event': 'edge_difference', 'collection': collection,
+                             'status': status, 'from': source, 'to': target})
+                if status != 'changed':
+                    lacking['db2' if status == 'removed' else 'db1'].update((source, target))
+            for server, client in (('db1', client1), ('db2', client2)):
+                for vertex in missing_vertices(client, lacking[server], batch_size):
+                    totals['missing_vertices'] += 1
+                    report.emit({'report': 'topology', 'event': 'missing_vertex', 'collection': collection,
+                                 'server': server, 'vertex': vertex})
+
+        for server, client in (('db1', client1), ('db2', client2)):
+            if not check_dangling:
+                totals[f"dangling_{server}"] = None
+                continue
+            dangling = find_dangling_edges(client, collection, dangling_examples, batch_size)
+            totals[f"dangling_{server}"] = dangling['count']
+            if dangling['count']:
+                report.emit(dict(dangling, report='topology', event='dangling_edges', collection=collection,
+                                 server=server))
+
+        report.emit(dict(totals, report='topology', event='topology_totals', collection=collection, graphs=graphs))
+        if any(totals.values()):
+            collections_with_differences.append(collection)
+    return collections_with_differences
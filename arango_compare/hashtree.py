@@ -0,0 +1,116 @@
+import itertools
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+# AQL expressions for each mode: what identifies an item, and what is hashed to detect a change.
+HASH_MODES = {
+    'content': ("d._key", "UNSET(d, '_id', '_rev')"),
+    'revision': ("d._key", "[d._key, d._rev]"),
+}
+
+# Bucket digests are [count, sum of the low 22 hash bits, sum of the next 22 bits]. Sums are
+# order-independent and stay exact in AQL's doubles for billions of documents per bucket.
+BUCKET_DIGESTS_AQL = """
+FOR d IN @@collection
+  LET bucket = SUBSTRING(MD5(TO_STRING({key})), 0, @prefix_length)
+  FILTER SUBSTRING(bucket, 0, @parent_length) IN @parents
+  LET h = HASH({hashed})
+  COLLECT b = bucket AGGREGATE n = COUNT(1), low = SUM(h % 4194304), high = SUM(FLOOR(h / 4194304) % 4194304)
+  RETURN [b, n, low, high]
+"""
+
+# Every differing leaf is fetched in one scan, ordered by bucket so the client holds one bucket at a time.
+BUCKET_ITEMS_AQL = """
+FOR d IN @@collection
+  LET bucket = SUBSTRING(MD5(TO_STRING({key})), 0, @prefix_length)
+  FILTER bucket IN @buckets
+  SORT bucket
+  RETURN [bucket, {key}, HASH({hashed})]
+"""
+
+def get_bucket_digests(client, collection_name: str, prefix_length: int, parents: List[str],
+                       expressions: Tuple[str, str] = HASH_MODES['content']) -> Dict[str, Tuple[int, int, int]]:
+    key_expr, hash_expr = expressions
+    aql = BUCKET_DIGESTS_AQL.format(key=key_expr, hashed=hash_expr)
+    bind_vars = {
+        '@collection': collection_name,
+        'prefix_length': prefix_length,
+        'parent_length': prefix_length - 1,
+        'parents': parents,
+    }
+    return {row[0]: tuple(row[1:]) for row in client.query(aql, bind_vars)}
+
+def get_bucket_items(client, collection_name: str, prefix_length: int, buckets: List[str],
+                     expressions: Tuple[str, str] = HASH_MODES['content'], batch_size: int = 1000) -> Iterator[Any]:
+    """Stream [bucket, key, digest] rows of the given buckets, ordered by bucket."""
+    key_expr, hash_expr = expressions
+    aql = BUCKET_ITEMS_AQL.format(key=key_expr, hashed=hash_expr)
+    bind_vars = {'@collection': collection_name, 'prefix_length': prefix_length, 'buckets': buckets}
+    return client.query(aql, bind_vars, batch_size=batch_size, stream=True)
+
+def zip_buckets(rows1: Iterable[List[Any]], rows2: Iterable[List[Any]]) -> Iterator[Tuple[List[Any], List[Any]]]:
+    """Pair up the buckets of two bucket-ordered row streams as (rows1, rows2), without the bucket column.
+
+    A bucket present in only one stream is paired with an empty list. Only the current
+    bucket of each stream is held in memory.
+    """
+    groups1 = itertools.groupby(rows1, key=lambda row: row[0])
+    groups2 = itertools.groupby(rows2, key=lambda row: row[0])
+    group1 = next(groups1, None)
+    group2 = next(groups2, None)
+    while group1 is not None or group2 is not None:
+        bucket1 = group1[0] if group1 is not None else None
+        bucket2 = group2[0] if group2 is not None else None
+        take1 = bucket2 is None or (bucket1 is not None and bucket1 <= bucket2)
+        take2 = bucket1 is None or (bucket2 is not None and bucket2 <= bucket1)
+        yield ([row[1:] for row in group1[1]] if take1 else [],
+               [row[1:] for row in group2[1]] if take2 else [])
+        if take1:
+            group1 = next(groups1, None)
+        if take2:
+            group2 = next(groups2, None)
+
+def find_differing_buckets(client1, client2, collection_name: str,
+                           expressions: Tuple[str, str] = HASH_MODES['content'],
+                           max_depth: int = 4) -> Tuple[int, List[str]]:
+    """Walk the bucket tree from the top, descending only into buckets whose digests differ.
+
+    expressions are the (key, hashed) AQL expressions of a HASH_MODES entry. Returns the
+    prefix length reached and the differing buckets at that level.
+    """
+    parents = ['']
+    prefix_length = 0
+    for prefix_length in range(1, max_depth + 1):
+        digests1 = get_bucket_digests(client1, collection_name, prefix_length, parents, expressions)
+        digests2 = get_bucket_digests(client2, collection_name, prefix_length, parents, expressions)
+        parents = sorted(
+            bucket for bucket in digests1.keys() | digests2.keys()
+            if digests1.get(bucket) != digests2.get(bucket)
+        )
+        if not parents:
+            break
+    return prefix_length, parents
+
+def compare_collection_hashes(client1, client2, collection_name: str, mode: str = 'content',
+                              max_depth: int = 4, batch_size: int = 1000) -> Iterator[Tuple[str, str]]:
+    """Yield ('removed' | 'added' | 'changed', key) like documents.diff_documents, shipping only digests.
+
+    Items are fetched only for differing leaf buckets, all of them in one streamed scan
+    per server, and compared a bucket at a time, so memory is bounded by the size of a
+    bucket rather than the collection.
+    """
+    expressions = HASH_MODES[mode]
+    prefix_length, buckets = find_differing_buckets(client1, client2, collection_name, expressions, max_depth)
+    if not buckets:
+        return
+    rows1 = get_bucket_items(client1, collection_name, prefix_length, buckets, expressions, batch_size)
+    rows2 = get_bucket_items(client2, collection_name, prefix_length, buckets, expressions, batch_size)
+    for bucket1, bucket2 in zip_buckets(rows1, rows2):
+        items1 = dict(bucket1)
+        items2 = dict(bucket2)
+        for key in sorted(items1.keys() | items2.keys()):
+            if key not in items2:
+                yield 'removed', key
+            elif key not in items1:
+                yield 'added', key
+            elif items1[key] != items2[key]:
+                yield 'changed', key
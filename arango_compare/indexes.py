@@ -0,0 +1,27 @@
+import hashlib
+import json
+from typing import Any, Dict, List, Tuple
+
+# Attributes that describe a particular server's copy of an index rather than its definition.
+SERVER_SPECIFIC_ATTRIBUTES = frozenset([
+    'id', 'name', 'inBackground', 'selectivityEstimate', 'figures', 'isBuilding', 'progress',
+    'code', 'error', 'errorMessage', 'isNewlyCreated',
+])
+
+def normalize_index(index: Dict[str, Any]) -> Dict[str, Any]:
+    """Keep what defines an index (type, fields, unique, sparse, ...) and drop server-specific attributes."""
+    return {key: value for key, value in index.items() if key not in SERVER_SPECIFIC_ATTRIBUTES}
+
+def index_fingerprint(index: Dict[str, Any]) -> str:
+    """Stable digest of a normalized index definition; field order is kept because it matters for compound indexes."""
+    encoded = json.dumps(index, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(encoded.encode('utf-8')).hexdigest()[:16]
+
+def diff_indexes(indexes1: List[Dict[str, Any]],
+                 indexes2: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Return the normalized definitions only on the first side and only on the second."""
+    by_fingerprint1 = {index_fingerprint(index): index for index in indexes1}
+    by_fingerprint2 = {index_fingerprint(index): index for index in indexes2}
+    only_in_1 = [index for fingerprint, index in by_fingerprint1.items() if fingerprint not in by_fingerprint2]
+    only_in_2 = [index for fingerprint, index in by_fingerprint2.items() if fingerprint not in by_fingerprint1]
+    return only_in_1, only_in_2
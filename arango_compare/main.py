@@ -1,32 +1,253 @@
+"""Compare two ArangoDB servers and write the reports to a log directory.
+
+Every option defaults to its ARANGO_* environment variable (see the README), so the
+container keeps working from the environment alone. Only argparse and os are imported
+at startup; the HTTP client, the comparison tiers and optional subsystems such as the
+daemon, the snapshot store and the asyncio engine are imported once the options show
+that the run needs them.
+"""
+import argparse
 import os
-from .client import ArangoDBClient
-from .comparator import compare_databases
 
-if __name__ == "__main__":
-    if os.getenv("ENV") == "production":
-        db1_config = {
-            "url": os.getenv("ARANGO_URL1", "http://localhost:8529"),
-            "username": os.getenv("ARANGO_USERNAME1", "root"),
-            "password": os.getenv("ARANGO_PASSWORD1", "password"),
-            "db_name": os.getenv("ARANGO_DB_NAME1", "test_db1")
-        }
+# Allowed values of the options that take one of a fixed set; the comparator, hashtree and
+# client modules are not imported at startup to look them up.
+DEPTHS = ("count", "sample", "checksum", "hash", "documents")
+HASH_MODES = ("content", "revision")
+ENGINES = ("sync", "async")
+METADATA_STRATEGIES = ("per_collection", "bulk")
+
+def env_flag(name: str, default: str = "false") -> bool:
+    return os.getenv(name, default).lower() == "true"
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="arango_compare", description=__doc__.splitlines()[0])
+    for n in ("1", "2"):
+        group = parser.add_argument_group(f"instance {n}")
+        group.add_argument(f"--url{n}", default=os.getenv(f"ARANGO_URL{n}", "http://localhost:8529"))
+        group.add_argument(f"--username{n}", default=os.getenv(f"ARANGO_USERNAME{n}", "root"))
+        group.add_argument(f"--password{n}", default=os.getenv(f"ARANGO_PASSWORD{n}", "password"),
+                           help=f"prefer ARANGO_PASSWORD{n}, which does not show up in the process list")
+        group.add_argument(f"--db{n}", default=os.getenv(f"ARANGO_DB_NAME{n}", f"test_db{n}"))
+
+    group = parser.add_argument_group("connections")
+    group.add_argument("--max-workers", type=int, default=int(os.getenv("ARANGO_MAX_WORKERS", "1")),
+                       help="concurrent summary requests per server")
+    group.add_argument("--pool-size", type=int, default=int(os.getenv("ARANGO_POOL_SIZE", "0")),
+                       help="keep-alive connections per server (0: the larger of 10 and --max-workers)")
+    group.add_argument("--timeout", type=float, default=float(os.getenv("ARANGO_TIMEOUT", "60")))
+    group.add_argument("--retries", type=int, default=int(os.getenv("ARANGO_RETRIES", "3")))
+    group.add_argument("--max-concurrent-requests", type=int,
+                       default=int(os.getenv("ARANGO_MAX_CONCURRENT_REQUESTS", "0")),
+                       help="in-flight requests per server (0: unlimited, 32 with --engine async)")
+    group.add_argument("--metadata-strategy", choices=METADATA_STRATEGIES,
+                       default=os.getenv("ARANGO_METADATA_STRATEGY", "per_collection"))
+    group.add_argument("--bulk-chunk-size", type=int, default=int(os.getenv("ARANGO_BULK_CHUNK_SIZE", "500")))
+
+    parser.add_argument("--log-dir", default=os.getenv("LOGFILE_OUT", "/logs"))
+    parser.add_argument("--depth", choices=DEPTHS, default=os.getenv("ARANGO_COMPARE_DEPTH", "count"))
+    parser.add_argument("--collection-depths", default=os.getenv("ARANGO_COLLECTION_DEPTHS", ""),
+                        help="per-collection depths as 'pattern=depth' pairs")
+    parser.add_argument("--include", default=os.getenv("ARANGO_INCLUDE_COLLECTIONS", ""),
+                        help="comma-separated collection patterns to compare")
+    parser.add_argument("--exclude", default=os.getenv("ARANGO_EXCLUDE_COLLECTIONS", ""),
+                        help="comma-separated collection patterns to leave out")
+    parser.add_argument("--skip-system", action="store_true", default=env_flag("ARANGO_SKIP_SYSTEM_COLLECTIONS"))
+    parser.add_argument("--compare-graphs", action="store_true", default=env_flag("ARANGO_COMPARE_GRAPHS"),
+                        help="also compare the edges of named graphs")
+    parser.add_argument("--check-dangling-edges", action="store_true", default=env_flag("ARANGO_CHECK_DANGLING_EDGES"),
+                        help="with --compare-graphs, also scan every edge for a missing vertex")
+    parser.add_argument("--drift-threshold", type=float, default=float(os.getenv("ARANGO_DRIFT_THRESHOLD", "0")))
+    parser.add_argument("--batch-size", type=int, default=int(os.getenv("ARANGO_BATCH_SIZE", "1000")))
+    parser.add_argument("--hash-mode", choices=HASH_MODES, default=os.getenv("ARANGO_HASH_MODE", "content"))
+    parser.add_argument("--checksum-with-revisions", action="store_true",
+                        default=env_flag("ARANGO_CHECKSUM_WITH_REVISIONS"))
+    parser.add_argument("--checksum-without-data", action="store_false", dest="checksum_with_data",
+                        default=env_flag("ARANGO_CHECKSUM_WITH_DATA", "true"))
+    parser.add_argument("--scan-ranges", type=int, default=int(os.getenv("ARANGO_SCAN_RANGES", "1")))
+    parser.add_argument("--scan-processes", type=int, default=int(os.getenv("ARANGO_SCAN_PROCESSES", "0")),
+                        help="0: the number of CPUs")
+    parser.add_argument("--scan-state-dir", default=os.getenv("ARANGO_SCAN_STATE_DIR", ""))
+    parser.add_argument("--sample-size", type=int, default=int(os.getenv("ARANGO_SAMPLE_SIZE", "1000")))
+    parser.add_argument("--sample-strata", type=int, default=int(os.getenv("ARANGO_SAMPLE_STRATA", "1")))
+    parser.add_argument("--sample-confidence", type=float,
+                        default=float(os.getenv("ARANGO_SAMPLE_CONFIDENCE", "0.95")))
+    parser.add_argument("--db-pairs", default=os.getenv("ARANGO_DB_PAIRS", ""),
+                        help="'all' or a list such as 'orders:orders_dr,users'")
+    parser.add_argument("--max-concurrent-pairs", type=int, default=int(os.getenv("ARANGO_MAX_CONCURRENT_PAIRS", "4")))
+    parser.add_argument("--target-urls", default=os.getenv("ARANGO_TARGET_URLS", ""),
+                        help="comma-separated replica URLs to compare instance 1 against")
+    parser.add_argument("--max-concurrent-targets", type=int,
+                        default=int(os.getenv("ARANGO_MAX_CONCURRENT_TARGETS", "4")))
+    parser.add_argument("--engine", choices=ENGINES, default=os.getenv("ARANGO_CLIENT_ENGINE", "sync"))
+    parser.add_argument("--output-formats", default=os.getenv("ARANGO_OUTPUT_FORMATS", "markdown"))
+    parser.add_argument("--quiet", action="store_true", default=env_flag("ARANGO_QUIET"))
+    parser.add_argument("--snapshot-file", default=os.getenv("ARANGO_SNAPSHOT_FILE", ""))
+    parser.add_argument("--profile", action="store_true", default=env_flag("ARANGO_PROFILE"))
+    parser.add_argument("--profile-top-n", type=int, default=int(os.getenv("ARANGO_PROFILE_TOP_N", "10")))
+    parser.add_argument("--metrics-file", default=os.getenv("ARANGO_METRICS_FILE", ""))
+    parser.add_argument("--daemon-interval", type=float, default=float(os.getenv("ARANGO_DAEMON_INTERVAL", "0")),
+                        help="repeat the comparison every this many seconds")
+    parser.add_argument("--status-port", type=int, default=int(os.getenv("ARANGO_STATUS_PORT", "8080")))
+    return parser
+
+def run(args: argparse.Namespace):
+    from .client import ArangoDBClient
+    from .comparator import compare_databases
+    from .filters import CollectionDepths, CollectionFilter, parse_collection_depths, parse_patterns
+    from .profile import Profiler, write_profile
+    from .runner import collect_summaries, compare_database_pairs, compare_one_to_many, resolve_database_pairs
+
+    db1_config = {"url": args.url1, "username": args.username1, "password": args.password1, "db_name": args.db1}
+    db2_config = {"url": args.url2, "username": args.username2, "password": args.password2, "db_name": args.db2}
 
-        db2_config = {
-            "url": os.getenv("ARANGO_URL2", "http://localhost:8529"),
-            "username": os.getenv("ARANGO_USERNAME2", "root"),
-            "password": os.getenv("ARANGO_PASSWORD2", "password"),
-            "db_name": os.getenv("ARANGO_DB_NAME2", "test_db2")
+    log_dir = args.log_dir
+    metrics_file = args.metrics_file
+    profiler = Profiler() if args.profile or metrics_file else None
+    client_options = {
+        "max_workers": args.max_workers,
+        "pool_size": args.pool_size or None,
+        "timeout": args.timeout,
+        "retries": args.retries,
+        "metadata_strategy": args.metadata_strategy,
+        "bulk_chunk_size": args.bulk_chunk_size,
+        "max_concurrent_requests": args.max_concurrent_requests or None,
+        "profiler": profiler,
+        "collection_filter": CollectionFilter(include=parse_patterns(args.include),
+                                              exclude=parse_patterns(args.exclude), skip_system=args.skip_system),
+        "quiet": args.quiet,
+    }
+
+    client1 = ArangoDBClient(**db1_config, **client_options)
+    client2 = ArangoDBClient(**db2_config, **client_options)
+
+    if args.engine == "async":
+        from .async_client import AsyncArangoDBClient
+        async_options = {
+            "max_concurrent_requests": client_options["max_concurrent_requests"] or 32,
+            "pool_size": client_options["pool_size"],
+            "timeout": client_options["timeout"],
+            "retries": client_options["retries"],
+            "collection_filter": client_options["collection_filter"],
+            "profiler": profiler,
         }
+        # The deeper tiers run on the configured synchronous clients.
+        async_client1 = AsyncArangoDBClient(**db1_config, **async_options, sync_client=client1)
+        async_client2 = AsyncArangoDBClient(**db2_config, **async_options, sync_client=client2)
+
+    snapshot_file = args.snapshot_file
+    if not snapshot_file and args.daemon_interval:
+        # A daemon keeps the previous run's state in memory to skip unchanged collections.
+        snapshot_file = ":memory:"
+    snapshot = None
+    if snapshot_file:
+        from .snapshot import SnapshotStore
+        snapshot = SnapshotStore(snapshot_file)
+
+    compare_options = {
+        "depth": args.depth,
+        "batch_size": args.batch_size,
+        "hash_mode": args.hash_mode,
+        "snapshot": snapshot,
+        "checksum_with_revisions": args.checksum_with_revisions,
+        "checksum_with_data": args.checksum_with_data,
+        "scan_ranges": args.scan_ranges,
+        "scan_processes": args.scan_processes or None,
+        "scan_state_dir": args.scan_state_dir or None,
+        "quiet": args.quiet,
+        "output_formats": args.output_formats.split(","),
+        "profiler": profiler,
+        "drift_threshold": args.drift_threshold,
+        "sample_size": args.sample_size,
+        "sample_strata": args.sample_strata,
+        "sample_confidence": args.sample_confidence,
+        "collection_depths": CollectionDepths(parse_collection_depths(args.collection_depths)),
+        "compare_graphs": args.compare_graphs,
+        "check_dangling_edges": args.check_dangling_edges,
+    }
+
+    db_pairs = args.db_pairs
+    max_concurrent_pairs = args.max_concurrent_pairs
+    target_urls = [url.strip() for url in args.target_urls.split(",") if url.strip()]
+    targets = [ArangoDBClient(**dict(db2_config, url=url), **client_options) for url in target_urls]
 
-        log_dir = os.getenv("LOGFILE_OUT", "/logs")
+    async def run_comparison_async():
+        from concurrent.futures import ThreadPoolExecutor
+        from .runner import compare_database_pairs_async, compare_pair_async
+        try:
+            if db_pairs:
+                pairs, only_in_db1, only_in_db2 = resolve_database_pairs(client1, client2, db_pairs)
+                return await compare_database_pairs_async(async_client1, async_client2, pairs, log_dir,
+                                                          max_concurrent_pairs=max_concurrent_pairs,
+                                                          only_in_db1=only_in_db1, only_in_db2=only_in_db2,
+                                                          **compare_options)
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                result = await compare_pair_async(async_client1, async_client2, log_dir, compare_options, executor)
+            if 'error' in result:
+                raise RuntimeError(result['error'])
+            return result
+        finally:
+            # The sessions belong to this event loop; the next run opens new ones.
+            await async_client1.close()
+            await async_client2.close()
 
-        client1 = ArangoDBClient(**db1_config)
-        client2 = ArangoDBClient(**db2_config)
+    def run_comparison():
+        if targets:
+            result = compare_one_to_many(client1, targets, log_dir,
+                                         max_concurrent_targets=args.max_concurrent_targets,
+                                         **compare_options)
+        elif args.engine == "async":
+            import asyncio
+            result = asyncio.run(run_comparison_async())
+        elif db_pairs:
+            pairs, only_in_db1, only_in_db2 = resolve_database_pairs(client1, client2, db_pairs)
+            result = compare_database_pairs(client1, client2, pairs, log_dir, max_concurrent_pairs=max_concurrent_pairs,
+                                            only_in_db1=only_in_db1, only_in_db2=only_in_db2, **compare_options)
+        else:
+            summary1, summary2 = collect_summaries(client1, client2, args.quiet)
+            result = compare_databases(client1, client2, summary1, summary2, log_dir, **compare_options)
 
-        summary1 = client1.get_summary()
-        summary2 = client2.get_summary()
+        if profiler is not None:
+            write_profile(profiler, log_dir, metrics_file, args.profile_top_n)
+        return result
 
-        compare_databases(client1, client2, summary1, summary2, log_dir)
+    try:
+        if args.daemon_interval:
+            from .daemon import ComparisonDaemon
+            # Clients, connection pools and the snapshot stay alive between scheduled runs.
+            daemon = ComparisonDaemon(run_comparison, args.daemon_interval, port=args.status_port, profiler=profiler)
+            daemon.serve_forever()
+            return None
+        return run_comparison()
+    finally:
+        if snapshot is not None:
+            snapshot.close()
 
+def main(argv=None) -> int:
+    """Console entry point.
+
+    Exits with 1 when a database pair could not be compared or a collection's comparison
+    failed, so cron jobs and CI notice runs whose reports are incomplete.
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    # argparse checks choices on the command line only, not on defaults taken from the environment.
+    for option, variable, choices in (("depth", "ARANGO_COMPARE_DEPTH", DEPTHS),
+                                      ("hash_mode", "ARANGO_HASH_MODE", HASH_MODES),
+                                      ("engine", "ARANGO_CLIENT_ENGINE", ENGINES),
+                                      ("metadata_strategy", "ARANGO_METADATA_STRATEGY", METADATA_STRATEGIES)):
+        value = getattr(args, option)
+        if value not in choices:
+            parser.error(f"{variable} must be one of {', '.join(choices)}, got '{value}'")
+    if args.engine == "async" and args.metadata_strategy == "bulk":
+        parser.error("the bulk metadata strategy is not supported by the async engine")
+    result = run(args)
+    if result is None:
+        return 0
+    from .runner import comparison_failed
+    return 1 if comparison_failed(result) else 0
+
+if __name__ == "__main__":
+    if os.getenv("ENV") == "production":
+        raise SystemExit(main())
     else:
         print("Development mode: Build successful")
@@ -0,0 +1,178 @@
+import contextlib
+import datetime
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+PERCENTILES = (50, 90, 99)
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * p // 100))
+    return sorted_values[int(rank) - 1]
+
+class Profiler:
+    """Collects request latencies and comparison phase durations for one run.
+
+    Shared by every client and worker thread of the run, so all methods are thread-safe.
+    Latencies are kept per endpoint template (e.g. /_api/collection/{name}/count) and
+    totals per collection, so memory grows with the number of requests, not their size.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget everything recorded so far, e.g. before the next scheduled run."""
+        with self._lock:
+            self.latencies: Dict[str, List[float]] = {}
+            self.endpoints: Dict[str, Dict[str, Any]] = {}
+            self.collections: Dict[str, Dict[str, Any]] = {}
+            self.phases: Dict[str, Dict[str, Any]] = {}
+
+    def record_request(self, method: str, endpoint: str, collection: Optional[str], status: Optional[int],
+                       size: int, retries: int, seconds: float) -> None:
+        key = f"{method} {endpoint}"
+        with self._lock:
+            self.latencies.setdefault(key, []).append(seconds)
+            totals = self.endpoints.setdefault(key, {'requests': 0, 'bytes': 0, 'retries': 0, 'errors': 0})
+            totals['requests'] += 1
+            totals['bytes'] += size
+            totals['retries'] += retries
+            if status is None or status >= 400:
+                totals['errors'] += 1
+            if collection is not None:
+                per_collection = self.collections.setdefault(collection, {'requests': 0, 'bytes': 0, 'seconds': 0.0})
+                per_collection['requests'] += 1
+                per_collection['bytes'] += size
+                per_collection['seconds'] += seconds
+
+    def record_phase(self, name: str, seconds: float) -> None:
+        with self._lock:
+            totals = self.phases.setdefault(name, {'runs': 0, 'seconds': 0.0})
+            totals['runs'] += 1
+            totals['seconds'] += seconds
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_phase(name, time.perf_counter() - start)
+
+    def summary(self, top_n: int = 10) -> Dict[str, Any]:
+        with self._lock:
+            endpoints = {}
+            for key, latencies in self.latencies.items():
+                ordered = sorted(latencies)
+                endpoints[key] = dict(
+                    self.endpoints[key],
+                    seconds=sum(ordered),
+                    max=ordered[-1],
+                    **{f"p{p}": percentile(ordered, p) for p in PERCENTILES},
+                )
+            slowest = sorted(self.collections.items(), key=lambda item: item[1]['seconds'], reverse=True)[:top_n]
+            return {
+                'requests': sum(totals['requests'] for totals in self.endpoints.values()),
+                'bytes': sum(totals['bytes'] for totals in self.endpoints.values()),
+                'retries': sum(totals['retries'] for totals in self.endpoints.values()),
+                'endpoints': endpoints,
+                'slowest_collections': [dict(totals, collection=name) for name, totals in slowest],
+                'phases': {name: dict(totals) for name, totals in self.phases.items()},
+            }
+
+def phase(profiler: Optional[Profiler], name: str):
+    """profiler.phase(name), or a no-op when profiling is off."""
+    return profiler.phase(name) if profiler is not None else contextlib.nullcontext()
+
+def render_profile(summary: Dict[str, Any]) -> str:
+    lines = [
+        "# Run Profile",
+        f"\n**Requests:** {summary['requests']}, **Bytes received:** {summary['bytes']}, "
+        f"**Retries:** {summary['retries']}",
+        "\n## Phases",
+        f"{'Phase':<30} {'Runs':>8} {'Seconds':>12}",
+        "-"*52,
+    ]
+    for name, totals in summary['phases'].items():
+        lines.append(f"{name:<30} {totals['runs']:>8} {totals['seconds']:>12.3f}")
+
+    lines += [
+        "\n## Request Latency (ms)",
+        f"{'Endpoint':<50} {'Requests':>9} {'p50':>9} {'p90':>9} {'p99':>9} {'Max':>9} {'Bytes':>12}",
+        "-"*112,
+    ]
+    for key, stats in sorted(summary['endpoints'].items(), key=lambda item: item[1]['seconds'], reverse=True):
+        lines.append(f"{key:<50} {stats['requests']:>9} {stats['p50'] * 1000:>9.1f} {stats['p90'] * 1000:>9.1f} "
+                     f"{stats['p99'] * 1000:>9.1f} {stats['max'] * 1000:>9.1f} {stats['bytes']:>12}")
+
+    lines += [
+        "\n## Slowest Collections",
+        f"{'Collection':<40} {'Requests':>9} {'Seconds':>12} {'Bytes':>12}",
+        "-"*76,
+    ]
+    for totals in summary['slowest_collections']:
+        lines.append(f"{totals['collection']:<40} {totals['requests']:>9} {totals['seconds']:>12.3f} "
+                     f"{totals['bytes']:>12}")
+    return '\n'.join(lines) + '\n'
+
+def _label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def render_openmetrics(summary: Dict[str, Any], prefix: str = 'arangocompare') -> str:
+    """The profile summary in OpenMetrics text format."""
+    lines = [
+        f"# TYPE {prefix}_request_seconds summary",
+        f"# UNIT {prefix}_request_seconds seconds",
+        f"# HELP {prefix}_request_seconds Latency of ArangoDB HTTP requests.",
+    ]
+    for key, stats in sorted(summary['endpoints'].items()):
+        method, _, endpoint = key.partition(' ')
+        labels = f'method="{method}",endpoint="{_label(endpoint)}"'
+        for p in PERCENTILES:
+            lines.append(f'{prefix}_request_seconds{{{labels},quantile="{p / 100}"}} {stats[f"p{p}"]:.6f}')
+        lines.append(f"{prefix}_request_seconds_sum{{{labels}}} {stats['seconds']:.6f}")
+        lines.append(f"{prefix}_request_seconds_count{{{labels}}} {stats['requests']}")
+
+    for metric, field, help_text in (('response_bytes', 'bytes', 'Bytes received from ArangoDB.'),
+                                     ('request_retries', 'retries', 'Requests retried after 429/503 or connection errors.'),
+                                     ('request_errors', 'errors', 'Requests that failed.')):
+        lines += [f"# TYPE {prefix}_{metric} counter", f"# HELP {prefix}_{metric} {help_text}"]
+        for key, stats in sorted(summary['endpoints'].items()):
+            method, _, endpoint = key.partition(' ')
+            lines.append(f'{prefix}_{metric}_total{{method="{method}",endpoint="{_label(endpoint)}"}} {stats[field]}')
+
+    lines += [f"# TYPE {prefix}_phase_seconds gauge", f"# UNIT {prefix}_phase_seconds seconds",
+              f"# HELP {prefix}_phase_seconds Time spent in each comparison phase."]
+    for name, totals in sorted(summary['phases'].items()):
+        lines.append(f'{prefix}_phase_seconds{{phase="{_label(name)}"}} {totals["seconds"]:.6f}')
+    lines.append("# EOF")
+    return '\n'.join(lines) + '\n'
+
+def write_atomically(path: str, text: str) -> None:
+    """Write through a temporary file and rename, so collectors never read a partial file."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+def write_profile(profiler: Profiler, log_dir: str, metrics_file: Optional[str] = None,
+                  top_n: int = 10) -> str:
+    """Write profile-<date>.md to log_dir and, if metrics_file is set, OpenMetrics text there.
+
+    Returns the path of the markdown profile.
+    """
+    summary = profiler.summary(top_n)
+    date_str = datetime.datetime.now().strftime('%Y-%m-%d-%H-%M')
+    os.makedirs(log_dir, exist_ok=True)
+    path = os.path.join(log_dir, f"profile-{date_str}.md")
+    with open(path, 'w') as f:
+        f.write(render_profile(summary))
+    if metrics_file:
+        write_atomically(metrics_file, render_openmetrics(summary))
+    return path
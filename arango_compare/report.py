@@ -0,0 +1,207 @@
+import json
+import os
+import queue
+import sys
+import threading
+from typing import Any, Dict, List, Optional
+from .formatter import render_console, render_markdown
+
+# Buffer size for report files; lines are flushed in blocks instead of one write per line.
+FILE_BUFFER_SIZE = 1 << 16
+
+# Events emitted once per differing document or edge; there can be millions of them in one run.
+PER_ITEM_EVENTS = frozenset({'document_difference', 'edge_difference', 'missing_vertex'})
+
+class ReportSink:
+    """Receives structured report events from the comparator.
+
+    Every event is a dict with a 'report' (which report it belongs to, e.g. 'summary'
+    or 'documents') and an 'event' type; the remaining keys depend on the type.
+    """
+
+    def emit(self, event: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+class MarkdownSink(ReportSink):
+    """Writes each report to <report>.md in a directory through buffered file handles."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._files: Dict[str, Any] = {}
+
+    def emit(self, event: Dict[str, Any]) -> None:
+        text = render_markdown(event)
+        if text is None:
+            return
+        output = self._files.get(event['report'])
+        if output is None:
+            path = os.path.join(self.directory, f"{event['report']}.md")
+            output = self._files[event['report']] = open(path, 'w', buffering=FILE_BUFFER_SIZE)
+        output.write(text + '\n')
+
+    def close(self) -> None:
+        for output in self._files.values():
+            output.close()
+        self._files.clear()
+
+class ConsoleSink(ReportSink):
+    """Writes a condensed rendering to a stream, batching lines into large writes."""
+
+    def __init__(self, stream=None, batch_lines: int = 256):
+        self.stream = stream or sys.stdout
+        self.batch_lines = batch_lines
+        self._pending: List[str] = []
+
+    def emit(self, event: Dict[str, Any]) -> None:
+        text = render_console(event)
+        if text is None:
+            return
+        self._pending.append(text)
+        # Progress is only useful while it is current.
+        if event['event'] == 'scan_progress' or len(self._pending) >= self.batch_lines:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._pending:
+            self.stream.write('\n'.join(self._pending) + '\n')
+            self.stream.flush()
+            self._pending = []
+
+    def close(self) -> None:
+        self.flush()
+
+class QueuedSink(ReportSink):
+    """Hands events to a background thread that forwards them to other sinks.
+
+    emit() only enqueues, so a slow disk or terminal does not hold up the comparison.
+    An error raised by a wrapped sink is re-raised from close().
+    """
+
+    _STOP = object()
+
+    def __init__(self, sinks: List[ReportSink], maxsize: int = 10000):
+        self.sinks = sinks
+        self._queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, name='arangocompare-report-writer', daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            event = self._queue.get()
+            if event is self._STOP:
+                break
+            if self._error is not None:
+                continue
+            try:
+                for sink in self.sinks:
+                    sink.emit(event)
+            except BaseException as exc:
+                self._error = exc
+
+    def emit(self, event: Dict[str, Any]) -> None:
+        self._queue.put(event)
+
+    def close(self) -> None:
+        self._queue.put(self._STOP)
+        self._thread.join()
+        for sink in self.sinks:
+            sink.close()
+        if self._error is not None:
+            raise self._error
+
+class NdjsonSink(ReportSink):
+    """Writes every event as one JSON line for consumers tailing the file mid-run.
+
+    Every event is flushed as it is written, except the per-item PER_ITEM_EVENTS, which
+    reach the file in blocks of the write buffer (or with the next other event).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._output = open(path, 'w', buffering=FILE_BUFFER_SIZE)
+
+    def emit(self, event: Dict[str, Any]) -> None:
+        self._output.write(json.dumps(event, default=str, separators=(',', ':')) + '\n')
+        # Per-item events are frequent; flush them in blocks and everything else at once.
+        if event['event'] not in PER_ITEM_EVENTS:
+            self._output.flush()
+
+    def close(self) -> None:
+        self._output.close()
+
+class JsonSummarySink(ReportSink):
+    """Writes a compact JSON summary when the comparison finishes.
+
+    Only summary-level events and per-collection document totals are kept; per-key
+    document differences are counted, not stored, so memory does not grow with the diff.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.summary: Dict[str, Any] = {'entities': {}, 'indexes': [], 'documents': {}, 'samples': {},
+                                        'topology': {}}
+
+    def emit(self, event: Dict[str, Any]) -> None:
+        kind = event['event']
+        if kind == 'comparison_started':
+            self.summary['databases'] = {'db1': event['db1'], 'db2': event['db2']}
+        elif kind == 'difference_summary':
+            self.summary['differences'] = {key: value for key, value in event.items() if key not in ('report', 'event')}
+        elif kind == 'tiers':
+            self.summary['tiers'] = event['tiers']
+        elif kind == 'feature_counts':
+            self.summary['feature_counts'] = {'db1': event['db1'], 'db2': event['db2']}
+        elif kind == 'entity_differences':
+            self.summary['entities'][event['entity']] = {
+                'only_in_db1': event['only_in_db1'],
+                'only_in_db2': event['only_in_db2'],
+                'changed': sorted(event['changed']),
+            }
+        elif kind == 'index_difference':
+            self.summary['indexes'].append(event['collection'])
+        elif kind == 'document_totals':
+            self.summary['documents'][event['collection']] = {
+                status: event[status] for status in ('added', 'removed', 'changed')
+            }
+        elif kind == 'collection_failed':
+            self.summary['documents'][event['collection']] = {'error': event['error']}
+        elif kind == 'topology_totals':
+            self.summary['topology'][event['collection']] = {
+                key: value for key, value in event.items() if key not in ('report', 'event', 'collection')
+            }
+        elif kind == 'sample_result':
+            self.summary['samples'][event['collection']] = {
+                key: value for key, value in event.items() if key not in ('report', 'event', 'collection')
+            }
+
+    def close(self) -> None:
+        with open(self.path, 'w') as output:
+            json.dump(self.summary, output, default=str, separators=(',', ':'))
+
+# Output formats build_sinks understands, besides the console.
+OUTPUT_FORMATS = ('markdown', 'ndjson', 'json')
+
+def build_sinks(log_subdir: str, quiet: bool = False, extra_sinks: Optional[List[ReportSink]] = None,
+                output_formats=('markdown',)) -> ReportSink:
+    """The report pipeline: the requested file formats, plus the console unless quiet, behind a writer thread.
+
+    ndjson streams every event to diff.ndjson as it happens; json writes summary.json at the end.
+    """
+    unknown = set(output_formats) - set(OUTPUT_FORMATS)
+    if unknown:
+        raise ValueError(f"Unknown output formats {sorted(unknown)}, expected some of {OUTPUT_FORMATS}")
+    sinks: List[ReportSink] = []
+    if 'markdown' in output_formats:
+        sinks.append(MarkdownSink(log_subdir))
+    if 'ndjson' in output_formats:
+        sinks.append(NdjsonSink(os.path.join(log_subdir, 'diff.ndjson')))
+    if 'json' in output_formats:
+        sinks.append(JsonSummarySink(os.path.join(log_subdir, 'summary.json')))
+    if not quiet:
+        sinks.append(ConsoleSink())
+    sinks.extend(extra_sinks or [])
+    return QueuedSink(sinks)
@@ -0,0 +1,288 @@
+import datetime
+import functools
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
+from .client import ArangoDBClient
+from .comparator import compare_databases
+
+def timed_summary(client: ArangoDBClient):
+    start = time.perf_counter()
+    summary = client.get_summary()
+    return summary, time.perf_counter() - start
+
+def collect_summaries(client1: ArangoDBClient, client2: ArangoDBClient, quiet: bool = False):
+    """Summarize both servers at the same time and, unless quiet, print how long each one took."""
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        future1 = executor.submit(timed_summary, client1)
+        future2 = executor.submit(timed_summary, client2)
+        summary1, elapsed1 = future1.result()
+        summary2, elapsed2 = future2.result()
+
+    if not quiet:
+        print(f"Server1 ({client1.url}, {client1.db_name}) summary took {elapsed1:.2f}s")
+        print(f"Server2 ({client2.url}, {client2.db_name}) summary took {elapsed2:.2f}s")
+    return summary1, summary2
+
+def comparison_failed(results) -> bool:
+    """Whether a pair of a run could not be compared, or any collection of a compared pair failed."""
+    results = results if isinstance(results, list) else [results]
+    return any('error' in result or result.get('failed_collections') for result in results)
+
+def resolve_database_pairs(client1: ArangoDBClient, client2: ArangoDBClient,
+                           spec: str) -> Tuple[List[Tuple[str, str]], List[str], List[str]]:
+    """Turn a pair specification into (db1, db2) pairs.
+
+    'all' pairs every database that exists on both servers by name and also returns the
+    databases found on only one of them; otherwise spec is a comma-separated list of
+    'db1:db2' pairs, where a bare name means the same database on both servers.
+    """
+    if spec.strip() == 'all':
+        names1 = set(client1.list_databases())
+        names2 = set(client2.list_databases())
+        return [(name, name) for name in sorted(names1 & names2)], sorted(names1 - names2), sorted(names2 - names1)
+
+    pairs = []
+    for item in spec.split(','):
+        item = item.strip()
+        if item:
+            db1, _, db2 = item.partition(':')
+            pairs.append((db1, db2 or db1))
+    return pairs, [], []
+
+def report_label_for(client2: ArangoDBClient) -> str:
+    """A filesystem-safe name for the second server and database, added to a comparison's report directory.
+
+    Every path that compares against client2 uses it, so the same comparison lands in the
+    same directory whichever engine ran it, and pairs sharing db1 (orders:orders_dr,
+    orders:orders_qa) or targets sharing a database name get their own directories.
+    """
+    host = re.sub(r'^\w+://', '', client2.url)
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', f"{host}-{client2.db_name}")
+
+def compare_pair(client1: ArangoDBClient, client2: ArangoDBClient, log_dir: str,
+                 compare_options: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        summary1, summary2 = collect_summaries(client1, client2, compare_options.get('quiet', False))
+        return compare_databases(client1, client2, summary1, summary2, log_dir,
+                                 report_label=report_label_for(client2), **compare_options)
+    except Exception as exc:
+        # One unreachable or broken database should not abort the rest of the cluster.
+        return {'db1': client1.db_name, 'db2': client2.db_name, 'error': f"{type(exc).__name__}: {exc}"}
+
+def compare_database_pairs(client1: ArangoDBClient, client2: ArangoDBClient, pairs: List[Tuple[str, str]],
+                           log_dir: str, max_concurrent_pairs: int = 4, only_in_db1=(), only_in_db2=(),
+                           **compare_options) -> List[Dict[str, Any]]:
+    """Compare many database pairs between two servers and write one consolidated report.
+
+    Every pair reuses the two server clients through for_database, so all databases on a
+    server share one connection pool and, if set, one max_concurrent_requests limit.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrent_pairs)) as executor:
+        futures = [
+            executor.submit(compare_pair, client1.for_database(db1), client2.for_database(db2), log_dir, compare_options)
+            for db1, db2 in pairs
+        ]
+        results = [future.result() for future in futures]
+
+    write_consolidated_report(results, log_dir, only_in_db1, only_in_db2)
+    return results
+
+async def compare_pair_async(client1, client2, log_dir: str, compare_options: Dict[str, Any],
+                             executor: ThreadPoolExecutor) -> Dict[str, Any]:
+    """compare_pair for two AsyncArangoDBClients: fetch both summaries concurrently, then compare them in a thread."""
+    # Only the async engine needs asyncio, which is slow to import.
+    import asyncio
+    try:
+        start = time.perf_counter()
+        summary1, summary2 = await asyncio.gather(client1.get_summary(), client2.get_summary())
+        if not compare_options.get('quiet'):
+            print(f"Summaries of {client1.db_name} and {client2.db_name} took {time.perf_counter() - start:.2f}s")
+        # The comparison is synchronous; running it in a thread lets the event loop keep fetching other pairs.
+        compare = functools.partial(compare_databases, client1.sync_client(), client2.sync_client(),
+                                    summary1, summary2, log_dir, report_label=report_label_for(client2),
+                                    **compare_options)
+        return await asyncio.get_running_loop().run_in_executor(executor, compare)
+    except Exception as exc:
+        return {'db1': client1.db_name, 'db2': client2.db_name, 'error': f"{type(exc).__name__}: {exc}"}
+
+async def compare_database_pairs_async(client1, client2, pairs: List[Tuple[str, str]], log_dir: str,
+                                       max_concurrent_pairs: int = 4, only_in_db1=(), only_in_db2=(),
+                                       **compare_options) -> List[Dict[str, Any]]:
+    """compare_database_pairs for two AsyncArangoDBClients.
+
+    All summaries are fetched from one event loop, bounded by each server's
+    max_concurrent_requests, while up to max_concurrent_pairs finished pairs are
+    compared in worker threads at the same time.
+    """
+    import asyncio
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrent_pairs)) as executor:
+        results = await asyncio.gather(*(
+            compare_pair_async(client1.for_database(db1), client2.for_database(db2), log_dir, compare_options, executor)
+            for db1, db2 in pairs
+        ))
+
+    write_consolidated_report(results, log_dir, only_in_db1, only_in_db2)
+    return list(results)
+
+def write_consolidated_report(results: List[Dict[str, Any]], log_dir: str, only_in_db1=(), only_in_db2=()) -> str:
+    date_str = datetime.datetime.now().strftime('%Y-%m-%d-%H-%M')
+    report_file = os.path.join(log_dir, f"consolidated-{date_str}.md")
+    columns = ('unique_to_db1', 'unique_to_db2', 'count_mismatches', 'index_mismatches', 'content_mismatches')
+
+    lines = [
+        "# Consolidated Comparison",
+        "",
+        "| DB1 | DB2 | Only in DB1 | Only in DB2 | Count mismatches | Index mismatches | Content mismatches | Report |",
+        "|-----|-----|-------------|-------------|------------------|------------------|--------------------|--------|",
+    ]
+    for result in results:
+        if 'error' in result:
+            lines.append(f"| {result['db1']} | {result['db2']} | error: {result['error']} | | | | | |")
+            continue
+        counts = ['-' if result[column] is None else str(len(result[column])) for column in columns]
+        report_dir = os.path.relpath(result['report_dir'], log_dir)
+        lines.append(f"| {result['db1']} | {result['db2']} | {' | '.join(counts)} | {report_dir} |")
+
+    for label, names in (('DB1', only_in_db1), ('DB2', only_in_db2)):
+        if names:
+            lines.append(f"\n## Databases only on {label}:")
+            lines.extend(f"- {name}" for name in names)
+
+    os.makedirs(log_dir, exist_ok=True)
+    with open(report_file, 'w') as output:
+        output.write('\n'.join(lines) + '\n')
+    with open(os.path.join(log_dir, f"consolidated-{date_str}.json"), 'w') as output:
+        json.dump({'pairs': results, 'only_in_db1': list(only_in_db1), 'only_in_db2': list(only_in_db2)},
+                  output, separators=(',', ':'))
+    return report_file
+
+class ReferenceClient:
+    """Wraps the reference server's client in a one-to-many run.
+
+    Every target comparison asks the reference for the same checksums and revisions;
+    this fetches each one once and shares the result. Everything else is passed through.
+    """
+
+    def __init__(self, client: ArangoDBClient):
+        self._client = client
+        self._lock = threading.Lock()
+        self._cache: Dict[Tuple, Future] = {}
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    def __reduce__(self):
+        # Worker processes get a fresh wrapper; the lock and cache stay with the parent.
+        return (ReferenceClient, (self._client,))
+
+    def _cached(self, key: Tuple, fetch):
+        with self._lock:
+            future = self._cache.get(key)
+            owner = future is None
+            if owner:
+                future = self._cache[key] = Future()
+        if owner:
+            try:
+                future.set_result(fetch())
+            except Exception as exc:
+                future.set_exception(exc)
+        return future.result()
+
+    def get_collection_checksum(self, collection_name: str, with_revisions: bool = False, with_data: bool = True):
+        return self._cached(('checksum', collection_name, with_revisions, with_data),
+                            lambda: self._client.get_collection_checksum(collection_name, with_revisions, with_data))
+
+    def get_collection_revision(self, collection_name: str):
+        return self._cached(('revision', collection_name),
+                            lambda: self._client.get_collection_revision(collection_name))
+
+def compare_target(reference: ReferenceClient, reference_summary: Dict[str, Any], target: ArangoDBClient,
+                   log_dir: str, compare_options: Dict[str, Any]) -> Dict[str, Any]:
+    label = report_label_for(target)
+    try:
+        summary, elapsed = timed_summary(target)
+        if not compare_options.get('quiet'):
+            print(f"Target ({target.url}, {target.db_name}) summary took {elapsed:.2f}s")
+        result = compare_databases(reference, target, reference_summary, summary, log_dir,
+                                   report_label=label, **compare_options)
+    except Exception as exc:
+        result = {'db1': reference_summary['db_name'], 'db2': target.db_name, 'error': f"{type(exc).__name__}: {exc}"}
+    return dict(result, target=label)
+
+def compare_one_to_many(reference_client: ArangoDBClient, targets: List[ArangoDBClient], log_dir: str,
+                        max_concurrent_targets: int = 4, **compare_options) -> List[Dict[str, Any]]:
+    """Compare one reference database against several targets, summarizing the reference only once.
+
+    Targets are summarized and compared concurrently, and matrix-<date>.md/.json show
+    which target differs where.
+    """
+    reference_summary, elapsed = timed_summary(reference_client)
+    if not compare_options.get('quiet'):
+        print(f"Reference ({reference_client.url}, {reference_client.db_name}) summary took {elapsed:.2f}s")
+    reference = ReferenceClient(reference_client)
+
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrent_targets)) as executor:
+        futures = [
+            executor.submit(compare_target, reference, reference_summary, target, log_dir, compare_options)
+            for target in targets
+        ]
+        results = [future.result() for future in futures]
+
+    write_matrix_report(results, log_dir)
+    return results
+
+# Matrix cell labels for each kind of difference, in the order they are listed in a cell.
+MATRIX_MARKERS = (
+    ('unique_to_db1', 'missing'),
+    ('unique_to_db2', 'extra'),
+    ('count_mismatches', 'counts'),
+    ('index_mismatches', 'indexes'),
+    ('content_mismatches', 'content'),
+    ('topology_mismatches', 'topology'),
+)
+
+def difference_matrix(results: List[Dict[str, Any]]) -> Dict[str, Dict[str, List[str]]]:
+    """Map each differing collection to the targets it differs on and how."""
+    matrix: Dict[str, Dict[str, List[str]]] = {}
+    for result in results:
+        if 'error' in result:
+            continue
+        for key, marker in MATRIX_MARKERS:
+            for collection in result.get(key) or []:
+                matrix.setdefault(collection, {}).setdefault(result['target'], []).append(marker)
+    return matrix
+
+def write_matrix_report(results: List[Dict[str, Any]], log_dir: str) -> str:
+    date_str = datetime.datetime.now().strftime('%Y-%m-%d-%H-%M')
+    matrix = difference_matrix(results)
+    targets = [result['target'] for result in results]
+
+    lines = [
+        "# Replica Difference Matrix",
+        "",
+        "`missing`: only on the reference; `extra`: only on the target; `counts`, `indexes`, `content`, `topology`: the collection differs.",
+        "",
+        "| Collection | " + " | ".join(targets) + " |",
+        "|------------|" + "|".join("-" * (len(target) + 2) for target in targets) + "|",
+    ]
+    for collection in sorted(matrix):
+        cells = [", ".join(matrix[collection].get(target, [])) or "ok" for target in targets]
+        lines.append(f"| {collection} | " + " | ".join(cells) + " |")
+
+    errors = [result for result in results if 'error' in result]
+    if errors:
+        lines.append("\n## Failed targets:")
+        lines.extend(f"- {result['target']}: {result['error']}" for result in errors)
+
+    os.makedirs(log_dir, exist_ok=True)
+    report_file = os.path.join(log_dir, f"matrix-{date_str}.md")
+    with open(report_file, 'w') as output:
+        output.write('\n'.join(lines) + '\n')
+    with open(os.path.join(log_dir, f"matrix-{date_str}.json"), 'w') as output:
+        json.dump({'targets': results, 'matrix': matrix}, output, separators=(',', ':'))
+    return report_file
@@ -0,0 +1,79 @@
+import math
+import random
+from statistics import NormalDist
+from typing import Any, Dict, List, Optional, Tuple
+from .documents import document_digest, split_key_ranges
+
+def wilson_interval(mismatches: int, sampled: int, confidence: float = 0.95,
+                    population: Optional[int] = None) -> Tuple[float, float]:
+    """Confidence bounds on a mismatch rate from mismatches out of sampled documents.
+
+    Uses the Wilson score interval, which stays meaningful when no mismatches were seen.
+    With the population size, the finite population correction narrows the interval
+    as the sample approaches the whole collection.
+    """
+    if sampled == 0:
+        return 0.0, 1.0
+    z2 = NormalDist().inv_cdf(0.5 + confidence / 2) ** 2
+    if population is not None and population > 1:
+        z2 *= max(0.0, (population - sampled) / (population - 1))
+    rate = mismatches / sampled
+    denominator = 1 + z2 / sampled
+    centre = (rate + z2 / (2 * sampled)) / denominator
+    half_width = math.sqrt(z2 * rate * (1 - rate) / sampled + z2 * z2 / (4 * sampled * sampled)) / denominator
+    return max(0.0, centre - half_width), min(1.0, centre + half_width)
+
+def draw_sample(client, collection_name: str, sample_size: int, population: int, strata: int = 1) -> List[str]:
+    """Randomly chosen _keys of a collection of about population documents.
+
+    With strata > 1 the _key space is split into that many ranges of roughly equal size
+    and each range contributes an equal share, so the sample covers the whole key space
+    (e.g. recently inserted keys) instead of relying on chance. The ranges are cut from
+    a sample twice as large and the shares drawn from it, so this is still one query.
+    """
+    if strata <= 1:
+        return client.sample_keys(collection_name, sample_size, population)
+    drawn = sorted(set(client.sample_keys(collection_name, 2 * sample_size, population)))
+    ranges = split_key_ranges(drawn, strata)
+    per_range = -(-sample_size // len(ranges))
+    keys = []
+    for lower, upper in ranges:
+        in_range = [key for key in drawn if (lower is None or key >= lower) and (upper is None or key < upper)]
+        keys.extend(random.sample(in_range, min(per_range, len(in_range))))
+    return keys
+
+def compare_collection_sample(client1, client2, collection_name: str, sample_size: int = 1000, strata: int = 1,
+                              confidence: float = 0.95, population: Optional[int] = None,
+                              batch_size: int = 1000) -> Dict[str, Any]:
+    """Compare a random sample of the first server's documents with the same keys on the second.
+
+    Returns the differing sampled keys as (status, key) pairs ('removed' when the key is
+    missing on the second server, 'changed' when its content differs), together with the
+    observed mismatch rate and its confidence bounds. Documents only on the second server
+    cannot be found this way; the count tier covers those.
+    """
+    if population is None:
+        population = client1.get_collection_count(collection_name)
+    keys = draw_sample(client1, collection_name, sample_size, population, strata)
+    differences = []
+    sampled = 0
+    documents1 = client1.get_documents(collection_name, keys, batch_size)
+    documents2 = client2.get_documents(collection_name, keys, batch_size)
+    for key, document1, document2 in zip(keys, documents1, documents2):
+        if document1 is None:
+            # Removed from the first server since it was sampled.
+            continue
+        sampled += 1
+        if document2 is None:
+            differences.append(('removed', key))
+        elif document_digest(document1) != document_digest(document2):
+            differences.append(('changed', key))
+
+    lower, upper = wilson_interval(len(differences), sampled, confidence, population)
+    return {
+        'sampled': sampled,
+        'differences': differences,
+        'rate': len(differences) / sampled if sampled else 0.0,
+        'lower': lower,
+        'upper': upper,
+    }
@@ -0,0 +1,50 @@
+import datetime
+import json
+import sqlite3
+import threading
+from typing import Any, Dict, Optional
+from .summary import summary_json_default
+
+class SnapshotStore:
+    """SQLite-backed record of previous runs.
+
+    Keeps, per compared collection, the state both sides were in (counts, index
+    details, revision) together with the outcome of the content comparison. A
+    collection whose state is unchanged on both sides can reuse that outcome instead
+    of being checksummed or diffed again.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        # Reports may be written from worker threads; sqlite3 connections are not shareable by default.
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS collections ("
+                "pair TEXT, collection TEXT, state TEXT, outcome TEXT, taken_at TEXT, PRIMARY KEY (pair, collection))"
+            )
+
+    def load_outcome(self, pair: str, collection: str, state: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Return the stored outcome if the collection was last seen in exactly this state."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT state, outcome, taken_at FROM collections WHERE pair = ? AND collection = ?", (pair, collection)
+            ).fetchone()
+        if row is None or row[0] != json.dumps(state, sort_keys=True, default=summary_json_default):
+            return None
+        return dict(json.loads(row[1]), taken_at=row[2])
+
+    def save_outcome(self, pair: str, collection: str, state: Dict[str, Any], outcome: Dict[str, Any]) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO collections VALUES (?, ?, ?, ?, ?)",
+                (pair, collection, json.dumps(state, sort_keys=True, default=summary_json_default),
+                 json.dumps(outcome, sort_keys=True), _now()),
+            )
+
+    def close(self) -> None:
+        self._conn.close()
+
+def _now() -> str:
+    return datetime.datetime.now().strftime('%Y-%m-%d-%H-%M-%S')
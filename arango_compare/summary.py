@@ -0,0 +1,94 @@
+import json
+import sys
+from array import array
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Tuple
+
+class CollectionTable(Mapping):
+    """Per-collection details of a summary, stored column-wise.
+
+    Document and index counts live in two array('q') columns indexed by row, names are
+    interned and map to their row, and identical index definitions are stored once and
+    shared between collections. At tens of thousands of collections this takes a
+    fraction of the memory of one dict per collection.
+
+    It is a read-only mapping of name to {'document_count', 'index_count', 'indexes'},
+    so code written against the plain-dict summary keeps working; those dicts are built
+    on access. Columns can be read directly with row(), document_count() and index_count().
+    """
+
+    __slots__ = ('names', 'document_counts', 'index_counts', '_rows', '_indexes', '_index_pool')
+
+    def __init__(self):
+        self.names: List[str] = []
+        self.document_counts = array('q')
+        self.index_counts = array('q')
+        self._rows: Dict[str, int] = {}
+        self._indexes: List[Tuple[Dict[str, Any], ...]] = []
+        self._index_pool: Dict[str, Dict[str, Any]] = {}
+
+    @classmethod
+    def from_details(cls, collection_details) -> 'CollectionTable':
+        """Build a table from a name -> details mapping; tables are returned as they are."""
+        if isinstance(collection_details, cls):
+            return collection_details
+        table = cls()
+        for name, details in collection_details.items():
+            table.add(name, details['document_count'], details['index_count'], details.get('indexes', ()))
+        return table
+
+    def add(self, name: str, document_count: int, index_count: int, indexes=()) -> None:
+        if name in self._rows:
+            raise ValueError(f"Collection '{name}' is already in the table")
+        name = sys.intern(name)
+        self._rows[name] = len(self.names)
+        self.names.append(name)
+        self.document_counts.append(document_count)
+        self.index_counts.append(index_count)
+        self._indexes.append(tuple(self._shared_index(index) for index in indexes))
+
+    def _shared_index(self, index: Dict[str, Any]) -> Dict[str, Any]:
+        key = json.dumps(index, sort_keys=True, separators=(',', ':'), default=str)
+        return self._index_pool.setdefault(key, index)
+
+    def row(self, name: str) -> int:
+        return self._rows[name]
+
+    def document_count(self, name: str) -> int:
+        return self.document_counts[self._rows[name]]
+
+    def index_count(self, name: str) -> int:
+        return self.index_counts[self._rows[name]]
+
+    def indexes(self, name: str) -> List[Dict[str, Any]]:
+        return list(self._indexes[self._rows[name]])
+
+    def __getitem__(self, name: str) -> Dict[str, Any]:
+        row = self._rows[name]
+        return {'document_count': self.document_counts[row], 'index_count': self.index_counts[row],
+                'indexes': list(self._indexes[row])}
+
+    def __contains__(self, name) -> bool:
+        return name in self._rows
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.names)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def keys(self):
+        # The dict's keys view supports set operations without copying the names.
+        return self._rows.keys()
+
+    def to_dict(self) -> Dict[str, Dict[str, Any]]:
+        return {name: self[name] for name in self.names}
+
+    def __repr__(self) -> str:
+        return f"CollectionTable({len(self)} collections)"
+
+def summary_json_default(value):
+    """json.dumps default= hook that writes CollectionTables as plain dicts."""
+    if isinstance(value, CollectionTable):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
@@ -0,0 +1,277 @@
+"""A local stand-in for the parts of the ArangoDB HTTP API that arangocompare uses.
+
+The catalog is synthetic: collection ``c00000`` ... holds ``documents`` documents whose
+keys are ``k00000000`` ... and which are generated on demand, so large volumes cost no
+memory. A ``drift`` fraction changes the value of every 1/drift-th document, which
+lets two servers be compared with known differences.
+"""
+import hashlib
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, Optional
+from urllib.parse import parse_qs, unquote, urlparse
+
+class MockCatalog:
+
+    def __init__(self, collections: int = 10, documents: int = 100, drift: float = 0.0, payload_size: int = 32,
+                 graphs: int = 1, analyzers: int = 2, views: int = 1):
+        self.names = [f"c{i:05d}" for i in range(collections)]
+        self._name_set = set(self.names)
+        self.documents = documents
+        self.drift_every = int(1 / drift) if drift else 0
+        self.payload = 'x' * payload_size
+        self.graphs = [{'name': f"graph{i}", '_key': f"graph{i}",
+                        'edgeDefinitions': [{'collection': self.names[0] if self.names else 'edges',
+                                             'from': ['vertices'], 'to': ['vertices']}],
+                        'orphanCollections': []} for i in range(graphs)]
+        self.analyzers = [{'name': f"analyzer{i}", 'type': 'identity', 'properties': {}, 'features': ['frequency']}
+                          for i in range(analyzers)]
+        self.views = [{'name': f"view{i}", 'type': 'arangosearch', 'id': str(i)} for i in range(views)]
+
+    def has(self, name: str) -> bool:
+        return name in self._name_set
+
+    def document(self, collection: str, index: int) -> Dict[str, Any]:
+        drifted = self.drift_every and index % self.drift_every == 0
+        key = f"k{index:08d}"
+        document = {'_key': key, '_id': f"{collection}/{key}", '_rev': f"r{index}", 'value': index,
+                    'payload': self.payload}
+        if drifted:
+            document['drifted'] = True
+        return document
+
+    def iter_documents(self, collection: str, lower: Optional[str] = None,
+                       upper: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        start = int(lower[1:]) if lower else 0
+        stop = min(self.documents, int(upper[1:])) if upper else self.documents
+        return (self.document(collection, i) for i in range(start, stop))
+
+    def indexes(self, collection: str):
+        return [
+            {'id': f"{collection}/0", 'name': 'primary', 'type': 'primary', 'fields': ['_key'], 'unique': True, 'sparse': False},
+            {'id': f"{collection}/1", 'name': 'idx_value', 'type': 'persistent', 'fields': ['value'],
+             'unique': False, 'sparse': False},
+        ]
+
+    def checksum(self, collection: str) -> str:
+        return hashlib.md5(f"{collection}:{self.documents}:{self.drift_every}".encode()).hexdigest()
+
+def _digest(value: Any) -> int:
+    encoded = json.dumps(value, sort_keys=True, separators=(',', ':'))
+    return int(hashlib.md5(encoded.encode()).hexdigest()[:13], 16)
+
+def _bucket(key: str, length: int) -> str:
+    return hashlib.md5(key.encode()).hexdigest()[:length]
+
+class MockArangoServer:
+    """Serves a MockCatalog over HTTP, counting requests per endpoint and adding optional latency."""
+
+    def __init__(self, catalog: MockCatalog, latency: float = 0.0, host: str = '127.0.0.1', port: int = 0):
+        self.catalog = catalog
+        self.latency = latency
+        self.request_counts: Dict[str, int] = {}
+        self._counts_lock = threading.Lock()
+        self._cursors: Dict[str, Iterator[Any]] = {}
+        self._cursor_ids = itertools.count(1)
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'MockArangoServer':
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def serve_forever(self) -> None:
+        self._httpd.serve_forever()
+
+    def count(self, endpoint: str) -> None:
+        with self._counts_lock:
+            self.request_counts[endpoint] = self.request_counts.get(endpoint, 0) + 1
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                self._dispatch('GET')
+
+            def do_POST(self):
+                self._dispatch('POST')
+
+            def do_PUT(self):
+                self._dispatch('PUT')
+
+            def _dispatch(self, method):
+                if server.latency:
+                    time.sleep(server.latency)
+                length = int(self.headers.get('Content-Length', 0))
+                body = self.rfile.read(length) if length else b''
+                status, payload, headers = server.handle(method, self.path, body, self.headers)
+                data = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', headers.get('Content-Type', 'application/json'))
+                for name, value in headers.items():
+                    if name != 'Content-Type':
+                        self.send_header(name, value)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+    def handle(self, method: str, raw_path: str, body: bytes, headers) -> tuple:
+        parsed = urlparse(raw_path)
+        params = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+        path = re.sub(r'^/_db/[^/]+', '', unquote(parsed.path))
+        catalog = self.catalog
+
+        if method == 'GET' and path == '/_api/database':
+            self.count('database')
+            return 200, {'result': ['_system']}, {}
+        if method == 'GET' and path == '/_api/collection':
+            self.count('collection')
+            offset = int(params.get('offset', 0))
+            limit = int(params.get('limit', len(catalog.names) or 1))
+            page = catalog.names[offset:offset + limit]
+            return 200, {'result': [{'name': name, 'type': 2} for name in page],
+                         'hasMore': offset + limit < len(catalog.names)}, {}
+        match = re.fullmatch(r'/_api/collection/([^/]+)/(count|checksum|revision)', path)
+        if method == 'GET' and match:
+            name, what = match.groups()
+            self.count(what)
+            if not catalog.has(name):
+                return 404, {'error': True, 'errorNum': 1203}, {}
+            if what == 'count':
+                return 200, {'count': catalog.documents}, {}
+            if what == 'checksum':
+                return 200, {'checksum': catalog.checksum(name), 'revision': '1'}, {}
+            return 200, {'revision': catalog.checksum(name)}, {}
+        if method == 'GET' and path == '/_api/index':
+            self.count('index')
+            name = params.get('collection', '')
+            if not catalog.has(name):
+                return 404, {'error': True, 'errorNum': 1203}, {}
+            return 200, {'indexes': catalog.indexes(name)}, {}
+        if method == 'GET' and path == '/_api/gharial':
+            self.count('gharial')
+            return 200, {'graphs': catalog.graphs}, {}
+        if method == 'GET' and path == '/_api/analyzer':
+            self.count('analyzer')
+            return 200, {'result': catalog.analyzers}, {}
+        if method == 'GET' and path == '/_api/view':
+            self.count('view')
+            return 200, {'result': catalog.views}, {}
+        if method == 'POST' and path == '/_api/cursor':
+            self.count('cursor')
+            request = json.loads(body)
+            results = self.run_query(request['query'], request.get('bindVars', {}))
+            return 201, self._cursor_page(iter(results), request.get('batchSize', 1000), None), {}
+        match = re.fullmatch(r'/_api/cursor/(\d+)', path)
+        if method in ('PUT', 'POST') and match:
+            self.count('cursor')
+            cursor_id = match.group(1)
+            results, batch_size = self._cursors.pop(cursor_id)
+            return 200, self._cursor_page(results, batch_size, cursor_id), {}
+        if method == 'POST' and path == '/_api/batch':
+            self.count('batch')
+            return self.run_batch(body, headers)
+        return 404, {'error': True, 'errorMessage': f"unknown path {method} {path}"}, {}
+
+    def _cursor_page(self, results: Iterator[Any], batch_size: int, cursor_id: Optional[str]) -> Dict[str, Any]:
+        page = list(itertools.islice(results, batch_size))
+        peek = list(itertools.islice(results, 1))
+        response = {'result': page, 'hasMore': bool(peek), 'error': False}
+        if peek:
+            cursor_id = cursor_id or str(next(self._cursor_ids))
+            self._cursors[cursor_id] = (itertools.chain(peek, results), batch_size)
+            response['id'] = cursor_id
+        return response
+
+    def run_query(self, query: str, bind_vars: Dict[str, Any]) -> Iterator[Any]:
+        """Evaluate the handful of AQL queries arangocompare sends."""
+        catalog = self.catalog
+        collection = bind_vars.get('@collection')
+        if 'COLLECTION_COUNT' in query:
+            return iter([{'name': name, 'count': catalog.documents} for name in bind_vars['names']])
+        if 'RAND() < @fraction' in query:
+            documents = catalog.iter_documents(collection, bind_vars.get('lower'), bind_vars.get('upper'))
+            sample = (doc['_key'] for doc in documents if random.random() < bind_vars['fraction'])
+            return itertools.islice(sample, bind_vars['limit'])
+        if 'DOCUMENT(@collection, key)' in query:
+            return (self._lookup(bind_vars['collection'], key) for key in bind_vars['keys'])
+        if 'COLLECT b = bucket' in query:
+            return iter(self._bucket_digests(query, collection, bind_vars))
+        if '@buckets' in query:
+            length = bind_vars['prefix_length']
+            buckets = set(bind_vars['buckets'])
+            rows = ([_bucket(doc['_key'], length), doc['_key'], self._item_hash(query, doc)]
+                    for doc in catalog.iter_documents(collection) if _bucket(doc['_key'], length) in buckets)
+            return iter(sorted(rows, key=lambda row: row[0]))
+        if 'SORT d._key RETURN d' in query:
+            return catalog.iter_documents(collection, bind_vars.get('lower'), bind_vars.get('upper'))
+        raise ValueError(f"mock server cannot evaluate query: {query}")
+
+    def _lookup(self, collection: str, key: str) -> Optional[Dict[str, Any]]:
+        index = int(key[1:])
+        return self.catalog.document(collection, index) if index < self.catalog.documents else None
+
+    def _item_hash(self, query: str, doc: Dict[str, Any]) -> int:
+        if '[d._key, d._rev]' in query:
+            return _digest([doc['_key'], doc['_rev']])
+        return _digest({key: value for key, value in doc.items() if key not in ('_id', '_rev')})
+
+    def _bucket_digests(self, query, collection, bind_vars):
+        length = bind_vars['prefix_length']
+        parent_length = bind_vars['parent_length']
+        parents = set(bind_vars['parents'])
+        buckets: Dict[str, list] = {}
+        for doc in self.catalog.iter_documents(collection):
+            bucket = _bucket(doc['_key'], length)
+            if bucket[:parent_length] not in parents:
+                continue
+            h = self._item_hash(query, doc)
+            digest = buckets.setdefault(bucket, [0, 0, 0])
+            digest[0] += 1
+            digest[1] += h % 4194304
+            digest[2] += (h // 4194304) % 4194304
+        return [[bucket] + digest for bucket, digest in buckets.items()]
+
+    def run_batch(self, body: bytes, headers) -> tuple:
+        boundary = headers.get('Content-Type', '').split('boundary=')[-1]
+        parts = []
+        for part in body.decode().split(f"--{boundary}"):
+            part = part.strip()
+            if not part or part == '--':
+                continue
+            part_headers, _, request_line = part.partition('\r\n\r\n')
+            content_id = next(line.split(':', 1)[1].strip() for line in part_headers.splitlines()
+                              if line.lower().startswith('content-id:'))
+            method, path, _ = request_line.split('\r\n')[0].split(' ', 2)
+            status, payload, _ = self.handle(method, path, b'', {})
+            parts.append(
+                f"--{boundary}\r\nContent-Type: application/x-arango-batchpart\r\nContent-Id: {content_id}\r\n\r\n"
+                f"HTTP/1.1 {status} OK\r\nContent-Type: application/json\r\n\r\n{json.dumps(payload)}\r\n"
+            )
+        data = (''.join(parts) + f"--{boundary}--\r\n").encode()
+        return 200, data, {'Content-Type': f"multipart/form-data; boundary={boundary}", 'x-arango-errors': '0'}
@@ -0,0 +1,139 @@
+"""Measure end-to-end summary and comparison cost against local mock ArangoDB servers.
+
+Run from the repository root, for example:
+
+    python -m benchmarks.run_benchmarks --collections 10,100,1000 --documents 1000 --depth hash
+
+Each scale starts two mock servers in a separate process (so their memory does not count
+against the client), collects both summaries, compares them and prints wall time and request
+counts per endpoint. A second, traced pass measures the memory the two summaries retain and
+the client's peak memory.
+"""
+import argparse
+import json
+import multiprocessing
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Dict
+
+from arango_compare.client import ArangoDBClient
+from arango_compare.comparator import DEPTHS, compare_databases
+from benchmarks.mock_arango import MockArangoServer, MockCatalog
+
+def _serve(catalog_options, latency, ready, counts):
+    server = MockArangoServer(MockCatalog(**catalog_options), latency=latency)
+    ready.put(server.url)
+    server.start()
+    # Publish request counts until the parent terminates us.
+    while True:
+        time.sleep(0.05)
+        counts.update(server.request_counts)
+
+class ServerProcess:
+
+    def __init__(self, manager, catalog_options: Dict[str, Any], latency: float):
+        ready = multiprocessing.Queue()
+        self.counts = manager.dict()
+        self.process = multiprocessing.Process(target=_serve, args=(catalog_options, latency, ready, self.counts),
+                                               daemon=True)
+        self.process.start()
+        self.url = ready.get(timeout=30)
+
+    def request_counts(self) -> Dict[str, int]:
+        time.sleep(0.1)
+        return dict(self.counts)
+
+    def stop(self) -> None:
+        self.process.terminate()
+        self.process.join()
+
+def run_comparison(clients, args):
+    start = time.perf_counter()
+    summaries = [client.get_summary() for client in clients]
+    summary_seconds = time.perf_counter() - start
+    with tempfile.TemporaryDirectory() as log_dir:
+        start = time.perf_counter()
+        differences = compare_databases(clients[0], clients[1], summaries[0], summaries[1], log_dir,
+                                        depth=args.depth, batch_size=args.batch_size, quiet=True)
+        compare_seconds = time.perf_counter() - start
+    return summary_seconds, compare_seconds, differences
+
+def run_scale(manager, collections: int, documents: int, args) -> Dict[str, Any]:
+    servers = [
+        ServerProcess(manager, {'collections': collections, 'documents': documents}, args.latency_ms / 1000),
+        ServerProcess(manager, {'collections': collections, 'documents': documents, 'drift': args.drift},
+                      args.latency_ms / 1000),
+    ]
+    client_options = {'max_workers': args.max_workers, 'metadata_strategy': args.metadata_strategy}
+    clients = [ArangoDBClient(server.url, 'root', '', '_system', **client_options) for server in servers]
+    try:
+        summary_seconds, compare_seconds, differences = run_comparison(clients, args)
+        requests = [server.request_counts() for server in servers]
+        # tracemalloc slows allocation-heavy code several times over, so memory gets its own pass.
+        tracemalloc.start()
+        summaries = [client.get_summary() for client in clients]
+        # What the two summaries keep alive once built, as opposed to the peak while building and comparing.
+        summary_memory, _ = tracemalloc.get_traced_memory()
+        del summaries
+        run_comparison(clients, args)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return {
+            'collections': collections,
+            'documents': documents,
+            'summary_seconds': summary_seconds,
+            'compare_seconds': compare_seconds,
+            'peak_memory_bytes': peak,
+            'summary_memory_bytes': summary_memory,
+            'content_mismatches': len(differences['content_mismatches'] or []),
+            'requests': requests,
+        }
+    finally:
+        for client in clients:
+            client.close()
+        for server in servers:
+            server.stop()
+
+def format_results(results) -> str:
+    lines = [
+        f"{'Collections':>12} {'Documents':>12} {'Summary s':>10} {'Compare s':>10} {'Summary MiB':>12} "
+        f"{'Peak MiB':>10} {'Requests':>10}",
+        "-"*83,
+    ]
+    for result in results:
+        requests = sum(sum(counts.values()) for counts in result['requests'])
+        lines.append(f"{result['collections']:>12} {result['documents']:>12} {result['summary_seconds']:>10.2f} "
+                     f"{result['compare_seconds']:>10.2f} {result['summary_memory_bytes'] / 2**20:>12.2f} "
+                     f"{result['peak_memory_bytes'] / 2**20:>10.1f} {requests:>10}")
+    return '\n'.join(lines)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--collections', default='10,100,1000', help="comma-separated catalog sizes")
+    parser.add_argument('--documents', default='1000', help="comma-separated documents per collection")
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="added latency per request")
+    parser.add_argument('--drift', type=float, default=0.01, help="fraction of changed documents on the second server")
+    parser.add_argument('--depth', choices=DEPTHS, default='count')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--max-workers', type=int, default=1)
+    parser.add_argument('--metadata-strategy', default='per_collection')
+    parser.add_argument('--json', help="also write the results to this file")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = []
+    with multiprocessing.Manager() as manager:
+        for collections in (int(value) for value in args.collections.split(',')):
+            for documents in (int(value) for value in args.documents.split(',')):
+                results.append(run_scale(manager, collections, documents, args))
+                print(format_results(results[-1:]).splitlines()[-1] if len(results) > 1 else format_results(results),
+                      flush=True)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    return results
+
+if __name__ == '__main__':
+    main()
@@ -7,9 +7,13 @@ setup(
     install_requires=[
         'requests',
     ],
+    extras_require={
+        'numpy': ['numpy'],
+        'async': ['aiohttp'],
+    },
     entry_points={
         'console_scripts': [
-            'arango_compare=arango_compare.arango_compare:main',
+            'arango_compare=arango_compare.main:main',
         ],
     },
 )
@@ -1,14 +1,21 @@
+import asyncio
 import datetime
+import json
 import os
 import tempfile
-from unittest import TestCase
+import threading
+import time
+from unittest import TestCase, skipUnless
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import Mock, patch
+import requests
+from arango_compare import async_client
 from arango_compare.client import ArangoDBClient
 from arango_compare.comparator import compare_databases
 
 class TestArangoDBClient(TestCase):
 
-    @patch('arango_compare.client.requests.get')
+    @patch('arango_compare.client.requests.Session.get')
     def test_get_graphs(self, mock_get):
         mock_response = Mock()
         mock_response.json.return_value = {
@@ -26,7 +33,7 @@ class TestArangoDBClient(TestCase):
         self.assertEqual(graph_count[0]['name'], 'graph1')
         self.assertEqual(graph_count[1]['name'], 'graph2')
 
-    @patch('arango_compare.client.requests.get')
+    @patch('arango_compare.client.requests.Session.get')
     def test_get_summary(self, mock_get):
         mock_response_collections = Mock()
         mock_response_collections.json.return_value = {
@@ -70,8 +77,162 @@ class TestArangoDBClient(TestCase):
         self.assertEqual(summary['total_analyzers'], 2)
         self.assertEqual(summary['total_views'], 2)
 
-    @patch('arango_compare.comparator.print_and_write')
-    def test_compare_databases(self, mock_print_and_write):
+    @patch('arango_compare.client.requests.Session.get')
+    def test_get_summary_concurrent_matches_serial(self, mock_get):
+        def respond(url, **kwargs):
+            response = Mock()
+            if url.endswith('/_api/collection'):
+                response.json.return_value = {
+                    'result': [{'name': f'collection{i}'} for i in range(20)],
+                    'hasMore': False
+                }
+            elif url.endswith('/count'):
+                name = url.split('/')[-2]
+                response.json.return_value = {'count': int(name[len('collection'):])}
+            elif '/_api/index' in url:
+                response.json.return_value = {'indexes': [{'id': '1'}]}
+            elif url.endswith('/_api/gharial'):
+                response.json.return_value = {'graphs': []}
+            else:
+                response.json.return_value = {'result': [{'name': 'entity1'}]}
+            return response
+
+        mock_get.side_effect = respond
+
+        serial = ArangoDBClient('http://localhost:8529', 'root', 'password', 'test_db1').get_summary()
+        concurrent = ArangoDBClient('http://localhost:8529', 'root', 'password', 'test_db1', max_workers=8).get_summary()
+
+        self.assertEqual(serial, concurrent)
+        self.assertEqual(list(serial['collection_details']), list(concurrent['collection_details']))
+        self.assertEqual(concurrent['total_documents'], sum(range(20)))
+
+    @patch('arango_compare.client.requests.Session.get')
+    def test_get_summary_concurrent_reports_failing_collection(self, mock_get):
+        def respond(url, **kwargs):
+            response = Mock()
+            if url.endswith('/_api/collection'):
+                response.json.return_value = {'result': [{'name': 'good'}, {'name': 'bad'}], 'hasMore': False}
+            elif url.endswith('bad/count'):
+                response.raise_for_status.side_effect = requests.HTTPError('404 Client Error')
+            else:
+                response.json.return_value = {'count': 1, 'indexes': [], 'graphs': [], 'result': []}
+            return response
+
+        mock_get.side_effect = respond
+
+        client = ArangoDBClient('http://localhost:8529', 'root', 'password', 'test_db1', max_workers=4)
+        with self.assertRaisesRegex(requests.HTTPError, "collection 'bad'"):
+            client.get_summary()
+
+    def test_get_summary_fills_the_table_as_details_arrive(self):
+        from arango_compare.summary import CollectionTable
+
+        calls = []
+        client = ArangoDBClient('http://localhost:8529', 'root', 'password', 'test_db1')
+        client.get_collections = Mock(return_value=[{'name': 'a'}, {'name': 'b'}])
+        client.get_graphs = client.get_analyzers = client.get_views = Mock(return_value=[])
+
+        def details(name):
+            calls.append(('fetch', name))
+            return {'document_count': 1, 'index_count': 0}
+
+        client.get_collection_details = Mock(side_effect=details)
+        add = CollectionTable.add
+        with patch.object(CollectionTable, 'add', autospec=True,
+                          side_effect=lambda table, name, *args: (calls.append(('add', name)), add(table, name, *args))):
+            summary = client.get_summary()
+
+        self.assertEqual(calls, [('fetch', 'a'), ('add', 'a'), ('fetch', 'b'), ('add', 'b')])
+        self.assertEqual(summary['total_documents'], 2)
+
+    def test_session_is_pooled_with_retries(self):
+        client = ArangoDBClient('https://localhost:8529', 'root', 'password', 'test_db1', max_workers=32, timeout=5)
+        adapter = client.session.get_adapter('https://localhost:8529')
+
+        self.assertEqual(adapter._pool_maxsize, 32)
+        self.assertEqual(client.session.auth, client.auth)
+        self.assertIn(503, adapter.max_retries.status_forcelist)
+        self.assertIn(429, adapter.max_retries.status_forcelist)
+        self.assertNotIn('PUT', adapter.max_retries.allowed_methods)
+        self.assertGreater(adapter.max_retries.backoff_factor, 0)
+
+    @patch('arango_compare.client.requests.Session.post')
+    def test_get_bulk_collection_details(self, mock_post):
+        def respond(url, **kwargs):
+            response = Mock()
+            if url.endswith('/_api/cursor'):
+                names = kwargs['json']['bindVars']['names']
+                response.json.return_value = {
+                    'result': [{'name': name, 'count': 10 * (i + 1)} for i, name in enumerate(names)],
+                    'hasMore': False
+                }
+            else:
+                boundary = kwargs['headers']['Content-Type'].split('boundary=')[1]
+                parts = []
+                for i, request_part in enumerate(kwargs['data'].decode().split(f'--{boundary}')[1:-1]):
+                    indexes = [{'id': str(n), 'type': 'persistent', 'fields': [f'f{n}']} for n in range(i + 1)]
+                    parts.append(
+                        f"--{boundary}\r\nContent-Type: application/x-arango-batchpart\r\nContent-Id: {i}\r\n\r\n"
+                        f"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n\r\n"
+                        + json.dumps({'indexes': indexes}) + "\r\n"
+                    )
+                response.text = ''.join(parts) + f"--{boundary}--"
+                response.headers = {'Content-Type': f'multipart/form-data; boundary={boundary}'}
+            return response
+
+        mock_post.side_effect = respond
+
+        client = ArangoDBClient('http://localhost:8529', 'root', 'password', 'test_db1',
+                                metadata_strategy='bulk', bulk_chunk_size=2)
+        details = client.get_bulk_collection_details(['a', 'b', 'c'])
+
+        first = {'type': 'persistent', 'fields': ['f0']}
+        second = {'type': 'persistent', 'fields': ['f1']}
+        self.assertEqual(details, {
+            'a': {'document_count': 10, 'index_count': 1, 'indexes': [first]},
+            'b': {'document_count': 20, 'index_count': 2, 'indexes': [first, second]},
+            'c': {'document_count': 10, 'index_count': 1, 'indexes': [first]},
+        })
+        # Two chunks, each one AQL query plus one batch request.
+        self.assertEqual(mock_post.call_count, 4)
+
+    @patch('arango_compare.client.requests.Session.get')
+    @patch('arango_compare.client.requests.Session.post')
+    def test_get_bulk_collection_details_falls_back(self, mock_post, mock_get):
+        rejected = Mock()
+        rejected.raise_for_status.side_effect = requests.HTTPError('403 Client Error')
+        mock_post.return_value = rejected
+
+        mock_response = Mock()
+        mock_response.json.return_value = {'count': 5, 'indexes': [{'id': '1'}]}
+        mock_get.return_value = mock_response
+
+        client = ArangoDBClient('http://localhost:8529', 'root', 'password', 'test_db1',
+                                metadata_strategy='bulk', bulk_chunk_size=1)
+        details = client.get_bulk_collection_details(['a', 'b'])
+
+        self.assertEqual(details['b'], {'document_count': 5, 'index_count': 1, 'indexes': [{}]})
+        # The rejection is remembered, so the second chunk goes straight to the fallback.
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertEqual(mock_get.call_count, 4)
+
+    @patch('builtins.print')
+    @patch('arango_compare.client.requests.Session.get')
+    @patch('arango_compare.client.requests.Session.post')
+    def test_bulk_fallback_respects_quiet(self, mock_post, mock_get, mock_print):
+        rejected = Mock()
+        rejected.raise_for_status.side_effect = requests.HTTPError('403 Client Error')
+        mock_post.return_value = rejected
+        mock_get.return_value.json.return_value = {'count': 5, 'indexes': []}
+
+        for quiet, prints in ((True, 0), (False, 1)):
+            mock_print.reset_mock()
+            client = ArangoDBClient('http://localhost:8529', 'root', 'password', 'test_db1',
+                                    metadata_strategy='bulk', quiet=quiet)
+            client.get_bulk_collection_details(['a'])
+            self.assertEqual(mock_print.call_count, prints)
+
+    def test_compare_databases(self):
         summary1 = {
             'db_name': 'test_db1',
             'total_collections': 2,
@@ -110,5 +271,1358 @@ class TestArangoDBClient(TestCase):
         with tempfile.TemporaryDirectory() as tmpdirname:
             client1 = Mock()  # Mock client1
             client2 = Mock()  # Mock client2
-            compare_databases(client1, client2, summary1, summary2, tmpdirname)
+            compare_databases(client1, client2, summary1, summary2, tmpdirname, quiet=True)
+            (subdir,) = os.listdir(tmpdirname)
+            reports = sorted(os.listdir(os.path.join(tmpdirname, subdir)))
+
+        self.assertEqual(reports, ['analyzers.md', 'graphs.md', 'indexes.md', 'summary.md', 'views.md'])
+
+
+class TestMain(TestCase):
+
+    def test_collect_summaries_runs_servers_concurrently(self):
+        import threading
+        from arango_compare.runner import collect_summaries
+
+        barrier = threading.Barrier(2, timeout=5)
+
+        def make_client(db_name):
+            client = Mock()
+            client.url = 'http://localhost:8529'
+            client.db_name = db_name
+
+            def get_summary():
+                # Both summaries must be in flight at once to get past the barrier.
+                barrier.wait()
+                return {'db_name': db_name}
+
+            client.get_summary.side_effect = get_summary
+            return client
+
+        summary1, summary2 = collect_summaries(make_client('test_db1'), make_client('test_db2'))
+
+        self.assertEqual(summary1['db_name'], 'test_db1')
+        self.assertEqual(summary2['db_name'], 'test_db2')
+
+    def test_quiet_pairs_print_nothing(self):
+        import contextlib
+        import io
+        from arango_compare.runner import compare_pair
+
+        def make_client(db_name, count):
+            client = Mock()
+            client.url = 'http://localhost:8529'
+            client.db_name = db_name
+            client.get_summary.return_value = make_summary(
+                db_name, {'collection1': {'document_count': count, 'index_count': 1}})
+            return client
+
+        stdout = io.StringIO()
+        with tempfile.TemporaryDirectory() as tmpdirname, contextlib.redirect_stdout(stdout):
+            result = compare_pair(make_client('orders', 1), make_client('orders', 2), tmpdirname, {'quiet': True})
+
+        self.assertEqual(result['count_mismatches'], ['collection1'])
+        self.assertEqual(stdout.getvalue(), '')
+
+    def test_options_default_to_the_environment(self):
+        from arango_compare.main import build_parser
+
+        with patch.dict(os.environ, {'ARANGO_COMPARE_DEPTH': 'hash', 'ARANGO_QUIET': 'true'}):
+            parser = build_parser()
+        self.assertEqual(parser.parse_args([]).depth, 'hash')
+        self.assertTrue(parser.parse_args([]).quiet)
+        self.assertEqual(parser.parse_args(['--depth', 'sample', '--db1', 'orders']).depth, 'sample')
+
+    def test_fixed_choices_match_the_modules(self):
+        from arango_compare import client, comparator, hashtree, main
+
+        self.assertEqual(main.DEPTHS, comparator.DEPTHS)
+        self.assertEqual(main.HASH_MODES, tuple(hashtree.HASH_MODES))
+        self.assertEqual(main.METADATA_STRATEGIES, client.METADATA_STRATEGIES)
+
+    def test_invalid_choices_are_rejected(self):
+        from arango_compare.main import main
+
+        for argv, environment in ((['--hash-mode', 'contnet'], {}), (['--depth', 'Documents'], {}),
+                                  ([], {'ARANGO_HASH_MODE': 'contnet'}), ([], {'ARANGO_COMPARE_DEPTH': 'Documents'})):
+            with patch.dict(os.environ, environment), patch('sys.stderr'):
+                with self.assertRaises(SystemExit) as raised:
+                    main(argv)
+            self.assertEqual(raised.exception.code, 2)
+
+    def test_exit_status_reports_failed_pairs_and_collections(self):
+        from arango_compare.main import main
+
+        ok = {'db1': 'orders', 'db2': 'orders', 'failed_collections': []}
+        for result, status in ((ok, 0), ([ok, {'db1': 'x', 'db2': 'x', 'error': 'HTTPError: 404'}], 1),
+                               (dict(ok, failed_collections=['c1']), 1), (None, 0)):
+            with patch('arango_compare.main.run', return_value=result):
+                self.assertEqual(main([]), status)
+
+    def test_every_setting_has_an_option(self):
+        from arango_compare.main import build_parser
+
+        environment = {'ARANGO_SCAN_RANGES': '8', 'ARANGO_TIMEOUT': '5', 'ARANGO_CHECKSUM_WITH_DATA': 'false'}
+        with patch.dict(os.environ, environment):
+            args = build_parser().parse_args(['--sample-strata', '4'])
+        self.assertEqual((args.scan_ranges, args.timeout, args.sample_strata), (8, 5.0, 4))
+        self.assertFalse(args.checksum_with_data)
+        self.assertFalse(build_parser().parse_args(['--checksum-without-data']).checksum_with_data)
+
+    def test_async_engine_rejects_bulk_metadata(self):
+        from arango_compare.main import main
+
+        with patch.dict(os.environ, {'ARANGO_METADATA_STRATEGY': 'bulk'}), patch('sys.stderr'):
+            with self.assertRaises(SystemExit):
+                main(['--engine', 'async'])
+
+    def test_startup_imports_stay_small(self):
+        import subprocess
+        import sys
+
+        # CI and cron jobs start the tool many times; its import cost must not grow with new subsystems.
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import arango_compare.main'],
+                                capture_output=True, text=True, check=True)
+        imported = {}
+        for line in result.stderr.splitlines()[1:]:
+            _, cumulative, name = line.split('|')
+            imported[name.strip()] = int(cumulative)
+
+        for heavy in ('requests', 'urllib3', 'numpy', 'asyncio', 'aiohttp', 'sqlite3', 'http.server',
+                      'concurrent.futures', 'arango_compare.client', 'arango_compare.comparator',
+                      'arango_compare.documents', 'arango_compare.counts'):
+            self.assertNotIn(heavy, imported)
+        self.assertLess(imported['arango_compare.main'], 100000)
+
+class TestDocumentDiff(TestCase):
+
+    def test_diff_documents_merge_join(self):
+        from arango_compare.documents import diff_documents
+
+        stream1 = [('a', '1'), ('b', '2'), ('d', '4'), ('e', '5')]
+        stream2 = [('b', '2'), ('c', '3'), ('d', 'x'), ('f', '6')]
+
+        self.assertEqual(list(diff_documents(stream1, stream2)), [
+            ('removed', 'a'), ('added', 'c'), ('changed', 'd'), ('removed', 'e'), ('added', 'f')
+        ])
+
+    def test_document_digest_ignores_server_attributes(self):
+        from arango_compare.documents import document_digest
+
+        doc1 = {'_key': 'a', '_id': 'c/a', '_rev': '1', 'value': 1, 'nested': {'x': 1, 'y': 2}}
+        doc2 = {'_key': 'a', '_id': 'c/a', '_rev': '2', 'nested': {'y': 2, 'x': 1}, 'value': 1}
+
+        self.assertEqual(document_digest(doc1), document_digest(doc2))
+        self.assertNotEqual(document_digest(doc1), document_digest(dict(doc2, value=2)))
+
+    @patch('arango_compare.client.requests.Session.put')
+    @patch('arango_compare.client.requests.Session.post')
+    def test_stream_documents_follows_cursor(self, mock_post, mock_put):
+        first = Mock()
+        first.json.return_value = {'result': [{'_key': 'a'}], 'hasMore': True, 'id': '42'}
+        second = Mock()
+        second.json.return_value = {'result': [{'_key': 'b'}], 'hasMore': False}
+        mock_post.return_value = first
+        mock_put.return_value = second
+
+        client = ArangoDBClient('http://localhost:8529', 'root', 'password', 'test_db1')
+        documents = list(client.stream_documents('collection1', batch_size=1))
+
+        self.assertEqual([d['_key'] for d in documents], ['a', 'b'])
+        body = mock_post.call_args.kwargs['json']
+        self.assertEqual(body['options'], {'stream': True})
+        self.assertEqual(body['bindVars'], {'@collection': 'collection1'})
+        self.assertTrue(mock_put.call_args.args[0].endswith('/_api/cursor/42'))
+
+    @patch('arango_compare.client.requests.Session.post')
+    def test_sample_keys_filters_without_sorting(self, mock_post):
+        response = Mock()
+        response.json.return_value = {'result': [f'k{i}' for i in range(80)], 'hasMore': False}
+        mock_post.return_value = response
+
+        client = ArangoDBClient('http://localhost:8529', 'root', 'password', 'test_db1')
+        keys = client.sample_keys('collection1', 25, 1000)
+
+        body = mock_post.call_args.kwargs['json']
+        self.assertNotIn('SORT', body['query'])
+        self.assertIn('FILTER RAND() < @fraction', body['query'])
+        self.assertAlmostEqual(body['bindVars']['fraction'], (25 + 4 * 5 + 16) / 1000)
+        # The server's surplus is dropped at random.
+        self.assertEqual(len(keys), 25)
+        self.assertLessEqual(set(keys), {f'k{i}' for i in range(80)})
+
+    def test_stream_document_digests_rejects_unordered_keys(self):
+        from arango_compare.documents import stream_document_digests
+
+        client = Mock()
+        client.stream_documents.return_value = iter([{'_key': 'b'}, {'_key': 'a'}])
+
+        with self.assertRaises(ValueError):
+            list(stream_document_digests(client, 'collection1'))
+
+    def test_compare_databases_documents_depth(self):
+        summary = {
+            'db_name': 'test_db1', 'total_collections': 1, 'total_documents': 2, 'total_indexes': 1,
+            'total_graphs': 0, 'total_analyzers': 0, 'total_views': 0,
+            'collection_details': {'collection1': {'document_count': 2, 'index_count': 1}},
+            'analyzers': [], 'graphs': [], 'views': []
+        }
+        client1 = Mock()
+        client1.stream_documents.side_effect = lambda name, **kwargs: iter([
+            {'_key': 'a', 'value': 1}, {'_key': 'b', 'value': 2}])
+        client2 = Mock()
+        client2.stream_documents.side_effect = lambda name, **kwargs: iter([
+            {'_key': 'a', 'value': 1}, {'_key': 'b', 'value': 3}])
+
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            compare_databases(client1, client2, summary, summary, tmpdirname, depth='documents')
+            (subdir,) = os.listdir(tmpdirname)
+            with open(os.path.join(tmpdirname, subdir, 'documents.md')) as f:
+                report = f.read()
+
+        self.assertIn('- changed: b', report)
+        self.assertNotIn(': a', report)
+
+    def test_unordered_collection_fails_alone(self):
+        details = {'collection1': {'document_count': 2, 'index_count': 1},
+                   'collection2': {'document_count': 2, 'index_count': 1}}
+        summary = make_summary('test_db1', details)
+        documents = {'collection1': [{'_key': 'b'}, {'_key': 'A'}], 'collection2': [{'_key': 'a'}, {'_key': 'b'}]}
+        client1 = Mock()
+        client1.stream_documents.side_effect = lambda name, **kwargs: iter(documents[name])
+        client2 = Mock()
+        client2.stream_documents.side_effect = lambda name, **kwargs: iter(documents[name][:1])
+
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            differences = compare_databases(client1, client2, summary, summary, tmpdirname, depth='documents',
+                                            quiet=True)
+            with open(os.path.join(differences['report_dir'], 'documents.md')) as f:
+                report = f.read()
+
+        self.assertEqual(differences['failed_collections'], ['collection1'])
+        self.assertEqual(differences['content_mismatches'], ['collection1', 'collection2'])
+        self.assertIn("Comparison failed, the differences above may be incomplete: ValueError", report)
+        self.assertIn('- removed: b', report)
+
+class FakeBucketClient:
+    """Evaluates the hash-tree AQL queries in Python over an in-memory {key: value} collection."""
+
+    def __init__(self, documents):
+        self.documents = documents
+        self.queries = []
+
+    def query(self, aql, bind_vars, batch_size=1000, stream=False):
+        import hashlib
+        self.queries.append(bind_vars)
+        md5 = lambda key: hashlib.md5(key.encode()).hexdigest()
+        digest = lambda value: int(hashlib.md5(repr(value).encode()).hexdigest()[:12], 16)
+        length = bind_vars['prefix_length']
+        if 'parents' in bind_vars:
+            buckets = {}
+            for key, value in self.documents.items():
+                bucket = md5(key)[:length]
+                if bucket[:bind_vars['parent_length']] in bind_vars['parents']:
+                    n, total = buckets.get(bucket, (0, 0))
+                    buckets[bucket] = (n + 1, total + digest(value))
+            return [[bucket, n, total, 0] for bucket, (n, total) in buckets.items()]
+        return sorted([md5(key)[:length], key, digest(value)] for key, value in self.documents.items()
+                      if md5(key)[:length] in bind_vars['buckets'])
+
+
+class TestHashTree(TestCase):
+
+    def test_compare_collection_hashes_finds_differences(self):
+        from arango_compare.hashtree import compare_collection_hashes
+
+        documents = {f'key{i}': i for i in range(500)}
+        changed = dict(documents, key7='other')
+        del changed['key9']
+        changed['key1000'] = 1000
+        client1 = FakeBucketClient(documents)
+        client2 = FakeBucketClient(changed)
+
+        diff = sorted(compare_collection_hashes(client1, client2, 'collection1', max_depth=3))
+
+        self.assertEqual(diff, [('added', 'key1000'), ('changed', 'key7'), ('removed', 'key9')])
+        # Below the first level, only the differing branches are queried.
+        deepest = [q for q in client1.queries if q.get('prefix_length') == 3 and 'parents' in q][0]
+        self.assertLessEqual(len(deepest['parents']), 3)
+
+    def test_widespread_drift_fetches_all_leaves_in_one_scan(self):
+        from arango_compare.hashtree import compare_collection_hashes
+
+        documents = {f'key{i}': i for i in range(2000)}
+        client1 = FakeBucketClient(documents)
+        client2 = FakeBucketClient({key: value + 1 if value % 10 == 0 else value for key, value in documents.items()})
+
+        diff = list(compare_collection_hashes(client1, client2, 'collection1', max_depth=3))
+
+        self.assertEqual(sorted(diff), sorted(('changed', f'key{i}') for i in range(0, 2000, 10)))
+        for client in (client1, client2):
+            self.assertEqual(len([q for q in client.queries if 'buckets' in q]), 1)
+
+    def test_zip_buckets_pairs_buckets_missing_on_either_side(self):
+        from arango_compare.hashtree import zip_buckets
+
+        rows1 = [['0a', 'x', 1], ['0a', 'y', 2], ['3f', 'z', 3]]
+        rows2 = [['0a', 'x', 1], ['1b', 'w', 4]]
+
+        self.assertEqual(list(zip_buckets(rows1, rows2)), [
+            ([['x', 1], ['y', 2]], [['x', 1]]),
+            ([], [['w', 4]]),
+            ([['z', 3]], []),
+        ])
+
+    def test_compare_collection_hashes_identical_stops_at_top(self):
+        from arango_compare.hashtree import compare_collection_hashes
+
+        documents = {f'key{i}': i for i in range(100)}
+        client1 = FakeBucketClient(documents)
+        client2 = FakeBucketClient(dict(documents))
+
+        self.assertEqual(list(compare_collection_hashes(client1, client2, 'collection1')), [])
+        self.assertEqual(len(client1.queries), 1)
+
+class TestSnapshot(TestCase):
+
+    def make_summary(self):
+        return {
+            'db_name': 'test_db1', 'total_collections': 1, 'total_documents': 2, 'total_indexes': 1,
+            'total_graphs': 0, 'total_analyzers': 0, 'total_views': 0,
+            'collection_details': {'collection1': {'document_count': 2, 'index_count': 1}},
+            'analyzers': [], 'graphs': [], 'views': []
+        }
+
+    def make_client(self, value, revision):
+        client = Mock()
+        client.url = 'http://localhost:8529'
+        client.get_collection_revision.return_value = revision
+        client.stream_documents.side_effect = lambda name, **kwargs: iter([{'_key': 'a', 'value': value}])
+        return client
+
+    def test_unchanged_collections_are_not_rediffed(self):
+        from arango_compare.snapshot import SnapshotStore
+
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            snapshot = SnapshotStore(os.path.join(tmpdirname, 'snapshot.sqlite3'))
+            summary = self.make_summary()
+            client1 = self.make_client(1, 'rev1')
+            client2 = self.make_client(2, 'rev1')
+
+            compare_databases(client1, client2, summary, summary, tmpdirname, depth='documents', snapshot=snapshot)
+            self.assertEqual(client1.stream_documents.call_count, 1)
+            self.assertEqual(client1.get_collection_checksum.call_count, 1)
+
+            differences = compare_databases(client1, client2, summary, summary, tmpdirname, depth='documents',
+                                            snapshot=snapshot, report_label='second')
+            self.assertEqual(client1.stream_documents.call_count, 1)
+            # Unchanged collections skip the checksum tier as well.
+            self.assertEqual(client1.get_collection_checksum.call_count, 1)
+            self.assertEqual(differences['content_mismatches'], ['collection1'])
+            with open(os.path.join(differences['report_dir'], 'documents.md')) as f:
+                report = f.read()
+            self.assertIn('- changed: a', report)
+            self.assertIn('reusing its result', report)
+
+            client2.get_collection_revision.return_value = 'rev2'
+            compare_databases(client1, client2, summary, summary, tmpdirname, depth='documents', snapshot=snapshot)
+            self.assertEqual(client1.stream_documents.call_count, 2)
+            snapshot.close()
+
+    def test_equal_collections_are_not_checksummed_again(self):
+        from arango_compare.snapshot import SnapshotStore
+
+        snapshot = SnapshotStore(':memory:')
+        summary = self.make_summary()
+        client1 = self.make_client(1, 'rev1')
+        client2 = self.make_client(1, 'rev1')
+        client1.get_collection_checksum.return_value = 'same'
+        client2.get_collection_checksum.return_value = 'same'
+
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            for label in ('first', 'second'):
+                differences = compare_databases(client1, client2, summary, summary, tmpdirname, depth='checksum',
+                                                snapshot=snapshot, report_label=label, quiet=True)
+                self.assertEqual(differences['content_mismatches'], [])
+        self.assertEqual(client1.get_collection_checksum.call_count, 1)
+        snapshot.close()
+
+class TestComparisonTiers(TestCase):
+
+    def test_matching_checksums_skip_document_diff(self):
+        summary = {
+            'db_name': 'test_db1', 'total_collections': 3, 'total_documents': 6, 'total_indexes': 3,
+            'total_graphs': 0, 'total_analyzers': 0, 'total_views': 0,
+            'collection_details': {
+                'same': {'document_count': 1, 'index_count': 1},
+                'drifted': {'document_count': 1, 'index_count': 1},
+                'grown': {'document_count': 1, 'index_count': 1},
+            },
+            'analyzers': [], 'graphs': [], 'views': []
+        }
+        summary2 = dict(summary, collection_details=dict(summary['collection_details'],
+                                                          grown={'document_count': 2, 'index_count': 1}))
+
+        def make_client(drifted_checksum, documents):
+            client = Mock()
+            client.url = 'http://localhost:8529'
+            client.get_collection_checksum.side_effect = lambda name, *args: drifted_checksum if name == 'drifted' else '1'
+            client.stream_documents.side_effect = lambda name, **kwargs: iter(documents[name])
+            return client
+
+        client1 = make_client('1', {'drifted': [{'_key': 'a', 'v': 1}], 'grown': [{'_key': 'a'}]})
+        client2 = make_client('2', {'drifted': [{'_key': 'a', 'v': 2}], 'grown': [{'_key': 'a'}, {'_key': 'b'}]})
+
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            compare_databases(client1, client2, summary, summary2, tmpdirname, depth='documents')
+            (subdir,) = os.listdir(tmpdirname)
+            with open(os.path.join(tmpdirname, subdir, 'summary.md')) as f:
+                report = f.read()
+
+        # 'grown' differs by count so it skips the checksum tier; 'same' is cleared by its checksum.
+        checked = sorted(call.args[0] for call in client1.get_collection_checksum.call_args_list)
+        self.assertEqual(checked, ['drifted', 'same'])
+        streamed = sorted(call.args[0] for call in client1.stream_documents.call_args_list)
+        self.assertEqual(streamed, ['drifted', 'grown'])
+        self.assertIn('# Comparison Tiers', report)
+        self.assertRegex(report, r'checksum\s+2\s+1\s+1')
+        self.assertRegex(report, r'documents\s+2\s+2\s+0')
+
+class FakeDocumentClient:
+    """Picklable stand-in for ArangoDBClient's key-ordered document streaming."""
+
+    def __init__(self, documents, db_name='test_db1', revision='1'):
+        self.documents = documents
+        self.url = 'http://localhost:8529'
+        self.db_name = db_name
+        self.revision = revision
+
+    def get_collection_revision(self, collection_name):
+        return self.revision
+
+    def stream_documents(self, collection_name, batch_size=1000, lower=None, upper=None):
+        for key in sorted(self.documents):
+            if (lower is None or key >= lower) and (upper is None or key < upper):
+                yield {'_key': key, 'value': self.documents[key]}
+
+    def get_collection_count(self, collection_name):
+        return len(self.documents)
+
+    def sample_keys(self, collection_name, sample_size, population, lower=None, upper=None):
+        return sorted(self.documents)[::max(1, len(self.documents) // sample_size)]
+
+
+class TestParallelDocumentDiff(TestCase):
+
+    def make_clients(self):
+        documents = {f'key{i:04d}': i for i in range(400)}
+        changed = dict(documents, key0100='x', key0399='y')
+        del changed['key0200']
+        changed['key9999'] = 1
+        return FakeDocumentClient(documents), FakeDocumentClient(changed)
+
+    def test_parallel_matches_serial(self):
+        from arango_compare.documents import compare_collection_documents, compare_collection_documents_parallel
+
+        client1, client2 = self.make_clients()
+        serial = list(compare_collection_documents(client1, client2, 'collection1'))
+        parallel = list(compare_collection_documents_parallel(client1, client2, 'collection1', ranges=4, processes=2))
+
+        self.assertEqual(parallel, serial)
+        self.assertEqual(sorted(parallel), [('added', 'key9999'), ('changed', 'key0100'),
+                                            ('changed', 'key0399'), ('removed', 'key0200')])
+
+    def test_resume_skips_finished_ranges(self):
+        from arango_compare import documents
+
+        client1, client2 = self.make_clients()
+        with tempfile.TemporaryDirectory() as state_dir:
+            calls = []
+            original = documents.diff_key_range
+
+            def interrupted(*args):
+                if len(calls) == 2:
+                    raise KeyboardInterrupt
+                calls.append(args[3])
+                return original(*args)
+
+            with patch('arango_compare.documents.diff_key_range', side_effect=interrupted):
+                with self.assertRaises(KeyboardInterrupt):
+                    list(documents.compare_collection_documents_parallel(
+                        client1, client2, 'collection1', ranges=4, processes=1, state_dir=state_dir))
+
+            resumed = []
+            with patch('arango_compare.documents.diff_key_range',
+                       side_effect=lambda *args: resumed.append(args[3]) or original(*args)):
+                result = list(documents.compare_collection_documents_parallel(
+                    client1, client2, 'collection1', ranges=4, processes=1, state_dir=state_dir))
+
+            self.assertEqual(len(calls) + len(resumed), 4)
+            self.assertFalse(set(calls) & set(resumed))
+            self.assertEqual(len(result), 4)
+            self.assertEqual(os.listdir(state_dir), [])
+
+    def interrupt_after_two_ranges(self, client1, client2, state_dir):
+        from arango_compare import documents
+
+        calls = []
+        original = documents.diff_key_range
+
+        def interrupted(*args):
+            if len(calls) == 2:
+                raise KeyboardInterrupt
+            calls.append(args[3])
+            return original(*args)
+
+        with patch('arango_compare.documents.diff_key_range', side_effect=interrupted):
+            with self.assertRaises(KeyboardInterrupt):
+                list(documents.compare_collection_documents_parallel(
+                    client1, client2, 'collection1', ranges=4, processes=1, state_dir=state_dir))
+
+    def test_changed_collection_discards_state(self):
+        from arango_compare import documents
+
+        client1, client2 = self.make_clients()
+        with tempfile.TemporaryDirectory() as state_dir:
+            self.interrupt_after_two_ranges(client1, client2, state_dir)
+            client2.revision = '2'
+            progress = []
+            with patch('arango_compare.documents.diff_key_range', wraps=documents.diff_key_range) as scanned:
+                result = list(documents.compare_collection_documents_parallel(
+                    client1, client2, 'collection1', ranges=4, processes=1, state_dir=state_dir,
+                    progress=lambda done, total: progress.append((done, total))))
+
+            self.assertEqual(scanned.call_count, 4)
+            self.assertEqual(len(result), 4)
+            self.assertEqual(progress, [(0, 4), (1, 4), (2, 4), (3, 4), (4, 4)])
+
+    def test_state_is_kept_per_database_pair(self):
+        from arango_compare import documents
+
+        client1, client2 = self.make_clients()
+        with tempfile.TemporaryDirectory() as state_dir:
+            self.interrupt_after_two_ranges(client1, client2, state_dir)
+            other1 = FakeDocumentClient(client1.documents, db_name='orders')
+            other2 = FakeDocumentClient(client2.documents, db_name='orders_dr')
+            with patch('arango_compare.documents.diff_key_range', wraps=documents.diff_key_range) as scanned:
+                list(documents.compare_collection_documents_parallel(
+                    other1, other2, 'collection1', ranges=4, processes=1, state_dir=state_dir))
+
+            self.assertEqual(scanned.call_count, 4)
+            # The interrupted pair's state is left for its own next run.
+            self.assertEqual(len(os.listdir(state_dir)), 1)
+
+    def test_client_can_be_sent_to_worker_processes(self):
+        import pickle
+
+        client = ArangoDBClient('http://localhost:8529', 'root', 'password', 'test_db1', max_workers=4)
+        restored = pickle.loads(pickle.dumps(client))
+
+        self.assertEqual(restored.db_name, 'test_db1')
+        self.assertEqual(restored.session.get_adapter('http://localhost:8529').max_retries.total, 3)
+
+class TestEntityDiff(TestCase):
+
+    def test_deep_diff_reports_nested_paths(self):
+        from arango_compare.diff import deep_diff
+
+        graph1 = {'name': 'g', 'edge_definitions': [
+            {'collection': 'knows', 'from': ['people', 'bots'], 'to': ['people']},
+            {'collection': 'owns', 'from': ['people'], 'to': ['things']},
+        ]}
+        graph2 = {'name': 'g', 'edge_definitions': [
+            {'collection': 'owns', 'from': ['people'], 'to': ['things', 'places']},
+            {'collection': 'knows', 'from': ['bots', 'people'], 'to': ['people']},
+        ]}
+
+        self.assertEqual(deep_diff(graph1, graph2), [
+            {'path': 'edge_definitions[owns].to', 'kind': 'items', 'db1': [], 'db2': ['places']}
+        ])
+
+    def test_deep_diff_dict_keys_and_scalars(self):
+        from arango_compare.diff import deep_diff
+
+        view1 = {'links': {'c1': {'fields': {'a': {}}, 'includeAllFields': False}}, 'cleanupIntervalStep': 2}
+        view2 = {'links': {'c1': {'fields': {'b': {}}, 'includeAllFields': False}}, 'cleanupIntervalStep': 3}
+
+        self.assertEqual(deep_diff(view1, view2), [
+            {'path': 'links.c1.fields.a', 'kind': 'removed', 'db1': {}, 'db2': None},
+            {'path': 'links.c1.fields.b', 'kind': 'added', 'db1': None, 'db2': {}},
+            {'path': 'cleanupIntervalStep', 'kind': 'changed', 'db1': 2, 'db2': 3},
+        ])
+
+    def test_compare_entities_report(self):
+        from arango_compare.comparator import compare_entities
+        from arango_compare.report import MarkdownSink
+
+        analyzers1 = [{'name': 'a1', 'features': ['norm', 'frequency']}, {'name': 'a2', 'features': []}]
+        analyzers2 = [{'name': 'a1', 'features': ['frequency', 'position']}, {'name': 'a3', 'features': []}]
+
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            sink = MarkdownSink(tmpdirname)
+            differences = compare_entities(analyzers1, analyzers2, 'analyzers', sink)
+            sink.close()
+            with open(os.path.join(tmpdirname, 'analyzers.md')) as f:
+                report = f.read()
+
+        self.assertEqual(differences['only_in_db1'], ['a2'])
+        self.assertEqual(differences['only_in_db2'], ['a3'])
+        self.assertIn("### Analyzers: a1", report)
+        self.assertIn("- **features** (unordered):\n  - Only in DB1: ['norm']\n  - Only in DB2: ['position']", report)
+
+class TestIndexComparison(TestCase):
+
+    def test_normalized_indexes_ignore_server_attributes(self):
+        from arango_compare.indexes import index_fingerprint, normalize_index
+
+        index1 = {'id': 'c/1', 'name': 'idx_1', 'type': 'persistent', 'fields': ['a', 'b'],
+                  'unique': True, 'sparse': False, 'selectivityEstimate': 0.5}
+        index2 = dict(index1, id='c/99', name='idx_2', selectivityEstimate=0.9)
+
+        self.assertEqual(index_fingerprint(normalize_index(index1)), index_fingerprint(normalize_index(index2)))
+        self.assertNotEqual(index_fingerprint(normalize_index(index1)),
+                            index_fingerprint(normalize_index(dict(index1, fields=['b', 'a']))))
+
+    def test_compare_databases_reports_index_definitions(self):
+        primary = {'type': 'primary', 'fields': ['_key'], 'unique': True, 'sparse': False}
+        unique = {'type': 'persistent', 'fields': ['email'], 'unique': True, 'sparse': False}
+        plain = dict(unique, unique=False)
+
+        def make_summary(indexes):
+            return {
+                'db_name': 'test_db1', 'total_collections': 1, 'total_documents': 1, 'total_indexes': 2,
+                'total_graphs': 0, 'total_analyzers': 0, 'total_views': 0,
+                'collection_details': {'users': {'document_count': 1, 'index_count': 2, 'indexes': indexes}},
+                'analyzers': [], 'graphs': [], 'views': []
+            }
+
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            compare_databases(Mock(), Mock(), make_summary([primary, unique]), make_summary([primary, plain]), tmpdirname)
+            (subdir,) = os.listdir(tmpdirname)
+            with open(os.path.join(tmpdirname, subdir, 'indexes.md')) as f:
+                report = f.read()
+            with open(os.path.join(tmpdirname, subdir, 'summary.md')) as f:
+                summary = f.read()
+
+        self.assertIn("### Indexes only in DB1:\n- persistent [email] (unique)", report)
+        self.assertIn("### Indexes only in DB2:\n- persistent [email]\n", report + "\n")
+        self.assertIn("**Number of collections with differing index definitions:** 1", summary)
+
+class TestReportSinks(TestCase):
+
+    def test_queued_sink_preserves_order_and_closes_sinks(self):
+        from arango_compare.report import QueuedSink, ReportSink
+
+        class Collecting(ReportSink):
+            def __init__(self):
+                self.events = []
+                self.closed = False
+
+            def emit(self, event):
+                self.events.append(event['n'])
+
+            def close(self):
+                self.closed = True
+
+        inner = Collecting()
+        sink = QueuedSink([inner], maxsize=10)
+        for n in range(100):
+            sink.emit({'report': 'summary', 'event': 'test', 'n': n})
+        sink.close()
+
+        self.assertEqual(inner.events, list(range(100)))
+        self.assertTrue(inner.closed)
+
+    def test_queued_sink_reraises_writer_errors(self):
+        from arango_compare.report import QueuedSink, ReportSink
+
+        class Failing(ReportSink):
+            def emit(self, event):
+                raise OSError('disk full')
+
+        sink = QueuedSink([Failing()])
+        sink.emit({'report': 'summary', 'event': 'test'})
+        with self.assertRaisesRegex(OSError, 'disk full'):
+            sink.close()
+
+    def test_console_sink_skips_document_keys(self):
+        import io
+        from arango_compare.report import ConsoleSink
+
+        stream = io.StringIO()
+        sink = ConsoleSink(stream)
+        sink.emit({'report': 'documents', 'event': 'document_difference', 'collection': 'c', 'status': 'added', 'key': 'k'})
+        sink.emit({'report': 'documents', 'event': 'document_totals', 'collection': 'c',
+                   'added': 1, 'removed': 0, 'changed': 0})
+        self.assertEqual(stream.getvalue(), '')
+        sink.close()
+
+        self.assertEqual(stream.getvalue(), "\nCollection name: c\n  Added in DB2: 1, Removed from DB2: 0, Changed: 0\n")
+
+    def test_ndjson_sink_flushes_per_item_events_in_blocks(self):
+        from arango_compare.report import NdjsonSink
+
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            path = os.path.join(tmpdirname, 'diff.ndjson')
+            sink = NdjsonSink(path)
+            for kind in ('document_difference', 'edge_difference', 'missing_vertex'):
+                sink.emit({'report': 'topology', 'event': kind, 'collection': 'c'})
+            self.assertEqual(os.path.getsize(path), 0)
+            sink.emit({'report': 'topology', 'event': 'topology_totals', 'collection': 'c'})
+            with open(path) as f:
+                self.assertEqual(len(f.readlines()), 4)
+            sink.close()
+
+    def test_ndjson_and_json_outputs(self):
+        summary = {
+            'db_name': 'test_db1', 'total_collections': 1, 'total_documents': 2, 'total_indexes': 1,
+            'total_graphs': 0, 'total_analyzers': 1, 'total_views': 0,
+            'collection_details': {'collection1': {'document_count': 2, 'index_count': 1}},
+            'analyzers': [{'name': 'a1'}], 'graphs': [], 'views': []
+        }
+        client1 = Mock()
+        client1.url = 'http://localhost:8529'
+        client1.get_collection_checksum.return_value = '1'
+        client1.stream_documents.side_effect = lambda name, **kwargs: iter([{'_key': 'a', 'v': 1}])
+        client2 = Mock()
+        client2.url = 'http://localhost:8529'
+        client2.get_collection_checksum.return_value = '2'
+        client2.stream_documents.side_effect = lambda name, **kwargs: iter([{'_key': 'a', 'v': 2}, {'_key': 'b'}])
+
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            compare_databases(client1, client2, summary, dict(summary, analyzers=[]), tmpdirname,
+                              depth='documents', quiet=True, output_formats=['ndjson', 'json'])
+            (subdir,) = os.listdir(tmpdirname)
+            files = sorted(os.listdir(os.path.join(tmpdirname, subdir)))
+            with open(os.path.join(tmpdirname, subdir, 'diff.ndjson')) as f:
+                records = [json.loads(line) for line in f]
+            with open(os.path.join(tmpdirname, subdir, 'summary.json')) as f:
+                result = json.load(f)
+
+        self.assertEqual(files, ['diff.ndjson', 'summary.json'])
+        keys = [(r['status'], r['key']) for r in records if r['event'] == 'document_difference']
+        self.assertEqual(keys, [('changed', 'a'), ('added', 'b')])
+        self.assertEqual(result['documents'], {'collection1': {'added': 1, 'removed': 0, 'changed': 1}})
+        self.assertEqual(result['entities']['analyzers']['only_in_db1'], ['a1'])
+        self.assertEqual(result['differences']['content_mismatches'], ['collection1'])
+
+def make_summary(db_name, collection_details=None, **overrides):
+    collection_details = collection_details or {'collection1': {'document_count': 1, 'index_count': 1}}
+    summary = {
+        'db_name': db_name,
+        'total_collections': len(collection_details),
+        'total_documents': sum(d['document_count'] for d in collection_details.values()),
+        'total_indexes': sum(d['index_count'] for d in collection_details.values()),
+        'total_graphs': 0, 'total_analyzers': 0, 'total_views': 0,
+        'collection_details': collection_details,
+        'analyzers': [], 'graphs': [], 'views': []
+    }
+    summary.update(overrides)
+    return summary
+
+
+class TestMultiDatabase(TestCase):
+
+    def test_resolve_database_pairs(self):
+        from arango_compare.runner import resolve_database_pairs
+
+        client1 = Mock()
+        client1.list_databases.return_value = ['_system', 'orders', 'users']
+        client2 = Mock()
+        client2.list_databases.return_value = ['_system', 'orders', 'billing']
+
+        self.assertEqual(resolve_database_pairs(client1, client2, 'all'),
+                         ([('_system', '_system'), ('orders', 'orders')], ['users'], ['billing']))
+        self.assertEqual(resolve_database_pairs(client1, client2, 'orders:orders_dr, users'),
+                         ([('orders', 'orders_dr'), ('users', 'users')], [], []))
+
+    def test_for_database_shares_pool_and_limiter(self):
+        client = ArangoDBClient('http://localhost:8529', 'root', 'password', '_system', max_concurrent_requests=2)
+        other = client.for_database('orders')
+
+        self.assertEqual(other.db_name, 'orders')
+        self.assertEqual(client.db_name, '_system')
+        self.assertIs(other.session, client.session)
+        self.assertIs(other._limiter, client._limiter)
+
+    def test_compare_database_pairs_writes_consolidated_report(self):
+        from arango_compare.runner import compare_database_pairs
+
+        def make_server(counts):
+            server = Mock()
+
+            def for_database(db_name):
+                client = Mock()
+                client.url = 'http://localhost:8529'
+                client.db_name = db_name
+                if db_name == 'broken':
+                    client.get_summary.side_effect = requests.ConnectionError('refused')
+                else:
+                    client.get_summary.return_value = make_summary(
+                        db_name, {'collection1': {'document_count': counts[db_name], 'index_count': 1}})
+                return client
+
+            server.for_database.side_effect = for_database
+            return server
+
+        server1 = make_server({'orders': 1, 'users': 1})
+        server2 = make_server({'orders': 2, 'users': 1})
+
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            results = compare_database_pairs(server1, server2, [('orders', 'orders'), ('users', 'users'), ('broken', 'broken')],
+                                             tmpdirname, max_concurrent_pairs=2, only_in_db2=['billing'], quiet=True)
+            (report_file,) = [name for name in os.listdir(tmpdirname) if name.endswith('.md')]
+            with open(os.path.join(tmpdirname, report_file)) as f:
+                report = f.read()
+
+        self.assertEqual(results[0]['count_mismatches'], ['collection1'])
+        self.assertEqual(results[1]['count_mismatches'], [])
+        self.assertIn('ConnectionError', results[2]['error'])
+        self.assertRegex(report, r'\| orders \| orders \| 0 \| 0 \| 1 \| 0 \| - \|')
+        self.assertIn('## Databases only on DB2:\n- billing', report)
+
+    def test_pairs_sharing_a_database_get_their_own_reports(self):
+        from arango_compare.runner import compare_database_pairs
+
+        server = Mock()
+
+        def for_database(db_name):
+            client = Mock()
+            client.url = 'http://localhost:8529'
+            client.db_name = db_name
+            client.get_summary.return_value = make_summary(
+                db_name, {'collection1': {'document_count': len(db_name), 'index_count': 1}})
+            return client
+
+        server.for_database.side_effect = for_database
+
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            results = compare_database_pairs(server, server, [('orders', 'orders_dr'), ('orders', 'orders_qa')],
+                                             tmpdirname, quiet=True)
+            report_dirs = sorted(os.path.basename(result['report_dir']) for result in results)
+
+        self.assertEqual(len(set(report_dirs)), 2)
+        self.assertTrue(report_dirs[0].startswith('orders-localhost_8529-orders_dr-'))
+        self.assertTrue(report_dirs[1].startswith('orders-localhost_8529-orders_qa-'))
+
+class TestOneToMany(TestCase):
+
+    def make_target(self, url, collection_details):
+        client = Mock()
+        client.url = url
+        client.db_name = 'orders'
+        client.get_summary.return_value = make_summary('orders', collection_details)
+        client.get_collection_checksum.return_value = 'target'
+        return client
+
+    def test_reference_is_summarized_once(self):
+        from arango_compare.runner import compare_one_to_many
+
+        reference = Mock()
+        reference.url = 'http://primary:8529'
+        reference.db_name = 'orders'
+        reference.get_summary.return_value = make_summary('orders', {
+            'a': {'document_count': 1, 'index_count': 1},
+            'b': {'document_count': 1, 'index_count': 1},
+        })
+        reference.get_collection_checksum.return_value = 'reference'
+        targets = [
+            self.make_target('http://dr1:8529', {'a': {'document_count': 1, 'index_count': 1},
+                                                 'b': {'document_count': 1, 'index_count': 1}}),
+            self.make_target('http://dr2:8529', {'a': {'document_count': 2, 'index_count': 1}}),
+        ]
+
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            results = compare_one_to_many(reference, targets, tmpdirname, depth='checksum', quiet=True)
+            (report_file,) = [name for name in os.listdir(tmpdirname) if name.startswith('matrix') and name.endswith('.md')]
+            with open(os.path.join(tmpdirname, report_file)) as f:
+                report = f.read()
+            report_dirs = [name for name in os.listdir(tmpdirname) if os.path.isdir(os.path.join(tmpdirname, name))]
+
+        self.assertEqual(reference.get_summary.call_count, 1)
+        # Only dr1 needs checksums: on dr2, 'a' already differs by count and 'b' is missing.
+        self.assertEqual(sorted(c.args[0] for c in reference.get_collection_checksum.call_args_list), ['a', 'b'])
+        self.assertEqual(len(report_dirs), 2)
+        self.assertEqual([r['target'] for r in results], ['dr1_8529-orders', 'dr2_8529-orders'])
+        self.assertIn('| a | content | counts, content |', report)
+        self.assertIn('| b | content | missing |', report)
+
+    def test_reference_client_shares_lookups(self):
+        from arango_compare.runner import ReferenceClient
+
+        client = Mock()
+        client.get_collection_checksum.return_value = 'x'
+        reference = ReferenceClient(client)
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            checksums = list(executor.map(lambda _: reference.get_collection_checksum('a'), range(8)))
+
+        self.assertEqual(checksums, ['x'] * 8)
+        self.assertEqual(client.get_collection_checksum.call_count, 1)
+        self.assertIs(reference.get_summary, client.get_summary)
+
+class TestMockServer(TestCase):
+    """End to end against the benchmark suite's local mock ArangoDB server."""
+
+    def setUp(self):
+        from benchmarks.mock_arango import MockArangoServer, MockCatalog
+
+        self.servers = [
+            MockArangoServer(MockCatalog(collections=3, documents=250)).start(),
+            MockArangoServer(MockCatalog(collections=3, documents=250, drift=0.1)).start(),
+        ]
+
+    def tearDown(self):
+        for server in self.servers:
+            server.stop()
+
+    def test_summary_and_document_comparison(self):
+        for strategy in ('per_collection', 'bulk'):
+            clients = [ArangoDBClient(server.url, 'root', '', '_system', metadata_strategy=strategy)
+                       for server in self.servers]
+            summaries = [client.get_summary() for client in clients]
+
+            self.assertEqual(summaries[0]['total_collections'], 3)
+            self.assertEqual(summaries[0]['total_documents'], 750)
+            self.assertEqual(summaries[0]['collection_details']['c00000']['index_count'], 2)
+
+            with tempfile.TemporaryDirectory() as tmpdirname:
+                differences = compare_databases(clients[0], clients[1], summaries[0], summaries[1], tmpdirname,
+                                                depth='documents', batch_size=100, quiet=True,
+                                                output_formats=('json',))
+                with open(os.path.join(differences['report_dir'], 'summary.json')) as f:
+                    report = json.load(f)
+
+            self.assertEqual(differences['content_mismatches'], ['c00000', 'c00001', 'c00002'])
+            self.assertEqual(report['documents']['c00000']['changed'], 25)
+
+        self.assertGreater(self.servers[0].request_counts['batch'], 0)
+        self.assertGreater(self.servers[0].request_counts['cursor'], 3)
+
+    def test_profile_records_requests_and_phases(self):
+        from arango_compare.profile import Profiler, write_profile
+
+        profiler = Profiler()
+        clients = [ArangoDBClient(server.url, 'root', '', '_system', profiler=profiler) for server in self.servers]
+        summaries = [client.get_summary() for client in clients]
+
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            compare_databases(clients[0], clients[1], summaries[0], summaries[1], tmpdirname,
+                              depth='documents', batch_size=100, quiet=True, profiler=profiler)
+            metrics_file = os.path.join(tmpdirname, 'arangocompare.prom')
+            profile_path = write_profile(profiler, tmpdirname, metrics_file, top_n=2)
+            with open(profile_path) as f:
+                profile = f.read()
+            with open(metrics_file) as f:
+                metrics = f.read()
+
+        summary = profiler.summary(top_n=2)
+        count_stats = summary['endpoints']['GET /_api/collection/{name}/count']
+        self.assertEqual(count_stats['requests'], 6)
+        self.assertEqual(summary['endpoints']['PUT /_api/cursor/{id}']['requests'], 12)
+        self.assertLessEqual(count_stats['p50'], count_stats['max'])
+        self.assertEqual(len(summary['slowest_collections']), 2)
+        self.assertEqual(summary['phases']['summary']['runs'], 2)
+        self.assertLessEqual({'entities', 'indexes', 'report', 'tier:count', 'tier:documents'}, set(summary['phases']))
+        self.assertIn('# Run Profile', profile)
+        self.assertIn('arangocompare_request_seconds{method="GET",endpoint="/_api/collection/{name}/count",'
+                      'quantile="0.5"}', metrics)
+        self.assertTrue(metrics.endswith('# EOF\n'))
+
+    @skipUnless(async_client.aiohttp is not None, "aiohttp is not installed")
+    def test_async_engine_matches_sync_summary(self):
+        from arango_compare.async_client import AsyncArangoDBClient
+        from arango_compare.profile import Profiler
+        from arango_compare.runner import compare_database_pairs_async, report_label_for
+
+        sync_summary = ArangoDBClient(self.servers[0].url, 'root', '', '_system').get_summary()
+        profiler = Profiler()
+        sync_clients = [ArangoDBClient(server.url, 'root', '', '_system', profiler=profiler) for server in self.servers]
+        clients = [AsyncArangoDBClient(server.url, 'root', '', '_system', max_concurrent_requests=4,
+                                       profiler=profiler, sync_client=sync_client)
+                   for server, sync_client in zip(self.servers, sync_clients)]
+
+        async def run(tmpdirname):
+            try:
+                summary = await clients[0].get_summary()
+                results = await compare_database_pairs_async(clients[0], clients[1], [('_system', '_system')],
+                                                             tmpdirname, depth='documents', batch_size=100,
+                                                             quiet=True)
+                return summary, results
+            finally:
+                for client in clients:
+                    await client.close()
+
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            summary, results = asyncio.run(run(tmpdirname))
+
+        self.assertEqual(summary['collection_details'].to_dict(), sync_summary['collection_details'].to_dict())
+        self.assertEqual(summary['total_documents'], sync_summary['total_documents'])
+        self.assertEqual(summary['graphs'], sync_summary['graphs'])
+        self.assertNotIn('error', results[0])
+        self.assertEqual(results[0]['content_mismatches'], ['c00000', 'c00001', 'c00002'])
+        # Reports land where the sync engine would have written them.
+        self.assertTrue(os.path.basename(results[0]['report_dir']).startswith(
+            f"_system-{report_label_for(sync_clients[1])}-"))
+        # Summaries are recorded by the async clients, the document diffs by the sync clients they hand on.
+        self.assertIs(clients[0].for_database('db').sync_client().session, sync_clients[0].session)
+        self.assertIn('GET /_api/collection/{name}/count', profiler.endpoints)
+        self.assertIn('PUT /_api/cursor/{id}', profiler.endpoints)
+
+class TestDaemon(TestCase):
+
+    def test_status_lists_failed_collections(self):
+        from arango_compare.daemon import drift_status
+
+        status, _ = drift_status({'db1': 'a', 'db2': 'b', 'unique_to_db1': [], 'unique_to_db2': [],
+                                  'count_mismatches': [], 'index_mismatches': [], 'content_mismatches': ['x'],
+                                  'failed_collections': ['x']})
+
+        self.assertEqual(status['failed_collections'], {'a|b': ['x']})
+
+    def test_runs_report_new_and_resolved_differences(self):
+        from arango_compare.daemon import ComparisonDaemon
+
+        results = iter([
+            {'db1': 'a', 'db2': 'b', 'unique_to_db1': [], 'unique_to_db2': [], 'count_mismatches': ['x'],
+             'index_mismatches': [], 'content_mismatches': None},
+            {'db1': 'a', 'db2': 'b', 'unique_to_db1': ['y'], 'unique_to_db2': [], 'count_mismatches': [],
+             'index_mismatches': [], 'content_mismatches': None},
+        ])
+        daemon = ComparisonDaemon(lambda: next(results), interval=3600)
+
+        first = daemon.run_once()
+        second = daemon.run_once()
+        failed = daemon.run_once()
+
+        self.assertTrue(first['drift'])
+        self.assertEqual(first['new_differences'], {})
+        self.assertEqual(second['new_differences'], {'a|b': ['unique_to_db1: y']})
+        self.assertEqual(second['resolved_differences'], {'a|b': ['count_mismatches: x']})
+        self.assertFalse(failed['ok'])
+        self.assertEqual(daemon.current_status()['failures'], 1)
+        self.assertEqual(daemon.current_status()['last_run']['error'], 'StopIteration: ')
+
+    def test_serves_status_and_metrics(self):
+        from arango_compare.daemon import ComparisonDaemon
+        from arango_compare.profile import Profiler
+
+        profiler = Profiler()
+        ran = threading.Event()
+
+        def run_comparison():
+            profiler.record_request('GET', '/_api/collection', None, 200, 10, 0, 0.01)
+            ran.set()
+            return [{'db1': 'a', 'db2': 'b', 'error': 'ConnectionError: down'}]
+
+        daemon = ComparisonDaemon(run_comparison, interval=3600, host='127.0.0.1', port=0, profiler=profiler)
+        thread = threading.Thread(target=daemon.serve_forever)
+        thread.start()
+        try:
+            self.assertTrue(ran.wait(5))
+            base = f"http://127.0.0.1:{daemon.server_address[1]}"
+            for _ in range(50):
+                status = requests.get(f"{base}/status").json()
+                if status['runs']:
+                    break
+                time.sleep(0.02)
+            metrics = requests.get(f"{base}/metrics").text
+        finally:
+            daemon.stop()
+            thread.join(5)
+
+        self.assertEqual(status['last_run']['errors'], ['ConnectionError: down'])
+        self.assertFalse(status['last_run']['drift'])
+        self.assertIn('arangocompare_runs_total 1', metrics)
+        self.assertIn('arangocompare_pair_errors 1', metrics)
+        self.assertIn('arangocompare_request_seconds_count{method="GET",endpoint="/_api/collection"} 1', metrics)
+        self.assertEqual(metrics.count('# EOF'), 1)
+
+class TestCollectionTable(TestCase):
+
+    def test_behaves_like_the_details_dict(self):
+        from arango_compare.summary import CollectionTable, summary_json_default
+
+        primary = {'type': 'primary', 'fields': ['_key'], 'unique': True, 'sparse': False}
+        details = {
+            'a': {'document_count': 10, 'index_count': 1, 'indexes': [dict(primary)]},
+            'b': {'document_count': 20, 'index_count': 1, 'indexes': [dict(primary)]},
+        }
+        table = CollectionTable.from_details(details)
+
+        self.assertEqual(table, details)
+        self.assertEqual(table.keys() - {'b', 'c'}, {'a'})
+        self.assertEqual(sum(table.document_counts), 30)
+        self.assertEqual(table.document_count('b'), 20)
+        self.assertIs(table.indexes('a')[0], table.indexes('b')[0])
+        self.assertIs(CollectionTable.from_details(table), table)
+        self.assertEqual(json.loads(json.dumps({'details': table}, default=summary_json_default)),
+                         {'details': details})
+        with self.assertRaises(ValueError):
+            table.add('a', 1, 1)
+
+class TestCountComparison(TestCase):
+
+    def make_tables(self):
+        from arango_compare.summary import CollectionTable
+
+        table1 = CollectionTable.from_details({
+            'same': {'document_count': 10, 'index_count': 1},
+            'small_drift': {'document_count': 10000, 'index_count': 1},
+            'large_drift': {'document_count': 100, 'index_count': 1},
+            'was_empty': {'document_count': 0, 'index_count': 1},
+            'indexes': {'document_count': 5, 'index_count': 1},
+        })
+        table2 = CollectionTable.from_details({
+            'indexes': {'document_count': 5, 'index_count': 2},
+            'was_empty': {'document_count': 3, 'index_count': 1},
+            'large_drift': {'document_count': 90, 'index_count': 1},
+            'small_drift': {'document_count': 10005, 'index_count': 1},
+            'same': {'document_count': 10, 'index_count': 1},
+        })
+        return table1, table2
+
+    def test_numpy_and_array_paths_agree(self):
+        import arango_compare.counts as counts
+
+        table1, table2 = self.make_tables()
+        names = sorted(table1.keys())
+        with patch.object(counts, 'NUMPY_MIN_ROWS', 0):
+            results = [counts.compare_counts(table1, table2, names, drift_threshold=0.1)]
+        with patch.object(counts, 'numpy', None):
+            results.append(counts.compare_counts(table1, table2, names, drift_threshold=0.1))
+
+        for result in results:
+            self.assertEqual(result['count_mismatches'], ['indexes', 'large_drift', 'was_empty'])
+            self.assertEqual(result['document_mismatches'], ['large_drift', 'was_empty'])
+            self.assertEqual(result['tolerated'], ['small_drift'])
+            self.assertEqual(result['details']['large_drift']['document_delta'], -10)
+            self.assertAlmostEqual(result['details']['large_drift']['drift_percent'], 10.0)
+            self.assertIsNone(result['details']['was_empty']['drift_percent'])
+        self.assertEqual(results[0], results[1])
+
+    def test_tolerated_collections_skip_deeper_tiers(self):
+        table1, table2 = self.make_tables()
+        summary1 = make_summary('db', table1)
+        summary2 = make_summary('db', table2)
+        client1, client2 = Mock(), Mock()
+        client1.get_collection_checksum.return_value = 'same'
+        client2.get_collection_checksum.return_value = 'same'
+
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            differences = compare_databases(client1, client2, summary1, summary2, tmpdirname,
+                                            depth='checksum', quiet=True, drift_threshold=0.1)
+            with open(os.path.join(differences['report_dir'], 'summary.md')) as f:
+                report = f.read()
+
+        self.assertEqual(differences['tolerated_drift'], ['small_drift'])
+        checked = sorted(c.args[0] for c in client1.get_collection_checksum.call_args_list)
+        self.assertEqual(checked, ['indexes', 'same'])
+        self.assertIn('Drift: -10 documents (10.00%)', report)
+        self.assertIn('Collections with tolerated drift', report)
+
+class TestSampling(TestCase):
+
+    def test_wilson_interval(self):
+        from arango_compare.sampling import wilson_interval
+
+        lower, upper = wilson_interval(0, 1000)
+        self.assertEqual(lower, 0.0)
+        self.assertAlmostEqual(upper, 0.0038, places=4)
+        lower, upper = wilson_interval(50, 1000)
+        self.assertLess(lower, 0.05)
+        self.assertGreater(upper, 0.05)
+        # Sampling the whole collection leaves no uncertainty.
+        self.assertEqual(wilson_interval(50, 1000, population=1000), (0.05, 0.05))
+
+    def test_sample_depth_against_mock_server(self):
+        import random
+        from benchmarks.mock_arango import MockArangoServer, MockCatalog
+
+        # The mock server draws samples with the random module; a 95% interval misses 1 run in 20.
+        random.seed(1)
+        servers = [
+            MockArangoServer(MockCatalog(collections=2, documents=400)).start(),
+            MockArangoServer(MockCatalog(collections=2, documents=400, drift=0.25)).start(),
+        ]
+        try:
+            clients = [ArangoDBClient(server.url, 'root', '', '_system') for server in servers]
+            summaries = [client.get_summary() for client in clients]
+            with tempfile.TemporaryDirectory() as tmpdirname:
+                differences = compare_databases(clients[0], clients[1], summaries[0], summaries[1], tmpdirname,
+                                                depth='sample', sample_size=100, sample_strata=4, quiet=True,
+                                                output_formats=('markdown', 'json'))
+                with open(os.path.join(differences['report_dir'], 'summary.json')) as f:
+                    report = json.load(f)
+                with open(os.path.join(differences['report_dir'], 'samples.md')) as f:
+                    samples = f.read()
+        finally:
+            for server in servers:
+                server.stop()
+
+        self.assertEqual(differences['content_mismatches'], ['c00000', 'c00001'])
+        sample = report['samples']['c00000']
+        self.assertEqual(sample['sampled'], 100)
+        self.assertLessEqual(sample['lower'], 0.25)
+        self.assertGreaterEqual(sample['upper'], 0.25)
+        self.assertIn('- changed: k', samples)
+        self.assertIn('Sampled 100 of 400 documents', samples)
+
+class TestCollectionFilters(TestCase):
+
+    @patch('arango_compare.client.requests.Session.get')
+    def test_filtered_collections_are_never_fetched(self, mock_get):
+        from arango_compare.filters import CollectionFilter
+
+        def respond(url, **kwargs):
+            response = Mock()
+            if url.endswith('/_api/collection'):
+                response.json.return_value = {'result': [{'name': name} for name in
+                                                         ('_graphs', 'orders', 'staging_1', 'tmp_12', 'tmp_x')]}
+            elif url.endswith('/count'):
+                response.json.return_value = {'count': 1}
+            elif url.endswith('/_api/index'):
+                response.json.return_value = {'indexes': []}
+            else:
+                response.json.return_value = {'result': [], 'graphs': []}
+            return response
+
+        mock_get.side_effect = respond
+        collection_filter = CollectionFilter(exclude=['staging_*', r're:^tmp_\d+$'], skip_system=True)
+        client = ArangoDBClient('http://localhost:8529', 'root', 'password', 'db', collection_filter=collection_filter)
+
+        summary = client.get_summary()
+
+        self.assertEqual(sorted(summary['collection_details']), ['orders', 'tmp_x'])
+        self.assertEqual(mock_get.call_args_list[0].kwargs['params']['excludeSystem'], 'true')
+        fetched = [c.args[0] for c in mock_get.call_args_list if c.args[0].endswith('/count')]
+        self.assertEqual(len(fetched), 2)
+
+    def test_per_collection_depths(self):
+        from arango_compare.filters import CollectionDepths, parse_collection_depths
+
+        details = {name: {'document_count': 1, 'index_count': 1} for name in ('logs_1', 'orders', 'users')}
+        client1, client2 = Mock(), Mock()
+        client1.get_collection_checksum.side_effect = lambda name, *args: name
+        client2.get_collection_checksum.side_effect = lambda name, *args: 'other'
+        client1.stream_documents.side_effect = lambda name, **kwargs: iter([{'_key': 'a', 'v': 1}])
+        client2.stream_documents.side_effect = lambda name, **kwargs: iter([{'_key': 'a', 'v': 1}])
+        depths = CollectionDepths(parse_collection_depths('logs_*=count, orders=documents'))
+
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            differences = compare_databases(client1, client2, make_summary('db', details), make_summary('db', details),
+                                            tmpdirname, depth='checksum', quiet=True, collection_depths=depths)
+            with self.assertRaises(ValueError):
+                compare_databases(client1, client2, make_summary('db', details), make_summary('db', details),
+                                  tmpdirname, collection_depths=CollectionDepths([('x', 'deep')]))
+
+        checksummed = sorted(c.args[0] for c in client1.get_collection_checksum.call_args_list)
+        self.assertEqual(checksummed, ['orders', 'users'])
+        # orders' checksum differs but its documents do not, so only users stays flagged.
+        self.assertEqual(differences['content_mismatches'], ['users'])
+        self.assertEqual(client1.stream_documents.call_args.args[0], 'orders')
+
+class FakeEdgeClient:
+    """Evaluates the graph topology AQL queries in Python over in-memory edges and vertex ids."""
+
+    def __init__(self, edges, vertices):
+        self.edges = edges
+        self.vertices = vertices
+        self.fetched_edges = 0
+        self.dangling_scans = 0
+        self.bucket_scans = 0
+
+    def query(self, aql, bind_vars, batch_size=1000, stream=False):
+        import hashlib
+        from collections import Counter
+        # TO_STRING([d._from, d._to]) is compact JSON.
+        md5 = lambda edge: hashlib.md5(json.dumps(list(edge), separators=(',', ':')).encode()).hexdigest()
+        digest = lambda edge: int(hashlib.md5(repr(edge).encode()).hexdigest()[:12], 16)
+        if 'ids' in bind_vars:
+            return [[vertex, vertex in self.vertices] for vertex in bind_vars['ids']]
+        if 'source_exists' in aql:
+            self.dangling_scans += 1
+            return [[source, target, source in self.vertices, target in self.vertices]
+                    for source, target in self.edges
+                    if source not in self.vertices or target not in self.vertices]
+        length = bind_vars['prefix_length']
+        if 'parents' in bind_vars:
+            buckets = {}
+            for edge in self.edges:
+                bucket = md5(edge)[:length]
+                if bucket[:bind_vars['parent_length']] in bind_vars['parents']:
+                    n, total = buckets.get(bucket, (0, 0))
+                    buckets[bucket] = (n + 1, total + digest(edge))
+            return [[bucket, n, total, 0] for bucket, (n, total) in buckets.items()]
+        self.bucket_scans += 1
+        pairs = Counter(edge for edge in self.edges if md5(edge)[:length] in bind_vars['buckets'])
+        self.fetched_edges += sum(pairs.values())
+        return sorted([md5((source, target))[:length], source, target, n] for (source, target), n in pairs.items())
+
+
+class TestGraphTopology(TestCase):
+
+    def test_reports_edge_differences_dangling_edges_and_missing_vertices(self):
+        vertices = {f'people/{i}' for i in range(300)}
+        edges = [(f'people/{i}', f'people/{(i * 7) % 300}') for i in range(300)]
+        edges2 = [edge for edge in edges if edge != ('people/5', 'people/35')]
+        edges2 += [('people/8', 'people/56'), ('people/9', 'people/400')]
+        client1 = FakeEdgeClient(edges, vertices)
+        client2 = FakeEdgeClient(edges2, vertices - {'people/35'})
+
+        graph = {'name': 'social', 'edge_definitions': [{'collection': 'knows', 'from': ['people'], 'to': ['people']}],
+                 'orphan_collections': []}
+        details = {'knows': {'document_count': 300, 'index_count': 1},
+                   'people': {'document_count': 300, 'index_count': 1}}
+        summary1 = make_summary('db', details, graphs=[graph])
+        summary2 = make_summary('db', dict(details, knows={'document_count': 301, 'index_count': 1}), graphs=[graph])
+
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            differences = compare_databases(client1, client2, summary1, summary2, tmpdirname, quiet=True,
+                                            compare_graphs=True, check_dangling_edges=True,
+                                            output_formats=('markdown', 'json'))
+            with open(os.path.join(differences['report_dir'], 'topology.md')) as f:
+                report = f.read()
+            with open(os.path.join(differences['report_dir'], 'summary.json')) as f:
+                totals = json.load(f)['topology']['knows']
+
+        self.assertEqual(differences['topology_mismatches'], ['knows'])
+        self.assertIn('- removed: people/5 -> people/35', report)
+        self.assertIn('- changed: people/8 -> people/56', report)
+        self.assertIn('- vertex people/35 missing on DB2', report)
+        self.assertIn('- vertex people/400 missing on DB1', report)
+        self.assertIn('people/9 -> people/400 (missing: people/400)', report)
+        self.assertEqual({key: totals[key] for key in ('added', 'removed', 'changed', 'dangling_db1', 'dangling_db2')},
+                         {'added': 1, 'removed': 1, 'changed': 1, 'dangling_db1': 0, 'dangling_db2': 2})
+        # Only the differing buckets' edges were fetched.
+        self.assertLess(client1.fetched_edges, len(edges) // 4)
+
+    def test_hub_vertex_edges_spread_over_buckets(self):
+        vertices = {'people/hub'} | {f'people/{i}' for i in range(2000)}
+        edges = [('people/hub', f'people/{i}') for i in range(2000)]
+        client1 = FakeEdgeClient(edges, vertices)
+        client2 = FakeEdgeClient(edges[:-1], vertices)
+
+        graph = {'name': 'social', 'edge_definitions': [{'collection': 'knows', 'from': ['people'], 'to': ['people']}],
+                 'orphan_collections': []}
+        summary1 = make_summary('db', {'knows': {'document_count': 2000, 'index_count': 1}}, graphs=[graph])
+        summary2 = make_summary('db', {'knows': {'document_count': 1999, 'index_count': 1}}, graphs=[graph])
+
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            differences = compare_databases(client1, client2, summary1, summary2, tmpdirname, quiet=True,
+                                            compare_graphs=True)
+
+        self.assertEqual(differences['topology_mismatches'], ['knows'])
+        # One vertex's edges no longer land in a single bucket that has to be fetched whole.
+        self.assertLess(client1.fetched_edges, len(edges) // 4)
+        # All differing leaves come from one scan per server.
+        self.assertEqual(client1.bucket_scans, 1)
+        # The dangling edge scan is opt-in.
+        self.assertEqual(client1.dangling_scans + client2.dangling_scans, 0)
+
+    def test_leaf_depth_bounds_bucket_size(self):
+        from arango_compare.graphs import leaf_depth
 
+        self.assertEqual(leaf_depth(0), 1)
+        self.assertEqual(leaf_depth(500_000_000, bucket_size=4096), 5)
+        self.assertLessEqual(500_000_000 / 16 ** leaf_depth(500_000_000), 4096)